@@ -1,3 +1,81 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import Profile
+from core.models import Service, ServiceRecord
+
+User = get_user_model()
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RoleQueryCountTests(TestCase):
+    """
+    O role é resolvido uma vez por requisição (JOIN com profile na autenticação JWT).
+    Nenhuma checagem de permissão/queryset pode voltar ao banco para ler o Profile.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+
+        cls.service = Service.objects.create(name="Corte", default_price=Decimal("35.00"))
+        cls.record = ServiceRecord.objects.create(
+            barber=cls.barber,
+            service=cls.service,
+            price_charged=Decimal("35.00"),
+            performed_at=timezone.now(),
+        )
+
+    def setUp(self):
+        cache.clear()  # respostas do dashboard não podem vir do cache
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+        return client
+
+    def get(self, user, url):
+        client = self.client_for(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        profile_queries = [q["sql"] for q in ctx.captured_queries if 'FROM "accounts_profile"' in q["sql"]]
+        self.assertEqual(profile_queries, [], url)
+        return len(ctx.captured_queries)
+
+    def test_query_count_per_endpoint(self):
+        # (url, consultas como gerente, consultas como barbeiro)
+        endpoints = [
+            ("/api/me/", 1, 1),
+            ("/api/service-records/", 2, 2),
+            (f"/api/service-records/{self.record.id}/", 2, 2),
+            ("/api/records/today/", 3, 3),
+            ("/api/appointments/", 2, 2),
+            ("/api/customers/", 2, 2),
+            ("/api/commissions/", 2, 2),
+            ("/api/dashboard/revenue/summary/", 3, 2),
+            ("/api/dashboard/revenue/by-month/", 2, 2),
+        ]
+        for url, as_manager, as_barber in endpoints:
+            with self.subTest(url=url):
+                self.assertEqual(self.get(self.manager, url), as_manager)
+                self.assertEqual(self.get(self.barber, url), as_barber)
+
+    def test_manager_only_endpoints(self):
+        for url in ("/api/services/", "/api/payments/", "/api/cash-entries/", "/api/cash/open-summary/"):
+            with self.subTest(url=url):
+                self.assertEqual(self.get(self.manager, url), 2)
+                response = self.client_for(self.barber).get(url)
+                self.assertEqual(response.status_code, 403)
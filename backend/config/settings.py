@@ -16,6 +16,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     # third-party
     "rest_framework",
@@ -43,6 +44,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.profiling.QueryProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "config.urls"
@@ -77,6 +79,64 @@ DATABASES = {
     }
 }
 
+# Cache compartilhado entre os workers do gunicorn (ex.: versão das regras de comissão).
+# CACHE_BACKEND: "redis" (REDIS_URL, requer o pacote "redis"), "file" (CACHE_DIR,
+# por nó) ou "locmem" (por processo; para testes/CI). Padrão: redis se houver
+# REDIS_URL, senão file.
+REDIS_URL = config("REDIS_URL", default="")
+CACHE_BACKEND = config("CACHE_BACKEND", default="redis" if REDIS_URL else "file")
+if CACHE_BACKEND == "redis":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+elif CACHE_BACKEND == "locmem":
+    CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": config("CACHE_DIR", default=str(BASE_DIR / ".cache")),
+        }
+    }
+
+# Respostas do dashboard em cache (segundos); escritas invalidam antes disso.
+DASHBOARD_CACHE_TIMEOUT = config("DASHBOARD_CACHE_TIMEOUT", default=300, cast=int)
+
+# Agenda: expediente por dia da semana (0 = segunda), no fuso TIME_ZONE,
+# e passo padrão da grade de horários livres.
+SCHEDULING_WORKING_HOURS = {
+    0: [("09:00", "19:00")],
+    1: [("09:00", "19:00")],
+    2: [("09:00", "19:00")],
+    3: [("09:00", "19:00")],
+    4: [("09:00", "19:00")],
+    5: [("09:00", "17:00")],
+}
+SCHEDULING_SLOT_STEP_MINUTES = 30
+
+# Pendentes que terminaram há mais de GRACE minutos viram NO_SHOW
+# (job mark_no_shows do manage.py run_jobs, a cada SWEEP segundos).
+SCHEDULING_NO_SHOW_GRACE_MINUTES = config("SCHEDULING_NO_SHOW_GRACE_MINUTES", default=60, cast=int)
+SCHEDULING_NO_SHOW_SWEEP_SECONDS = config("SCHEDULING_NO_SHOW_SWEEP_SECONDS", default=300, cast=int)
+
+# Períodos de pagamento de comissão: WEEKLY ou BIWEEKLY, contados a partir
+# da data âncora (uma segunda-feira).
+COMMISSION_PAYOUT_FREQUENCY = config("COMMISSION_PAYOUT_FREQUENCY", default="BIWEEKLY")
+COMMISSION_PAYOUT_ANCHOR = config("COMMISSION_PAYOUT_ANCHOR", default="2024-01-01")
+
+# Partições mensais de ServiceRecord/Payment criadas com antecedência
+# (manage.py partitions e job ensure_partitions).
+PARTITION_MONTHS_AHEAD = config("PARTITION_MONTHS_AHEAD", default=3, cast=int)
+
+# Perfil de SQL por requisição (core/profiling.py): fração amostrada (0 desliga),
+# com Server-Timing na resposta e percentis por rota em /api/profiling/queries/.
+# A mesma instrução repetida THRESHOLD vezes numa requisição conta como N+1.
+QUERY_PROFILING_SAMPLE_RATE = config("QUERY_PROFILING_SAMPLE_RATE", default=0.0, cast=float)
+QUERY_PROFILING_N_PLUS_ONE_THRESHOLD = config("QUERY_PROFILING_N_PLUS_ONE_THRESHOLD", default=5, cast=int)
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator", "OPTIONS": {"min_length": 10}},
@@ -102,7 +162,7 @@ CORS_ALLOW_CREDENTIALS = True
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.ProfileJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -110,8 +170,10 @@ REST_FRAMEWORK = {
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
         "rest_framework.filters.SearchFilter",
-        "rest_framework.filters.OrderingFilter",
+        "core.pagination.CursorOrderingFilter",
     ],
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.BoundedCursorPagination",
+    "PAGE_SIZE": 50,
 }
 
 
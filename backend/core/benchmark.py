@@ -0,0 +1,231 @@
+"""
+Benchmark dos endpoints GET da API.
+
+Para cada endpoint mede: consultas SQL, linhas lidas, tempo de banco,
+tempo de serialização (serializer.data + render) e latência p50/p95.
+Endpoints de lista rodam também com page_size=1: se o número de consultas
+muda com o tamanho da página, é N+1.
+"""
+import re
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.urls import URLResolver, get_resolver
+from rest_framework import renderers, serializers
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+# api/profiling/: relatório da própria instrumentação (só ADMIN)
+SKIP_PREFIXES = ("api/auth/", "api/schema/", "api/docs/", "api/profiling/")
+
+
+class QueryRecorder:
+    """
+    Hook para connection.execute_wrapper: conta consultas, linhas e tempo de banco.
+    Linhas vêm de cursor.rowcount (exato no PostgreSQL; o SQLite não informa em SELECT).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+            self.count += 1
+            rowcount = getattr(context["cursor"], "rowcount", -1)
+            if rowcount and rowcount > 0 and sql.lstrip()[:6].upper() == "SELECT":
+                self.rows += rowcount
+
+
+class SerializationTimer:
+    """Acumula o tempo gasto em serializer.data e no render JSON."""
+
+    def __init__(self):
+        self.time = 0.0
+        self._depth = 0
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            # só conta o nível mais externo (ListSerializer chama Serializer)
+            self._depth += 1
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    self.time += time.perf_counter() - start
+        return timed
+
+    @contextmanager
+    def patched(self):
+        originals = [
+            (serializers.Serializer, "data", serializers.Serializer.data),
+            (serializers.ListSerializer, "data", serializers.ListSerializer.data),
+            (renderers.JSONRenderer, "render", renderers.JSONRenderer.render),
+        ]
+        try:
+            for cls, attr, original in originals:
+                if isinstance(original, property):
+                    setattr(cls, attr, property(self.wrap(original.fget)))
+                else:
+                    setattr(cls, attr, self.wrap(original))
+            yield self
+        finally:
+            for cls, attr, original in originals:
+                setattr(cls, attr, original)
+
+
+def _walk(patterns, prefix=""):
+    for p in patterns:
+        if isinstance(p, URLResolver):
+            yield from _walk(p.url_patterns, prefix + str(p.pattern))
+        else:
+            yield prefix + str(p.pattern), p.callback
+
+
+def route_to_path(route):
+    """Padrão de URL -> caminho com {parâmetros}: "api/x/<int:pk>/" vira "/api/x/{pk}/"."""
+    route = route.replace("^", "").replace("$", "")
+    route = re.sub(r"\(\?P<(\w+)>[^)]*\)", r"{\1}", route)
+    route = re.sub(r"<(?:\w+:)?(\w+)>", r"{\1}", route)
+    return "/" + route
+
+
+def discover_endpoints():
+    """
+    Percorre o URLconf e devolve os endpoints GET da API como dicts
+    {"path", "view", "list"}. Rotas de detalhe usam o último pk existente.
+    """
+    endpoints = []
+    seen = set()
+    for route, callback in _walk(get_resolver().url_patterns):
+        cls = getattr(callback, "cls", None)
+        if cls is None or not route.startswith("api/") or route.startswith(SKIP_PREFIXES):
+            continue
+        if "(?P<format>" in route or cls.__name__ == "APIRootView":
+            continue
+
+        actions = getattr(callback, "actions", None)
+        if actions is not None:
+            if "get" not in actions:
+                continue
+        elif not hasattr(cls, "get"):
+            continue
+
+        path = route_to_path(route)
+        if "{pk}" in path:
+            queryset = getattr(cls, "queryset", None)
+            pk = queryset.order_by("-pk").values_list("pk", flat=True).first() if queryset is not None else None
+            if pk is None:
+                continue
+            path = path.replace("{pk}", str(pk))
+        if "{" in path or path in seen:
+            continue
+
+        seen.add(path)
+        endpoints.append({
+            "path": path,
+            "view": cls.__name__,
+            "list": bool(actions) and actions.get("get") == "list",
+        })
+    return endpoints
+
+
+def percentile(values, pct):
+    """Percentil por posição (nearest-rank) de uma lista não vazia."""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _request(client, path):
+    recorder = QueryRecorder()
+    timer = SerializationTimer()
+    with connection.execute_wrapper(recorder), timer.patched():
+        start = time.perf_counter()
+        response = client.get(path)
+        # respostas em streaming (exportações) só consultam o banco ao serem lidas
+        response.body = b"".join(response.streaming_content) if response.streaming else response.content
+        elapsed = time.perf_counter() - start
+    return response, recorder, timer, elapsed
+
+
+def measure_endpoint(client, endpoint, iterations=20, warmup=2):
+    path = endpoint["path"]
+    for _ in range(warmup):
+        response = client.get(path)
+        if response.streaming:
+            b"".join(response.streaming_content)
+
+    latencies, serialize, db = [], [], []
+    response = recorder = None
+    for _ in range(iterations):
+        response, recorder, timer, elapsed = _request(client, path)
+        latencies.append(elapsed * 1000)
+        serialize.append(timer.time * 1000)
+        db.append(recorder.time * 1000)
+
+    result = {
+        "view": endpoint["view"],
+        "status": response.status_code,
+        "queries": recorder.count,
+        "rows": recorder.rows,
+        "bytes": len(response.body),
+        "db_ms": round(statistics.median(db), 3),
+        "serialize_ms": round(statistics.median(serialize), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+    }
+
+    if endpoint["list"]:
+        sep = "&" if "?" in path else "?"
+        _, small, _, _ = _request(client, f"{path}{sep}page_size=1")
+        result["queries_page_size_1"] = small.count
+        result["n_plus_one"] = small.count != recorder.count
+
+    return result
+
+
+def run_benchmark(user, iterations=20, warmup=2, only=None):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+
+    results = {}
+    for endpoint in discover_endpoints():
+        if only and not any(o in endpoint["path"] for o in only):
+            continue
+        results[endpoint["path"]] = measure_endpoint(client, endpoint, iterations=iterations, warmup=warmup)
+    return results
+
+
+def compare_results(current, baseline, latency_tolerance=0.25, min_latency_ms=5.0):
+    """
+    Lista de regressões em relação ao baseline:
+    - qualquer aumento de consultas por endpoint
+    - qualquer endpoint de lista com N+1
+    - p95 acima de baseline * (1 + tolerância), ignorando diferenças < min_latency_ms
+    """
+    problems = []
+    for path, cur in current.items():
+        if cur.get("n_plus_one"):
+            problems.append(
+                f"{path}: N+1 ({cur['queries_page_size_1']} consultas com page_size=1, {cur['queries']} na página padrão)"
+            )
+
+        base = baseline.get(path)
+        if not base:
+            continue
+        if cur["queries"] > base["queries"]:
+            problems.append(f"{path}: consultas {base['queries']} -> {cur['queries']}")
+        limit = base["p95_ms"] * (1 + latency_tolerance)
+        if cur["p95_ms"] > limit and cur["p95_ms"] - base["p95_ms"] > min_latency_ms:
+            problems.append(f"{path}: p95 {base['p95_ms']}ms -> {cur['p95_ms']}ms")
+    return problems
@@ -0,0 +1,179 @@
+"""
+Exportação em streaming (CSV e XLSX) para a contabilidade.
+
+As linhas vêm de .values_list().iterator(chunk_size=...) (cursor do lado do
+servidor no PostgreSQL) e são escritas em blocos conforme são lidas: a memória
+fica constante com 1 mil ou 5 milhões de linhas. O XLSX é montado aqui mesmo
+(zip + SpreadsheetML mínimo, sem estilos) para poder ser gerado em fluxo.
+"""
+import csv
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.utils import timezone
+
+from .models import ServiceRecord
+
+CHUNK_SIZE = 2000
+ROWS_PER_CHUNK = 500
+
+SERVICE_RECORD_EXPORT_COLUMNS = (
+    ("id", "id"),
+    ("data", "performed_at"),
+    ("barbeiro", "barber__username"),
+    ("servico", "service__name"),
+    ("cliente", "customer__name"),
+    ("valor_cobrado", "price_charged"),
+    ("forma_pagamento", "payment__method"),
+    ("valor_pago", "payment__amount"),
+    ("caixa", "payment__cash_session_id"),
+    ("comissao", "commission__commission_amount"),
+)
+
+
+def service_record_export(*, date_from, date_to, barber_id=None, cash_session_id=None):
+    """
+    (cabeçalhos, linhas) dos registros do período (datas locais, inclusivas)
+    com pagamento e comissão, numa única consulta com JOIN.
+    """
+    tz = timezone.get_default_timezone()
+    qs = ServiceRecord.objects.filter(
+        performed_at__gte=datetime.combine(date_from, time.min, tzinfo=tz),
+        performed_at__lt=datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz),
+    )
+    if barber_id:
+        qs = qs.filter(barber_id=barber_id)
+    if cash_session_id:
+        qs = qs.filter(payment__cash_session_id=cash_session_id)
+
+    rows = (
+        qs.order_by("performed_at", "id")
+        .values_list(*(field for _, field in SERVICE_RECORD_EXPORT_COLUMNS))
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    return [header for header, _ in SERVICE_RECORD_EXPORT_COLUMNS], rows
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return timezone.localtime(value, timezone.get_default_timezone()).strftime("%Y-%m-%d %H:%M:%S")
+    return str(value)
+
+
+class _Echo:
+    """Pseudo-arquivo: csv.writer devolve a linha formatada em vez de guardar."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(headers, rows):
+    writer = csv.writer(_Echo())
+    # BOM: o Excel abre acentos corretamente
+    yield "\ufeff" + writer.writerow(headers)
+    chunk = []
+    for row in rows:
+        chunk.append(writer.writerow([_text(v) for v in row]))
+        if len(chunk) >= ROWS_PER_CHUNK:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return "<c/>"
+    if isinstance(value, (int, Decimal)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    return f'<c t="inlineStr"><is><t>{escape(_text(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return "<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>"
+
+
+class _Sink:
+    """Destino do zip sem seek (o zipfile grava descritores de dados); take() esvazia."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def xlsx_stream(headers, rows):
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in XLSX_PARTS.items():
+            zf.writestr(name, body)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            chunk = [SHEET_HEAD, _xlsx_row(headers)]
+            for row in rows:
+                chunk.append(_xlsx_row(row))
+                if len(chunk) >= ROWS_PER_CHUNK:
+                    sheet.write("".join(chunk).encode())
+                    chunk = []
+                    data = sink.take()
+                    if data:
+                        yield data
+            chunk.append(SHEET_TAIL)
+            sheet.write("".join(chunk).encode())
+    yield sink.take()
@@ -0,0 +1,116 @@
+"""
+Jobs periódicos em processo (sem broker).
+
+Cada app declara seus jobs em <app>/jobs.py com @job(...); o worker
+(manage.py run_jobs) descobre os módulos, roda os jobs vencidos e dorme até o
+próximo. Vários nós podem rodar o worker: cada execução pega um advisory lock
+do PostgreSQL (pg_try_advisory_lock) e quem não conseguir pula a rodada.
+Duração e resultado da última execução ficam no cache (job_stats), que também
+decide se o job está vencido. Com vários nós, o cache precisa ser
+compartilhado (REDIS_URL): com o FileBasedCache padrão cada nó tem as suas
+estatísticas e roda cada job uma vez por intervalo por conta própria.
+"""
+import time
+import traceback
+import zlib
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .partitions import ensure_partitions
+
+STATS_KEY = "jobs:stats:{name}"
+
+Job = namedtuple("Job", ["name", "func", "interval"])  # interval em segundos
+
+JOBS = {}
+
+
+def job(name, *, interval):
+    """Registra a função como job periódico. Ela devolve um dict de métricas (ex.: {"updated": 12})."""
+    def register(func):
+        JOBS[name] = Job(name=name, func=func, interval=interval)
+        return func
+    return register
+
+
+def discover_jobs():
+    autodiscover_modules("jobs")
+    return JOBS
+
+
+def lock_key(name) -> int:
+    # chave estável de 32 bits (hash() do Python muda entre processos)
+    return zlib.crc32(f"jobs:{name}".encode())
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Lock de sessão não bloqueante; rende True se adquirido.
+    Fora do PostgreSQL (testes locais) sempre adquire.
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    key = lock_key(name)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+
+
+def run_job(spec, force=False):
+    """
+    Roda o job se conseguir o lock e se ele estiver vencido (última execução
+    há mais de interval segundos; de qualquer nó só com cache compartilhado).
+    Devolve as estatísticas da execução ou None se pulou.
+    """
+    with advisory_lock(spec.name) as acquired:
+        if not acquired:
+            return None
+
+        last = cache.get(STATS_KEY.format(name=spec.name))
+        if not force and last and time.time() - last["finished"] < spec.interval:
+            return None
+
+        started = timezone.now()
+        start = time.perf_counter()
+        error = None
+        result = {}
+        try:
+            result = spec.func() or {}
+        except Exception:  # o worker segue com os outros jobs
+            error = traceback.format_exc()
+        stats = {
+            "name": spec.name,
+            "started_at": started.isoformat(),
+            "finished": time.time(),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "result": result,
+            "error": error,
+        }
+        # gravado ainda com o lock: o próximo nó (mesmo cache) já vê a execução
+        cache.set(STATS_KEY.format(name=spec.name), stats, timeout=None)
+    return stats
+
+
+def job_stats(names=None):
+    names = list(names or JOBS)
+    found = cache.get_many([STATS_KEY.format(name=n) for n in names])
+    return {n: found.get(STATS_KEY.format(name=n)) for n in names}
+
+
+@job("ensure_partitions", interval=6 * 60 * 60)
+def ensure_partitions_job():
+    return {"created": len(ensure_partitions())}
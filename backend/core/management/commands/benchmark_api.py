@@ -0,0 +1,71 @@
+import json
+import platform
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.models import Profile
+from core.benchmark import compare_results, run_benchmark
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede consultas SQL, linhas, serialização e latência p50/p95 de cada endpoint GET da API. "
+        "Com --baseline, falha se houver regressão (mais consultas, N+1 ou p95 acima da tolerância)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Usuário autenticado nas requisições (padrão: primeiro gerente/admin).")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument("--only", nargs="*", help="Só endpoints cujo caminho contém um destes trechos.")
+        parser.add_argument("--output", default="benchmark.json")
+        parser.add_argument("--baseline", help="JSON de uma execução anterior para comparação.")
+        parser.add_argument("--latency-tolerance", type=float, default=0.25)
+
+    def handle(self, *args, **opts):
+        if opts["user"]:
+            user = User.objects.filter(username=opts["user"]).first()
+        else:
+            user = User.objects.filter(
+                profile__role__in=[Profile.Role.MANAGER, Profile.Role.ADMIN]
+            ).order_by("id").first()
+        if not user:
+            raise CommandError("Usuário não encontrado. Rode seed_initial ou informe --user.")
+
+        results = run_benchmark(user, iterations=opts["iterations"], warmup=opts["warmup"], only=opts["only"])
+
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "debug": settings.DEBUG,
+            "user": user.username,
+            "iterations": opts["iterations"],
+            "endpoints": results,
+        }
+        with open(opts["output"], "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2, ensure_ascii=False)
+
+        for path, r in results.items():
+            self.stdout.write(
+                f"{path:<45} {r['status']} q={r['queries']:<3} rows={r['rows']:<6} "
+                f"ser={r['serialize_ms']:.1f}ms p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Resultado salvo em {opts['output']}"))
+
+        baseline = {}
+        if opts["baseline"]:
+            with open(opts["baseline"], encoding="utf-8") as fh:
+                baseline = json.load(fh)["endpoints"]
+
+        problems = compare_results(results, baseline, latency_tolerance=opts["latency_tolerance"])
+        if problems:
+            for p in problems:
+                self.stderr.write(p)
+            raise CommandError(f"{len(problems)} regressão(ões) de desempenho.")
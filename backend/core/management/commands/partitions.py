@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.partitions import PARTITIONED_TABLES, detach_partitions, ensure_partitions, list_partitions
+
+
+def _month(value):
+    return date.fromisoformat(f"{value}-01")
+
+
+class Command(BaseCommand):
+    help = (
+        "Partições mensais de ServiceRecord/Payment (PostgreSQL): cria as dos próximos meses "
+        "e desanexa as antigas para arquivamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ahead", type=int, help="Meses à frente (padrão: PARTITION_MONTHS_AHEAD).")
+        parser.add_argument(
+            "--detach-before", type=_month, metavar="AAAA-MM",
+            help="Desanexa as partições de meses anteriores a este (viram tabelas soltas para pg_dump/DROP).",
+        )
+        parser.add_argument("--list", action="store_true", help="Lista as partições existentes.")
+
+    def handle(self, *args, **opts):
+        for name in ensure_partitions(opts["ahead"]):
+            self.stdout.write(f"Criada: {name}")
+
+        if opts["detach_before"]:
+            for name in detach_partitions(opts["detach_before"]):
+                self.stdout.write(f"Desanexada: {name}")
+
+        if opts["list"]:
+            for table in PARTITIONED_TABLES:
+                partitions = list_partitions(table)
+                self.stdout.write(f"{table}: {len(partitions)} partições")
+                for name in partitions:
+                    self.stdout.write(f"  {name}")
+
+        self.stdout.write(self.style.SUCCESS("Partições em dia."))
@@ -0,0 +1,53 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from core.jobs import discover_jobs, job_stats, run_job
+
+
+class Command(BaseCommand):
+    help = (
+        "Worker de jobs periódicos (sem broker). Pode rodar em vários nós: "
+        "cada job usa advisory lock do PostgreSQL e só um nó o executa por vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Roda os jobs uma vez (ignora o intervalo) e sai.")
+        parser.add_argument("--only", nargs="*", help="Só os jobs com estes nomes.")
+        parser.add_argument("--stats", action="store_true", help="Mostra a última execução de cada job e sai.")
+        parser.add_argument("--tick", type=float, default=5.0, help="Segundos entre verificações no modo contínuo.")
+
+    def handle(self, *args, **opts):
+        jobs = discover_jobs()
+        if opts["only"]:
+            unknown = set(opts["only"]) - set(jobs)
+            if unknown:
+                raise CommandError(f"Jobs desconhecidos: {', '.join(sorted(unknown))}. Disponíveis: {', '.join(sorted(jobs))}")
+            jobs = {name: jobs[name] for name in opts["only"]}
+
+        if opts["stats"]:
+            self.stdout.write(json.dumps(job_stats(jobs), indent=2, ensure_ascii=False))
+            return
+
+        if opts["once"]:
+            for spec in jobs.values():
+                self.report(spec, run_job(spec, force=True))
+            return
+
+        self.stdout.write(f"Worker iniciado: {', '.join(sorted(jobs))}")
+        while True:
+            for spec in jobs.values():
+                close_old_connections()
+                self.report(spec, run_job(spec))
+            time.sleep(opts["tick"])
+
+    def report(self, spec, stats):
+        if stats is None:
+            return
+        line = f"{spec.name}: {stats['duration_ms']}ms {json.dumps(stats['result'])}"
+        if stats["error"]:
+            self.stderr.write(f"{line}\n{stats['error']}")
+        else:
+            self.stdout.write(line)
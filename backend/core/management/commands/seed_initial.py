@@ -1,9 +1,22 @@
-from django.core.management.base import BaseCommand
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
 from decimal import Decimal
 
 from accounts.models import Profile
-from core.models import Service
+from core.models import Service, ServiceRecord
+from customers.models import Customer
+from customers.services import refresh_customer_stats
+from dashboard.services import rebuild_daily_revenue
+from finance.models import CashSession, CashSessionReport, Commission, Payment, PaymentMethod
+from finance.services import add_to_cash_totals, build_close_report, build_commissions
+from finance.utils import get_open_cash_session
+from scheduling.models import Appointment
 
 User = get_user_model()
 
@@ -14,8 +27,37 @@ DEFAULT_SERVICES = [
     ("Sobrancelha", Decimal("15.00"), Decimal("50.00")),
 ]
 
+FIRST_NAMES = [
+    "João", "José", "Pedro", "Lucas", "Mateus", "Gabriel", "Rafael", "Thiago", "Felipe", "Bruno",
+    "Carlos", "Antônio", "Francisco", "Paulo", "Marcos", "Luiz", "André", "Diego", "Vinícius", "Ícaro",
+]
+LAST_NAMES = [
+    "Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Ferreira", "Costa", "Rodrigues", "Almeida",
+    "Nascimento", "Araújo", "Melo", "Barbosa", "Ribeiro", "Cavalcante", "Sousa", "Gomes", "Carvalho", "Rocha",
+]
+
+BATCH_SIZE = 5000
+SLOT_SECONDS = 15 * 60  # agendamentos gerados começam e terminam na grade de 15 min
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """
+    Desliga o auto_now_add dos models durante o seed: o bulk_create grava o
+    created_at/opened_at do próprio dado (data do atendimento) em vez de agora.
+    """
+    fields = [f for m in models for f in m._meta.concrete_fields if getattr(f, "auto_now_add", False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
 class Command(BaseCommand):
-    help = "Cria dados iniciais: serviços e usuários padrão."
+    help = "Cria dados iniciais: serviços e usuários padrão (e, opcionalmente, volume para benchmark)."
 
     def add_arguments(self, parser):
         parser.add_argument("--admin-user", default="admin")
@@ -23,6 +65,15 @@ class Command(BaseCommand):
         parser.add_argument("--manager-user", default="gerente")
         parser.add_argument("--manager-pass", default="Gerente@123456789")
 
+        # volume para benchmark (tudo 0 = só o seed básico)
+        parser.add_argument("--barbers", type=int, default=0, help="Garante N barbeiros (barbeiro01..N).")
+        parser.add_argument("--barber-pass", default="Barbeiro@123456789")
+        parser.add_argument("--customers", type=int, default=0, help="Adiciona N clientes.")
+        parser.add_argument("--records", type=int, default=0, help="Adiciona N registros (com pagamento e comissão).")
+        parser.add_argument("--appointments", type=int, default=0, help="Adiciona N agendamentos.")
+        parser.add_argument("--days", type=int, default=730, help="Janela de histórico (dias) dos dados gerados.")
+        parser.add_argument("--random-seed", type=int, default=42)
+
     def handle(self, *args, **opts):
         # Serviços
         for name, price, comm in DEFAULT_SERVICES:
@@ -61,4 +112,173 @@ class Command(BaseCommand):
         mgr.profile.save()
         self.stdout.write(self.style.SUCCESS(f"Gerente pronto: {mgr_user} / {mgr_pass}"))
 
+        if opts["barbers"] or opts["customers"] or opts["records"] or opts["appointments"]:
+            self.seed_volume(admin, opts)
+
         self.stdout.write(self.style.SUCCESS("Seed finalizado."))
+
+    def seed_volume(self, admin, opts):
+        """
+        Dataset realista para benchmark. Usa bulk_create em lotes; como isso
+        não dispara sinais, os totais dos caixas são somados por lote e o rollup
+        de faturamento é reconstruído no final.
+        """
+        rng = random.Random(opts["random_seed"])
+        now = timezone.now()
+        window = timedelta(days=opts["days"])
+
+        # Barbeiros
+        barbers = []
+        for i in range(1, opts["barbers"] + 1):
+            username = f"barbeiro{i:02d}"
+            barber, created = User.objects.get_or_create(username=username)
+            if created:
+                barber.set_password(opts["barber_pass"])
+                barber.save()
+            barbers.append(barber)
+        if not barbers:
+            barbers = list(User.objects.filter(profile__role=Profile.Role.BARBER)) or [admin]
+        self.stdout.write(self.style.SUCCESS(f"Barbeiros: {len(barbers)}"))
+
+        # Clientes
+        customers = []
+        for i in range(opts["customers"]):
+            name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}"
+            customer = Customer(name=name, phone=f"85 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}")
+            customer.normalize()  # bulk_create não passa pelo save()
+            customers.append(customer)
+        Customer.objects.bulk_create(customers, batch_size=BATCH_SIZE)
+        customer_ids = list(Customer.objects.values_list("id", flat=True))
+        self.stdout.write(self.style.SUCCESS(f"Clientes adicionados: {opts['customers']}"))
+
+        services = list(Service.objects.filter(active=True))
+
+        # Registros + pagamento + comissão, com a data do atendimento. Cada dia
+        # do histórico tem seu caixa, fechado no fim do dia com relatório; os de
+        # hoje entram no caixa aberto.
+        if opts["records"]:
+            tz = timezone.get_default_timezone()
+            today = timezone.localdate()
+            open_cash = get_open_cash_session() or CashSession.objects.create(opened_by=admin)
+            day_sessions = {}
+            day_totals = defaultdict(Decimal)
+            methods = [m for m, _ in PaymentMethod.choices]
+            remaining = opts["records"]
+            with historical_timestamps(CashSession, CashSessionReport, Payment, Commission):
+                while remaining:
+                    size = min(remaining, BATCH_SIZE)
+                    with transaction.atomic():
+                        records = []
+                        for _ in range(size):
+                            service = rng.choice(services)
+                            records.append(ServiceRecord(
+                                barber=rng.choice(barbers),
+                                service=service,
+                                customer_id=rng.choice(customer_ids) if customer_ids and rng.random() < 0.7 else None,
+                                price_charged=service.default_price,
+                                performed_at=now - window * rng.random(),
+                            ))
+                        ServiceRecord.objects.bulk_create(records)
+
+                        record_days = [timezone.localtime(r.performed_at, tz).date() for r in records]
+                        new_days = sorted(set(record_days) - day_sessions.keys() - {today})
+                        sessions = [
+                            CashSession(
+                                opened_by=admin,
+                                opened_at=datetime.combine(day, time.min, tzinfo=tz),
+                                closed_by=admin,
+                                closed_at=datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz),
+                            )
+                            for day in new_days
+                        ]
+                        CashSession.objects.bulk_create(sessions)
+                        day_sessions.update(zip(new_days, sessions))
+
+                        payments = [
+                            Payment(
+                                service_record=r,
+                                method=rng.choice(methods),
+                                amount=r.price_charged,
+                                cash_session=open_cash if day == today else day_sessions[day],
+                                created_by=admin,
+                                created_at=r.performed_at,
+                            )
+                            for r, day in zip(records, record_days)
+                        ]
+                        Payment.objects.bulk_create(payments)
+                        for payment in payments:
+                            if payment.cash_session_id != open_cash.id:
+                                day_totals[payment.cash_session_id] += payment.amount
+                        add_to_cash_totals(
+                            open_cash.id,
+                            payments=sum(p.amount for p in payments if p.cash_session_id == open_cash.id),
+                        )
+
+                        # regras atuais, já arredondadas como no fluxo normal
+                        commissions = build_commissions(records)
+                        for commission in commissions:
+                            commission.created_at = commission.service_record.performed_at
+                        Commission.objects.bulk_create(commissions)
+                    remaining -= size
+
+                # fecha os caixas do histórico com o que entrou neles: declarado = esperado
+                sessions = list(day_sessions.values())
+                for session in sessions:
+                    session.payments_total = day_totals[session.id]
+                    session.closing_amount = session.expected_amount
+                CashSession.objects.bulk_update(sessions, ["payments_total", "closing_amount"], batch_size=BATCH_SIZE)
+                reports = []
+                for session in sessions:
+                    report = build_close_report(session, session.closing_amount)
+                    report.created_at = session.closed_at
+                    reports.append(report)
+                CashSessionReport.objects.bulk_create(reports, batch_size=BATCH_SIZE)
+            rebuild_daily_revenue()
+            refresh_customer_stats()
+            self.stdout.write(self.style.SUCCESS(f"Registros adicionados: {opts['records']} ({len(sessions)} caixas fechados)"))
+
+        # Agendamentos (histórico + próximos 30 dias)
+        if opts["appointments"]:
+            if not customer_ids:
+                raise CommandError("--appointments precisa de clientes (use --customers).")
+            statuses = [s for s, _ in Appointment.Status.choices]
+            inactive = {Appointment.Status.CANCELED, Appointment.Status.NO_SHOW}
+            # slots de 15 min já ocupados por barbeiro (appointment_no_overlap):
+            # um sorteio que cairia em cima de outro ativo entra como cancelado
+            busy = defaultdict(set)
+            existing = (
+                Appointment.objects.filter(barber__in=barbers, end_at__gt=now - window)
+                .exclude(status__in=inactive)
+                .values_list("barber_id", "start_at", "end_at")
+            )
+            for barber_id, start, end in existing.iterator():
+                busy[barber_id].update(range(int(start.timestamp()) // SLOT_SECONDS, -(-int(end.timestamp()) // SLOT_SECONDS)))
+            remaining = opts["appointments"]
+            while remaining:
+                size = min(remaining, BATCH_SIZE)
+                appts = []
+                for _ in range(size):
+                    first = int((now - window + (window + timedelta(days=30)) * rng.random()).timestamp()) // SLOT_SECONDS
+                    minutes = rng.choice([30, 45, 60])
+                    slots = range(first, first + minutes * 60 // SLOT_SECONDS)
+                    start = datetime.fromtimestamp(first * SLOT_SECONDS, tz=dt_timezone.utc)
+                    barber = rng.choice(barbers)
+                    status = rng.choice(statuses) if start < now else Appointment.Status.SCHEDULED
+                    if status not in inactive:
+                        if busy[barber.id].isdisjoint(slots):
+                            busy[barber.id].update(slots)
+                        else:
+                            status = Appointment.Status.CANCELED
+                    service = rng.choice(services)
+                    appts.append(Appointment(
+                        barber=barber,
+                        customer_id=rng.choice(customer_ids),
+                        service=service,
+                        start_at=start,
+                        end_at=start + timedelta(minutes=minutes),
+                        status=status,
+                        created_by=admin,
+                    ))
+                Appointment.objects.bulk_create(appts, batch_size=BATCH_SIZE)
+                remaining -= size
+            self.stdout.write(self.style.SUCCESS(f"Agendamentos adicionados: {opts['appointments']}"))
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:21
+
+from django.db import migrations
+
+from core.partitions import convert_to_partitioned
+
+
+def partition_service_records(apps, schema_editor):
+    convert_to_partitioned(schema_editor, "core_servicerecord", "performed_at")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_servicerecord_appointment_servicerecord_customer'),
+        # as FKs de Payment/Commission para ServiceRecord saem do banco antes
+        ('finance', '0005_partition_payments'),
+    ]
+
+    operations = [
+        # reverter não desfaz o particionamento (a tabela particionada segue compatível com o model)
+        migrations.RunPython(partition_service_records, migrations.RunPython.noop),
+    ]
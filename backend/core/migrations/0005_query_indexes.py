@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_partition_service_records'),
+        ('customers', '0003_lifetime_stats'),
+        ('scheduling', '0003_appointment_series'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='servicerecord',
+            name='core_servic_perform_f82193_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicerecord',
+            name='core_servic_barber__1bc5d8_idx',
+        ),
+        migrations.AddIndex(
+            model_name='servicerecord',
+            index=models.Index(fields=['performed_at'], include=('price_charged', 'barber'), name='servicerecord_performed_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerecord',
+            index=models.Index(fields=['barber', 'performed_at'], include=('price_charged',), name='servicerecord_barber_cover'),
+        ),
+    ]
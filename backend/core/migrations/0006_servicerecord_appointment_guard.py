@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-18 11:05
+
+from django.db import migrations
+
+from core.partitions import create_unique_guard, drop_unique_guard
+
+
+def add_guard(apps, schema_editor):
+    # core_servicerecord particionada: o UNIQUE do OneToOne virou (appointment_id, performed_at)
+    create_unique_guard(schema_editor, "core_servicerecord", "appointment_id")
+
+
+def remove_guard(apps, schema_editor):
+    drop_unique_guard(schema_editor, "core_servicerecord", "appointment_id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_guard, remove_guard),
+    ]
@@ -13,6 +13,7 @@ class Service(models.Model):
 
 
 class ServiceRecord(models.Model):
+    """Atendimento realizado. No PostgreSQL a tabela é particionada por mês de performed_at (core/partitions.py)."""
     barber = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="service_records")
     service = models.ForeignKey(Service, on_delete=models.PROTECT, related_name="records")
     customer = models.ForeignKey("customers.Customer", on_delete=models.PROTECT, null=True, blank=True, related_name="service_records")
@@ -24,9 +25,10 @@ class ServiceRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        # cobrem as somas por período (dashboard/exportação) só com o índice
         indexes = [
-            models.Index(fields=["performed_at"]),
-            models.Index(fields=["barber", "performed_at"]),
+            models.Index(fields=["performed_at"], include=["price_charged", "barber"], name="servicerecord_performed_cover"),
+            models.Index(fields=["barber", "performed_at"], include=["price_charged"], name="servicerecord_barber_cover"),
         ]
         ordering = ["-performed_at"]
 
@@ -0,0 +1,125 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination
+
+
+class BoundedCursorPagination(CursorPagination):
+    """
+    Paginação por cursor (keyset): a próxima página filtra a partir da última
+    posição vista em vez de usar OFFSET, então a página N custa o mesmo que a 1.
+    O cliente pode pedir ?page_size=, limitado a max_page_size.
+
+    A posição é composta: o valor de todos os campos da ordenação (que termina
+    no id), não só do primeiro como no CursorPagination do DRF. Assim empates
+    no primeiro campo não dependem de offset (nem do offset_cutoff) e grupos
+    grandes de empatados paginam sem repetir nem pular linhas.
+    """
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
+    ordering = "-id"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        if reverse:
+            queryset = queryset.order_by(*[o[1:] if o.startswith("-") else f"-{o}" for o in self.ordering])
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self._after(current_position, reverse))
+
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering) if len(results) > len(self.page) else None
+        )
+
+        # mesma lógica de próximo/anterior do CursorPagination
+        has_position = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = has_position, following_position is not None
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next, self.has_previous = following_position is not None, has_position
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def _after(self, position, reverse):
+        """Linhas depois de `position` na ordem pedida: (a > x) OR (a = x AND b > y) ..."""
+        try:
+            values = json.loads(position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        branches, equal = [], Q()
+        for order, value in zip(self.ordering, values):
+            field = order.lstrip("-")
+            lookup = "lt" if order.startswith("-") != reverse else "gt"
+            branches.append(equal & Q(**{f"{field}__{lookup}": value}))
+            equal &= Q(**{field: value})
+        return reduce(or_, branches)
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for order in ordering:
+            field = order.lstrip("-")
+            values.append(str(instance[field] if isinstance(instance, dict) else getattr(instance, field)))
+        return json.dumps(values)
+
+
+class ServiceRecordPagination(BoundedCursorPagination):
+    # usa os índices (performed_at) e (barber, performed_at)
+    ordering = ("-performed_at", "-id")
+
+
+class AppointmentPagination(BoundedCursorPagination):
+    # usa os índices (start_at) e (barber, start_at)
+    ordering = ("-start_at", "-id")
+
+
+class CreatedAtPagination(BoundedCursorPagination):
+    ordering = ("-created_at", "-id")
+
+
+class ClosedAtPagination(BoundedCursorPagination):
+    ordering = ("-closed_at", "-id")
+
+
+class CustomerPagination(BoundedCursorPagination):
+    # usa o índice (name)
+    ordering = ("name", "id")
+
+
+class CursorOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter que sempre termina a ordenação no id, para a posição do
+    cursor (BoundedCursorPagination) ser única.
+    Campos com NULL não servem para ?ordering= com cursor: a posição vira
+    "None" e o filtro __lt/__gt da próxima página descarta as linhas nulas.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if not ordering or "id" in ordering or "-id" in ordering:
+            return ordering
+        return [*ordering, "-id" if ordering[0].startswith("-") else "id"]
@@ -0,0 +1,257 @@
+"""
+Particionamento mensal (RANGE) das tabelas de histórico no PostgreSQL.
+
+core_servicerecord é particionada por performed_at e finance_payment por
+created_at. Consultas filtradas por período só leem as partições do intervalo
+(partition pruning); índices e VACUUM trabalham partição a partição; meses
+antigos saem com DETACH PARTITION (vira uma tabela comum, pronta para
+pg_dump/DROP) sem DELETE em massa.
+
+Restrições do PostgreSQL que moldam o desenho:
+- a chave primária e os UNIQUE precisam incluir a coluna de partição: no
+  banco a PK vira (id, coluna) e os OneToOne, (campo, coluna). O Django segue
+  usando só o id;
+- FK só pode apontar para UNIQUE completo, então as FKs que apontam para
+  essas tabelas (Payment/Commission.service_record) ficam sem constraint no
+  banco (db_constraint=False): a integridade referencial passa a ser só do
+  ORM. O CASCADE continua sendo feito por ele, mas SQL direto (ou um
+  QuerySet.update no id) pode deixar Payment/Commission órfãos;
+- um UNIQUE de verdade numa coluna só (Payment.service_record,
+  ServiceRecord.appointment) volta como trigger: create_unique_guard.
+
+Fora do PostgreSQL (testes locais) tudo aqui é no-op.
+"""
+import re
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+PARTITIONED_TABLES = {
+    "core_servicerecord": "performed_at",
+    "finance_payment": "created_at",
+}
+
+PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def _add_months(month, n):
+    months = month.year * 12 + month.month - 1 + n
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _bound(month):
+    # limites no fuso do projeto: o mês local inteiro fica na mesma partição
+    return datetime.combine(month, time.min, tzinfo=timezone.get_default_timezone()).isoformat()
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def _create_partition(cursor, table, month):
+    name = partition_name(table, month)
+    start, end = _bound(month), _bound(_add_months(month, 1))
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+
+    stranded = None
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [f"{table}_default"])
+    if cursor.fetchone()[0]:
+        column = PARTITIONED_TABLES[table]
+        stranded = f""""{column}" >= '{start}' AND "{column}" < '{end}'"""
+        cursor.execute(f'SELECT EXISTS (SELECT 1 FROM "{table}_default" WHERE {stranded})')
+        if not cursor.fetchone()[0]:
+            stranded = None
+    if stranded is None:
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" {bounds}')
+        return
+
+    # o mês já tem linhas na DEFAULT (partição não criada a tempo) e PARTITION OF
+    # falharia: cria a tabela solta, move as linhas e anexa (índices vêm do pai)
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM "{table}_default" WHERE {stranded} RETURNING *) '
+        f'INSERT INTO "{name}" SELECT * FROM moved'
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{name}" {bounds}')
+
+
+def is_partitioned(cursor, table):
+    cursor.execute(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))", [table]
+    )
+    return cursor.fetchone()[0]
+
+
+def convert_to_partitioned(schema_editor, table, column, months_ahead=None):
+    """
+    Recria `table` como tabela particionada por mês em `column`, copiando os
+    dados: partições do mês mais antigo até months_ahead meses à frente, mais
+    uma partição DEFAULT para nada ficar sem lugar. Índices, UNIQUE e FKs de
+    saída são recriados com os mesmos nomes. Usado pelas migrações.
+    """
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+
+    with connection.cursor() as cursor:
+        if is_partitioned(cursor, table):
+            return
+
+        cursor.execute(
+            """
+            SELECT pg_get_indexdef(i.indexrelid), con.conname, con.contype, pg_get_constraintdef(con.oid)
+            FROM pg_index i
+            LEFT JOIN pg_constraint con ON con.conindid = i.indexrelid AND con.conrelid = i.indrelid
+            WHERE i.indrelid = %s::regclass AND NOT i.indisprimary
+            """,
+            [table],
+        )
+        indexes = cursor.fetchall()
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min("{column}") FROM "{table}"')
+        oldest = cursor.fetchone()[0]
+
+        old = f"{table}_unpartitioned"
+        cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{old}"')
+        cursor.execute(
+            f'CREATE TABLE "{table}" (LIKE "{old}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE ("{column}")'
+        )
+
+        current = timezone.localdate().replace(day=1)
+        month = timezone.localtime(oldest).date().replace(day=1) if oldest else current
+        while month <= _add_months(current, months_ahead):
+            _create_partition(cursor, table, month)
+            month = _add_months(month, 1)
+        cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+        cursor.execute(f'INSERT INTO "{table}" SELECT * FROM "{old}"')
+        cursor.execute(f'DROP TABLE "{old}"')
+        # nomes de PK/índices/sequência só ficam livres depois do DROP
+        cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_pkey" PRIMARY KEY ("id", "{column}")')
+
+        # id: sequência própria (a identity da tabela antiga foi junto com ela)
+        cursor.execute(f'CREATE SEQUENCE "{table}_id_seq" OWNED BY "{table}"."id"')
+        cursor.execute(f"""SELECT setval('"{table}_id_seq"', COALESCE((SELECT max(id) FROM "{table}"), 0) + 1, false)""")
+        cursor.execute(f"""ALTER TABLE "{table}" ALTER COLUMN "id" SET DEFAULT nextval('"{table}_id_seq"')""")
+
+        for indexdef, conname, contype, condef in indexes:
+            if contype == "u":
+                condef = re.sub(r"\)$", f', "{column}")', condef)
+                cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{conname}" {condef}')
+            elif indexdef.startswith("CREATE UNIQUE"):
+                cursor.execute(re.sub(r"\)( WHERE .*)?$", rf', "{column}")\1', indexdef, count=1))
+            else:
+                cursor.execute(indexdef)
+        for conname, condef in foreign_keys:
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{conname}" {condef}')
+
+
+def create_unique_guard(schema_editor, table, column):
+    """
+    UNIQUE(column) na tabela particionada inteira: trigger BEFORE INSERT/UPDATE
+    que serializa por valor (advisory lock até o fim da transação) e recusa
+    duplicata com unique_violation, então o Django vê IntegrityError como com
+    a constraint. Usado pelas migrações.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    name = f"{table}_{column}_unique"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE OR REPLACE FUNCTION "{name}"() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtextextended('{table}.{column}:' || NEW."{column}", 0));
+                IF EXISTS (SELECT 1 FROM "{table}" WHERE "{column}" = NEW."{column}" AND "id" <> NEW."id") THEN
+                    RAISE unique_violation USING
+                        MESSAGE = 'duplicate key value violates unique constraint "{name}"',
+                        DETAIL = format('Key ({column})=(%s) already exists.', NEW."{column}");
+                END IF;
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{name}" ON "{table}"')
+        cursor.execute(
+            f'CREATE TRIGGER "{name}" BEFORE INSERT OR UPDATE OF "{column}" ON "{table}" '
+            f'FOR EACH ROW WHEN (NEW."{column}" IS NOT NULL) EXECUTE FUNCTION "{name}"()'
+        )
+
+
+def drop_unique_guard(schema_editor, table, column):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    name = f"{table}_{column}_unique"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{name}" ON "{table}"')
+        cursor.execute(f'DROP FUNCTION IF EXISTS "{name}"()')
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Cria as partições do mês atual até months_ahead meses à frente. Devolve as
+    criadas. Linhas que já caíram na DEFAULT vão para a partição nova.
+    """
+    if connection.vendor != "postgresql":
+        return []
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+
+    current = timezone.localdate().replace(day=1)
+    created = []
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(cursor, table):
+                continue
+            existing = set(list_partitions(table))
+            for n in range(months_ahead + 1):
+                month = _add_months(current, n)
+                name = partition_name(table, month)
+                if name not in existing:
+                    with transaction.atomic():
+                        _create_partition(cursor, table, month)
+                    created.append(name)
+    return created
+
+
+def list_partitions(table):
+    """Partições mensais de `table` (nome -> primeiro dia do mês), sem a DEFAULT."""
+    if connection.vendor != "postgresql":
+        return {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits JOIN pg_class c ON c.oid = inhrelid WHERE inhparent = to_regclass(%s)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    partitions = {}
+    for name in sorted(names):
+        match = PARTITION_SUFFIX.search(name)
+        if match:
+            partitions[name] = date(int(match[1]), int(match[2]), 1)
+    return partitions
+
+
+def detach_partitions(before):
+    """
+    Desanexa as partições de meses anteriores a `before` (date): os dados
+    saem das consultas da aplicação e a tabela fica solta para arquivar.
+    """
+    if connection.vendor != "postgresql":
+        return []
+    detached = []
+    with connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            for name, month in list_partitions(table).items():
+                if month < before.replace(day=1):
+                    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                    detached.append(name)
+    return detached
@@ -1,6 +1,12 @@
 from rest_framework.permissions import BasePermission
 
 def get_role(user) -> str:
+    """
+    Role do usuário. Com ProfileJWTAuthentication o profile já vem no JOIN da
+    autenticação; em outros caminhos (sessão/admin) o Django cacheia o profile
+    no objeto após o primeiro acesso. Em ambos os casos, uma chamada por
+    permissão/objeto não gera consulta nova.
+    """
     if not user or not user.is_authenticated:
         return ""
     if hasattr(user, "profile"):
@@ -12,6 +18,10 @@ class IsManagerOrAdmin(BasePermission):
         role = get_role(request.user)
         return role in ("MANAGER", "ADMIN")
 
+class IsAdmin(BasePermission):
+    def has_permission(self, request, view):
+        return get_role(request.user) == "ADMIN"
+
 class IsOwnerOrManagerAdmin(BasePermission):
     def has_object_permission(self, request, view, obj):
         role = get_role(request.user)
@@ -0,0 +1,151 @@
+"""
+Instrumentação de SQL por requisição, amostrada.
+
+Uma fração das requisições (QUERY_PROFILING_SAMPLE_RATE) roda com um
+connection.execute_wrapper que mede consultas, tempo de banco e as instruções
+mais lentas. A resposta ganha um cabeçalho Server-Timing (db, app, total) e a
+amostra vai para o cache compartilhado, agregada por rota (padrão da URL, não o
+caminho concreto). A mesma instrução repetida várias vezes numa requisição
+(mesmo SQL, parâmetros diferentes) é marcada como provável N+1.
+
+Gravações no cache são get/set sem lock: com amostragem, perder uma amostra
+numa corrida entre workers não muda os percentis.
+Em respostas em streaming só entra o que rodou antes do primeiro byte.
+"""
+import heapq
+import random
+import statistics
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .benchmark import QueryRecorder, percentile, route_to_path
+
+ROUTES_KEY = "profiling:routes"
+ROUTE_KEY = "profiling:route:{route}"  # rota "GET /api/x/" (espaço trocado por ":" na chave)
+MAX_SAMPLES = 500
+SLOWEST = 5
+
+
+def _route_key(route):
+    return ROUTE_KEY.format(route=route.replace(" ", ":"))
+
+
+class StatementRecorder(QueryRecorder):
+    """QueryRecorder que guarda também as instruções mais lentas e quantas vezes cada SQL rodou."""
+
+    def __init__(self):
+        super().__init__()
+        self.statements = Counter()
+        self.slowest = []  # heap (ms, sql) com as SLOWEST mais lentas
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return super().__call__(execute, sql, params, many, context)
+        finally:
+            ms = round((time.perf_counter() - start) * 1000, 3)
+            self.statements[sql] += 1
+            if len(self.slowest) < SLOWEST:
+                heapq.heappush(self.slowest, (ms, sql))
+            else:
+                heapq.heappushpop(self.slowest, (ms, sql))
+
+    def repeated(self, threshold=None):
+        """[(sql, vezes)] das instruções repetidas ao menos `threshold` vezes (provável N+1)."""
+        threshold = threshold or settings.QUERY_PROFILING_N_PLUS_ONE_THRESHOLD
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+def build_profile(recorder, elapsed):
+    total_ms = elapsed * 1000
+    db_ms = recorder.time * 1000
+    return {
+        "total_ms": round(total_ms, 3),
+        "db_ms": round(db_ms, 3),
+        "python_ms": round(max(total_ms - db_ms, 0.0), 3),
+        "queries": recorder.count,
+        "slowest": [{"ms": ms, "sql": sql} for ms, sql in sorted(recorder.slowest, reverse=True)],
+        "repeated": [{"sql": sql, "count": n} for sql, n in recorder.repeated()],
+    }
+
+
+def server_timing(profile):
+    return (
+        f'db;dur={profile["db_ms"]};desc="{profile["queries"]} queries", '
+        f'app;dur={profile["python_ms"]}, '
+        f'total;dur={profile["total_ms"]}'
+    )
+
+
+def record_profile(route, profile):
+    key = _route_key(route)
+    data = cache.get(key) or {"samples": [], "n_plus_one": 0, "slowest": [], "repeated": {}}
+    data["samples"] = (data["samples"] + [(profile["total_ms"], profile["db_ms"], profile["queries"])])[-MAX_SAMPLES:]
+    if profile["repeated"]:
+        data["n_plus_one"] += 1
+        for statement in profile["repeated"]:
+            data["repeated"][statement["sql"]] = max(data["repeated"].get(statement["sql"], 0), statement["count"])
+    data["slowest"] = sorted(data["slowest"] + profile["slowest"], key=lambda s: -s["ms"])[:SLOWEST]
+    cache.set(key, data, timeout=None)
+
+    routes = cache.get(ROUTES_KEY) or set()
+    if route not in routes:
+        cache.set(ROUTES_KEY, routes | {route}, timeout=None)
+
+
+def route_stats():
+    """Percentis por rota (das últimas MAX_SAMPLES amostras), da maior p95 para a menor."""
+    routes = sorted(cache.get(ROUTES_KEY) or ())
+    found = cache.get_many([_route_key(r) for r in routes])
+    stats = []
+    for route in routes:
+        data = found.get(_route_key(route))
+        if not data or not data["samples"]:
+            continue
+        total, db, queries = zip(*data["samples"])
+        stats.append({
+            "route": route,
+            "samples": len(total),
+            "total_ms": {p: percentile(total, n) for p, n in (("p50", 50), ("p95", 95), ("p99", 99))},
+            "db_ms": {"p50": percentile(db, 50), "p95": percentile(db, 95)},
+            "queries": {"avg": round(statistics.mean(queries), 1), "max": max(queries)},
+            "n_plus_one": data["n_plus_one"],
+            "repeated": [
+                {"sql": sql, "count": n}
+                for sql, n in sorted(data["repeated"].items(), key=lambda item: -item[1])[:SLOWEST]
+            ],
+            "slowest": data["slowest"],
+        })
+    stats.sort(key=lambda s: -s["total_ms"]["p95"])
+    return stats
+
+
+def clear_stats():
+    routes = cache.get(ROUTES_KEY) or ()
+    cache.delete_many([ROUTES_KEY, *(_route_key(r) for r in routes)])
+
+
+class QueryProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.QUERY_PROFILING_SAMPLE_RATE
+        if rate <= 0 or random.random() >= rate:
+            return self.get_response(request)
+
+        recorder = StatementRecorder()
+        start = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        profile = build_profile(recorder, time.perf_counter() - start)
+
+        response["Server-Timing"] = server_timing(profile)
+        match = getattr(request, "resolver_match", None)
+        if match is not None:
+            record_profile(f"{request.method} {route_to_path(match.route)}", profile)
+        return response
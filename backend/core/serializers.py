@@ -1,10 +1,16 @@
 from rest_framework import serializers
+from django.contrib.auth import get_user_model
 from django.utils import timezone
 from decimal import Decimal
 
 from .models import Service, ServiceRecord
+from .permissions import get_role
 from customers.models import Customer  # se você usa Customer aqui
 from finance.models import PaymentMethod  # precisa existir no finance/models.py
+from scheduling.models import Appointment, AppointmentSeries
+from scheduling.recurrence import is_occurrence
+
+User = get_user_model()
 
 
 class ServiceSerializer(serializers.ModelSerializer):
@@ -19,6 +25,9 @@ class ServiceRecordCreateSerializer(serializers.ModelSerializer):
     """
     payment_method = serializers.ChoiceField(choices=PaymentMethod.choices, write_only=True)
     payment_amount = serializers.DecimalField(max_digits=10, decimal_places=2, write_only=True, required=False)
+    # atendimento de uma ocorrência de série ainda não gravada (vira Appointment DONE)
+    series = serializers.PrimaryKeyRelatedField(queryset=AppointmentSeries.objects.all(), write_only=True, required=False)
+    occurrence_start = serializers.DateTimeField(write_only=True, required=False)
 
     class Meta:
         model = ServiceRecord
@@ -33,8 +42,11 @@ class ServiceRecordCreateSerializer(serializers.ModelSerializer):
             "notes",
             "payment_method",
             "payment_amount",
+            "series",
+            "occurrence_start",
         ]
         read_only_fields = ["id"]
+        extra_kwargs = {"performed_at": {"required": False}}  # validate() assume agora
 
     def validate_performed_at(self, value):
         if value and value > timezone.now() + timezone.timedelta(minutes=5):
@@ -57,13 +69,105 @@ class ServiceRecordCreateSerializer(serializers.ModelSerializer):
         if Decimal(str(attrs["price_charged"])) <= Decimal("0"):
             raise serializers.ValidationError("price_charged deve ser > 0.")
 
+        series, occurrence_start = attrs.get("series"), attrs.get("occurrence_start")
+        if series or occurrence_start:
+            if not (series and occurrence_start):
+                raise serializers.ValidationError("Informe series e occurrence_start juntos.")
+            if attrs.get("appointment"):
+                raise serializers.ValidationError("Use appointment ou series/occurrence_start, não os dois.")
+            if not is_occurrence(series, occurrence_start):
+                raise serializers.ValidationError("occurrence_start não é uma ocorrência da série.")
+            if Appointment.objects.filter(
+                series=series, occurrence_start=occurrence_start, service_record__isnull=False,
+            ).exists():
+                raise serializers.ValidationError("Ocorrência já possui registro.")
+
         return attrs
 
+    def create(self, validated_data):
+        # pagamento e ocorrência são tratados por register_service_sale, não são campos do model
+        for name in ("payment_method", "payment_amount", "series", "occurrence_start"):
+            validated_data.pop(name, None)
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        for name in ("payment_method", "payment_amount", "series", "occurrence_start"):
+            validated_data.pop(name, None)
+        return super().update(instance, validated_data)
+
+
+class ServiceSaleBulkItemSerializer(ServiceRecordCreateSerializer):
+    """
+    Item do lançamento em lote. As FKs chegam como ids simples e são
+    resolvidas pelo ServiceSaleBulkSerializer com uma consulta por tabela.
+    """
+    barber = serializers.IntegerField(required=False)
+    service = serializers.IntegerField()
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    appointment = serializers.IntegerField(required=False, allow_null=True)
+    # lote não atende ocorrências de série: só appointment já gravado
+    series = None
+    occurrence_start = None
+
+    class Meta(ServiceRecordCreateSerializer.Meta):
+        fields = [f for f in ServiceRecordCreateSerializer.Meta.fields if f not in ("series", "occurrence_start")]
+
+
+class ServiceSaleBulkSerializer(serializers.Serializer):
+    """
+    Lançamento em lote (fechamento do dia). Erros voltam por item em
+    {"sales": [{...}, {}, ...]}, na mesma ordem do envio.
+    """
+    MAX_ITEMS = 500
+
+    sales = ServiceSaleBulkItemSerializer(many=True, allow_empty=False, max_length=MAX_ITEMS)
+
+    def validate_sales(self, sales):
+        request = self.context["request"]
+        if get_role(request.user) not in ("MANAGER", "ADMIN"):
+            # barbeiro não pode registrar para outro barbeiro
+            for sale in sales:
+                sale["barber"] = request.user.id
+
+        ids = {name: {s[name] for s in sales if s.get(name)} for name in ("barber", "service", "customer", "appointment")}
+        services = set(Service.objects.filter(id__in=ids["service"]).values_list("id", flat=True))
+        barbers = set(User.objects.filter(id__in=ids["barber"]).values_list("id", flat=True))
+        customers = set(Customer.objects.filter(id__in=ids["customer"]).values_list("id", flat=True))
+        appointments = set(
+            Appointment.objects.filter(id__in=ids["appointment"], service_record__isnull=True)
+            .values_list("id", flat=True)
+        )
+
+        errors = []
+        seen_appointments = set()
+        for sale in sales:
+            item = {}
+            if not sale.get("barber"):
+                item["barber"] = ["Este campo é obrigatório."]
+            elif sale["barber"] not in barbers:
+                item["barber"] = ["Barbeiro não existe."]
+            if sale["service"] not in services:
+                item["service"] = ["Serviço não existe."]
+            if sale.get("customer") and sale["customer"] not in customers:
+                item["customer"] = ["Cliente não existe."]
+            appointment = sale.get("appointment")
+            if appointment:
+                if appointment not in appointments:
+                    item["appointment"] = ["Agendamento não existe ou já possui registro."]
+                elif appointment in seen_appointments:
+                    item["appointment"] = ["Agendamento repetido no lote."]
+                seen_appointments.add(appointment)
+            errors.append(item)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return sales
+
 
 class ServiceRecordSerializer(serializers.ModelSerializer):
     barber_username = serializers.CharField(source="barber.username", read_only=True)
     service_name = serializers.CharField(source="service.name", read_only=True)
-    customer_name = serializers.CharField(source="customer.name", read_only=True)
+    customer_name = serializers.CharField(source="customer.name", read_only=True, allow_null=True)
 
     payment_method = serializers.CharField(source="payment.method", read_only=True)
     payment_amount = serializers.DecimalField(source="payment.amount", max_digits=10, decimal_places=2, read_only=True)
@@ -89,3 +193,64 @@ class ServiceRecordSerializer(serializers.ModelSerializer):
             "commission_amount",
         ]
         read_only_fields = ["id", "created_at", "payment_method", "payment_amount", "commission_amount"]
+
+
+# Caminho compacto de leitura: monta o mesmo JSON do ServiceRecordSerializer
+# direto de linhas .values(), sem instanciar models nem serializers por linha.
+SERVICE_RECORD_VALUE_FIELDS = (
+    "id", "barber_id", "barber__username", "service_id", "service__name",
+    "customer_id", "customer__name", "appointment_id", "price_charged",
+    "performed_at", "notes", "created_at",
+    "payment__method", "payment__amount", "commission__commission_amount",
+)
+
+_money = serializers.DecimalField(max_digits=10, decimal_places=2)
+_datetime = serializers.DateTimeField()
+
+
+def _optional(field, value):
+    return None if value is None else field.to_representation(value)
+
+
+def service_record_rows(rows):
+    """
+    Converte linhas de ServiceRecord.objects.values(*SERVICE_RECORD_VALUE_FIELDS)
+    no formato de ServiceRecordSerializer.
+    """
+    return [
+        {
+            "id": row["id"],
+            "barber": row["barber_id"],
+            "barber_username": row["barber__username"],
+            "service": row["service_id"],
+            "service_name": row["service__name"],
+            "customer": row["customer_id"],
+            "customer_name": row["customer__name"],
+            "appointment": row["appointment_id"],
+            "price_charged": _money.to_representation(row["price_charged"]),
+            "performed_at": _datetime.to_representation(row["performed_at"]),
+            "notes": row["notes"],
+            "created_at": _datetime.to_representation(row["created_at"]),
+            "payment_method": row["payment__method"],
+            "payment_amount": _optional(_money, row["payment__amount"]),
+            "commission_amount": _optional(_money, row["commission__commission_amount"]),
+        }
+        for row in rows
+    ]
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    """Filtros da exportação; datas locais e inclusivas (padrão: mês atual)."""
+    output = serializers.ChoiceField(choices=["csv", "xlsx"], default="csv")
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    barber = serializers.IntegerField(required=False)
+    cash_session = serializers.IntegerField(required=False)
+
+    def validate(self, attrs):
+        today = timezone.localdate()
+        attrs.setdefault("date_from", today.replace(day=1))
+        attrs.setdefault("date_to", today)
+        if attrs["date_to"] < attrs["date_from"]:
+            raise serializers.ValidationError("date_to precisa ser maior ou igual a date_from.")
+        return attrs
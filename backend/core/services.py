@@ -1,17 +1,25 @@
 from django.db import transaction
 from decimal import Decimal
 
-from finance.models import Payment
+from customers.services import add_records_to_customer_stats
+from dashboard.cache import invalidate_dashboards
+from dashboard.services import add_records_to_rollup
+from finance.models import Commission, Payment
 from finance.utils import get_open_cash_session
-from finance.services import create_or_update_commission
+from finance.services import add_to_cash_totals, build_commissions, create_or_update_commission
 from scheduling.models import Appointment
+from scheduling.recurrence import materialize_occurrence
+from .models import ServiceRecord
 
 
 @transaction.atomic
-def register_service_sale(*, service_record, payment_method: str, payment_amount: Decimal, created_by):
+def register_service_sale(*, service_record, payment_method: str, payment_amount: Decimal, created_by,
+                          series=None, occurrence_start=None):
     """
     Cria Payment + Commission em transação.
     Exige caixa aberto.
+    Com series/occurrence_start, grava a ocorrência da série como Appointment
+    e a vincula ao registro.
     """
     cash_session = get_open_cash_session()
     if not cash_session:
@@ -24,10 +32,68 @@ def register_service_sale(*, service_record, payment_method: str, payment_amount
         cash_session=cash_session,
         created_by=created_by,
     )
+    add_to_cash_totals(cash_session.id, payments=payment_amount)
 
     create_or_update_commission(service_record)
 
+    if series is not None:
+        service_record.appointment = materialize_occurrence(series, occurrence_start, created_by=created_by)
+        service_record.save(update_fields=["appointment"])
+
     if getattr(service_record, "appointment_id", None):
         Appointment.objects.filter(id=service_record.appointment_id).update(status=Appointment.Status.DONE)
 
     return service_record
+
+
+@transaction.atomic
+def register_service_sales_bulk(*, sales, created_by):
+    """
+    Versão em lote de register_service_sale (tudo ou nada).
+    Resolve o caixa aberto uma vez só (comissões vêm do resolver em memória) e grava
+    registros, pagamentos e comissões com bulk_create.
+
+    sales: itens validados de ServiceSaleBulkSerializer (FKs como ids).
+    """
+    cash_session = get_open_cash_session()
+    if not cash_session:
+        raise ValueError("Não existe caixa aberto. Abra o caixa para registrar vendas.")
+
+    records = ServiceRecord.objects.bulk_create([
+        ServiceRecord(
+            barber_id=sale["barber"],
+            service_id=sale["service"],
+            customer_id=sale.get("customer"),
+            appointment_id=sale.get("appointment"),
+            price_charged=sale["price_charged"],
+            performed_at=sale["performed_at"],
+            notes=sale.get("notes", ""),
+        )
+        for sale in sales
+    ])
+
+    Payment.objects.bulk_create([
+        Payment(
+            service_record=record,
+            method=sale["payment_method"],
+            amount=sale["payment_amount"],
+            cash_session=cash_session,
+            created_by=created_by,
+        )
+        for record, sale in zip(records, sales)
+    ])
+    add_to_cash_totals(cash_session.id, payments=sum(sale["payment_amount"] for sale in sales))
+
+    Commission.objects.bulk_create(build_commissions(records))
+
+    appointment_ids = [r.appointment_id for r in records if r.appointment_id]
+    if appointment_ids:
+        Appointment.objects.filter(id__in=appointment_ids).update(status=Appointment.Status.DONE)
+
+    # bulk_create não dispara os sinais que mantêm o rollup, as estatísticas
+    # dos clientes e o cache do dashboard
+    add_records_to_rollup(records)
+    add_records_to_customer_stats(records)
+    invalidate_dashboards({r.barber_id for r in records})
+
+    return records
@@ -0,0 +1,25 @@
+from django.db.models.signals import pre_save
+from django.dispatch import receiver
+
+from .models import ServiceRecord
+
+# campos que os rollups (dashboard) e as estatísticas de cliente comparam
+TRACKED_FIELDS = ("performed_at", "barber_id", "service_id", "customer_id", "price_charged")
+TRACKED_NAMES = {name for field in TRACKED_FIELDS for name in (field, field.removesuffix("_id"))}
+
+
+@receiver(pre_save, sender=ServiceRecord)
+def remember_previous_state(sender, instance, update_fields=None, **kwargs):
+    """
+    Estado anterior do ServiceRecord em instance._previous (None na criação),
+    lido no post_save por dashboard e customers: uma consulta por save para
+    todos. Save com update_fields fora de TRACKED_FIELDS (ex.: só appointment)
+    não consulta: o anterior é o estado atual.
+    """
+    instance._previous = None
+    if not instance.pk:
+        return
+    if update_fields is not None and TRACKED_NAMES.isdisjoint(update_fields):
+        instance._previous = {field: getattr(instance, field) for field in TRACKED_FIELDS}
+        return
+    instance._previous = ServiceRecord.objects.filter(pk=instance.pk).values(*TRACKED_FIELDS).first()
@@ -1,3 +1,485 @@
-from django.test import TestCase
+import csv
+import io
+import zipfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Profile
+from core.benchmark import discover_endpoints, run_benchmark
+from core.models import Service, ServiceRecord
+from core.partitions import _add_months, ensure_partitions, list_partitions, partition_name
+from core.profiling import StatementRecorder
+from core.serializers import ServiceRecordSerializer
+from customers.models import Customer
+from finance.models import CashSession, Commission, Payment, PaymentMethod
+from scheduling.models import Appointment
+
+User = get_user_model()
+
+
+class ServiceRecordListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+
+        cls.service = Service.objects.create(name="Corte", default_price=Decimal("35.00"))
+        cls.customer = Customer.objects.create(name="João Silva")
+        cls.cash = CashSession.objects.create(opened_by=cls.manager)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def make_record(self, *, customer=None, paid=True):
+        record = ServiceRecord.objects.create(
+            barber=self.manager,
+            service=self.service,
+            customer=customer,
+            price_charged=Decimal("35.00"),
+            performed_at=timezone.now(),
+        )
+        if paid:
+            Payment.objects.create(
+                service_record=record, method=PaymentMethod.PIX, amount=record.price_charged,
+                cash_session=self.cash, created_by=self.manager,
+            )
+            Commission.objects.create(
+                service_record=record, barber=self.manager,
+                base_amount=record.price_charged, commission_amount=Decimal("17.50"),
+            )
+        return record
+
+    def list_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/service-records/")
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_compact_list_matches_serializer(self):
+        self.make_record(customer=self.customer)
+        self.make_record(paid=False)
+
+        response = self.client.get("/api/service-records/")
+
+        expected = ServiceRecordSerializer(
+            ServiceRecord.objects.select_related("payment", "commission").order_by("-performed_at", "-id"),
+            many=True,
+        ).data
+        self.assertEqual(response.json()["results"], expected)
+
+    def test_list_query_count_is_constant(self):
+        self.make_record()
+        one = self.list_queries()
+
+        for _ in range(30):
+            self.make_record(customer=self.customer)
+        self.assertEqual(self.list_queries(), one)
+
+    def test_detail_fetches_payment_and_commission_with_record(self):
+        record = self.make_record()
+        with self.assertNumQueries(1):
+            response = self.client.get(f"/api/service-records/{record.id}/")
+        self.assertEqual(response.json()["payment_method"], PaymentMethod.PIX)
+        self.assertEqual(response.json()["commission_amount"], "17.50")
+
+
+class ServiceRecordPreviousStateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+        cls.customer = Customer.objects.create(name="João")
+
+    def previous_reads(self, record, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            record.save(**kwargs)
+        return [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and "core_servicerecord" in q["sql"]]
+
+    def test_one_snapshot_read_per_save_shared_by_rollups(self):
+        record = ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, customer=self.customer,
+            price_charged=Decimal("30.00"), performed_at=timezone.now(),
+        )
+
+        record.price_charged = Decimal("45.00")
+        self.assertEqual(len(self.previous_reads(record)), 1)
+        self.customer.refresh_from_db()
+        self.assertEqual(self.customer.total_spent, Decimal("45.00"))
+
+        # materialização de série: só appointment muda, nada a ler
+        self.assertEqual(self.previous_reads(record, update_fields=["appointment"]), [])
+        self.customer.refresh_from_db()
+        self.assertEqual((self.customer.visits_count, self.customer.total_spent), (1, Decimal("45.00")))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BenchmarkGuardTests(TestCase):
+    """
+    Roda o benchmark_api sobre um dataset pequeno: nenhum endpoint de lista
+    pode variar o número de consultas com o tamanho da página (N+1).
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def test_no_list_endpoint_has_n_plus_one(self):
+        call_command("seed_initial", barbers=3, customers=20, records=60, appointments=30, stdout=StringIO())
+        manager = User.objects.get(username="gerente")
+
+        results = run_benchmark(manager, iterations=1, warmup=0)
+
+        self.assertTrue(results)
+        for path, result in results.items():
+            with self.subTest(path=path):
+                self.assertEqual(result["status"], 200)
+                self.assertFalse(result.get("n_plus_one"), result)
+
+
+class SeedInitialTests(TestCase):
+    def test_generated_appointments_never_overlap(self):
+        # janela curta e volume alto para forçar colisões; a segunda rodada soma ao que já existe
+        for seed in (1, 2):
+            call_command("seed_initial", barbers=2, customers=5, appointments=300, days=2, random_seed=seed, stdout=StringIO())
+
+        active = (
+            Appointment.objects.exclude(status__in=[Appointment.Status.CANCELED, Appointment.Status.NO_SHOW])
+            .order_by("barber_id", "start_at")
+            .values_list("barber_id", "start_at", "end_at")
+        )
+        self.assertGreater(len(active), 50)
+        for (barber, _, end), (next_barber, next_start, _) in zip(active, active[1:]):
+            if barber == next_barber:
+                self.assertLessEqual(end, next_start)
+
+    def test_generated_sales_spread_over_closed_daily_sessions(self):
+        call_command("seed_initial", barbers=2, customers=5, records=300, days=10, random_seed=1, stdout=StringIO())
+
+        payments = Payment.objects.select_related("service_record", "cash_session")
+        self.assertEqual(payments.count(), 300)
+        for payment in payments:
+            self.assertEqual(payment.created_at, payment.service_record.performed_at)
+            session = payment.cash_session
+            if session.closed_at is not None:
+                self.assertLessEqual(session.opened_at, payment.created_at)
+                self.assertLess(payment.created_at, session.closed_at)
+        self.assertFalse(Commission.objects.exclude(created_at=F("service_record__performed_at")).exists())
+
+        closed = CashSession.objects.filter(closed_at__isnull=False).select_related("report")
+        self.assertGreaterEqual(closed.count(), 9)
+        for session in closed:
+            total = session.payments.aggregate(total=Sum("amount"))["total"]
+            self.assertEqual(session.payments_total, total)
+            self.assertEqual(session.report.payments_total, total)
+            self.assertEqual(session.report.difference, 0)
+
+
+@skipUnless(connection.vendor == "postgresql", "EXPLAIN do PostgreSQL")
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class QueryPlanTests(TestCase):
+    """
+    Toda consulta dos endpoints de lista e do dashboard precisa ter um índice
+    que a atenda. Com enable_seqscan = off o planejador só escolhe Seq Scan
+    quando não existe alternativa, então o resultado não depende do volume do
+    dataset de teste: o que aparece aqui vira Seq Scan na escala do benchmark.
+    """
+    # tabelas que crescem com o uso (as de cadastro, pequenas, podem ser varridas)
+    LARGE_TABLES = (
+        "core_servicerecord", "finance_payment", "finance_commission", "finance_cashentry",
+        "scheduling_appointment", "customers_customer", "dashboard_dailyrevenue",
+    )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_and_dashboard_queries_use_indexes(self):
+        call_command("seed_initial", barbers=3, customers=20, records=60, appointments=30, stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(User.objects.get(username="gerente"))
+
+        paths = [e["path"] for e in discover_endpoints() if e["list"] or e["path"].startswith("/api/dashboard/")]
+        with connection.cursor() as cursor:
+            cursor.execute("SET enable_seqscan = off")
+        try:
+            for path in paths:
+                with CaptureQueriesContext(connection) as ctx:
+                    response = client.get(path)
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                for query in ctx.captured_queries:
+                    if not query["sql"].lstrip().upper().startswith("SELECT"):
+                        continue
+                    with connection.cursor() as cursor:
+                        cursor.execute("EXPLAIN " + query["sql"])
+                        plan = "\n".join(row[0] for row in cursor.fetchall())
+                    with self.subTest(path=path, sql=query["sql"][:200]):
+                        seq_scans = [
+                            line.strip() for line in plan.splitlines()
+                            if "Seq Scan on" in line and any(f" {t}" in line for t in self.LARGE_TABLES)
+                        ]
+                        self.assertEqual(seq_scans, [], plan)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("RESET enable_seqscan")
+
+
+class ServiceSaleBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte", default_price=Decimal("35.00"))
+        CashSession.objects.create(opened_by=cls.manager)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def sale(self, **overrides):
+        return {
+            "barber": self.barber.id,
+            "service": self.service.id,
+            "price_charged": "35.00",
+            "payment_method": PaymentMethod.CASH,
+            **overrides,
+        }
+
+    def post(self, sales):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/service-records/bulk/", {"sales": sales}, format="json")
+        return response, len(ctx.captured_queries)
+
+    def test_creates_records_payments_and_commissions(self):
+        self.post([self.sale()])  # cria a linha do rollup do dia
+        response, small = self.post([self.sale()])
+        self.assertEqual(response.status_code, 201)
+
+        response, large = self.post([self.sale() for _ in range(25)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 25)
+        self.assertEqual(large, small)
+
+        self.assertEqual(ServiceRecord.objects.count(), 27)
+        self.assertEqual(Payment.objects.count(), 27)
+        self.assertEqual(
+            set(Commission.objects.values_list("commission_amount", flat=True)), {Decimal("17.50")}
+        )
+
+    def test_any_invalid_item_rejects_the_whole_batch(self):
+        response, _ = self.post([self.sale(), self.sale(service=999)])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["sales"][0], {})
+        self.assertIn("service", response.json()["sales"][1])
+        self.assertFalse(ServiceRecord.objects.exists())
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ServiceRecordExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte & Barba", default_price=Decimal("35.00"))
+        CashSession.objects.create(opened_by=cls.manager)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        sales = [
+            {"barber": barber.id, "service": self.service.id, "price_charged": "35.00", "payment_method": PaymentMethod.PIX}
+            for barber in (self.manager, self.barber, self.barber)
+        ]
+        self.client.post("/api/service-records/bulk/", {"sales": sales}, format="json")
+        self.today = timezone.localdate().isoformat()
+
+    def export(self, **params):
+        response = self.client.get("/api/exports/service-records/", {"date_from": self.today, "date_to": self.today, **params})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_joins_payment_and_commission(self):
+        _, body = self.export(barber=self.barber.id)
+
+        rows = list(csv.reader(io.StringIO(body.decode("utf-8-sig"))))
+        self.assertEqual(rows[0][:3], ["id", "data", "barbeiro"])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({r[2] for r in rows[1:]}, {"barbeiro"})
+        self.assertEqual(rows[1][6:8], ["PIX", "35.00"])
+        self.assertEqual(rows[1][9], "17.50")
+
+    def test_xlsx_is_a_valid_workbook(self):
+        response, body = self.export(output="xlsx")
+
+        self.assertIn("spreadsheetml", response["Content-Type"])
+        with zipfile.ZipFile(io.BytesIO(body)) as workbook:
+            self.assertIsNone(workbook.testzip())
+            sheet = workbook.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 4)
+        self.assertIn("Corte &amp; Barba", sheet)
+
+    def test_barber_cannot_export(self):
+        self.client.force_authenticate(self.barber)
+        self.assertEqual(self.client.get("/api/exports/service-records/").status_code, 403)
+
+
+@skipUnless(connection.vendor == "postgresql", "particionamento só no PostgreSQL")
+class PartitionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+
+    def month_range(self, month):
+        tz = timezone.get_default_timezone()
+        return datetime.combine(month, time.min, tzinfo=tz), datetime.combine(_add_months(month, 1), time.min, tzinfo=tz)
+
+    def test_period_queries_read_only_their_partition(self):
+        month = timezone.localdate().replace(day=1)
+        start, end = self.month_range(month)
+
+        plan = ServiceRecord.objects.filter(performed_at__gte=start, performed_at__lt=end).explain()
+
+        self.assertIn(partition_name("core_servicerecord", month), plan)
+        self.assertNotIn(partition_name("core_servicerecord", _add_months(month, 1)), plan)
+        self.assertNotIn("core_servicerecord_default", plan)
+
+    def test_orm_and_cascade_work_across_partitions(self):
+        record = ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, price_charged=Decimal("30.00"), performed_at=timezone.now(),
+        )
+        Payment.objects.create(service_record=record, method=PaymentMethod.PIX, amount=Decimal("30.00"), created_by=self.barber)
+
+        ServiceRecord.objects.filter(pk=record.pk).update(performed_at=self.month_range(_add_months(timezone.localdate(), -2))[0])
+        self.assertEqual(ServiceRecord.objects.get(pk=record.pk).payment.amount, Decimal("30.00"))
+
+        record.delete()
+        self.assertFalse(Payment.objects.exists())
+
+    def test_payment_stays_unique_per_service_record(self):
+        record = ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, price_charged=Decimal("30.00"), performed_at=timezone.now(),
+        )
+        Payment.objects.create(service_record=record, method=PaymentMethod.PIX, amount=Decimal("30.00"), created_by=self.barber)
+
+        # created_at diferente: o UNIQUE (service_record_id, created_at) das partições não pegaria
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Payment.objects.create(service_record=record, method=PaymentMethod.CASH, amount=Decimal("30.00"), created_by=self.barber)
+        self.assertEqual(Payment.objects.filter(service_record=record).count(), 1)
+
+    def test_service_record_stays_unique_per_appointment(self):
+        customer = Customer.objects.create(name="João")
+        start = timezone.now()
+        appointment = Appointment.objects.create(
+            barber=self.barber, customer=customer, service=self.service,
+            start_at=start, end_at=start + timedelta(minutes=30), created_by=self.barber,
+        )
+        ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, appointment=appointment,
+            price_charged=Decimal("30.00"), performed_at=start,
+        )
+
+        # venda repetida instantes depois: performed_at diferente, o UNIQUE (appointment_id, performed_at) não pegaria
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ServiceRecord.objects.create(
+                barber=self.barber, service=self.service, appointment=appointment,
+                price_charged=Decimal("30.00"), performed_at=start + timedelta(seconds=1),
+            )
+        self.assertEqual(ServiceRecord.objects.filter(appointment=appointment).count(), 1)
+
+    def test_ensure_partitions_moves_rows_out_of_default(self):
+        # mês além das partições existentes: a linha cai na DEFAULT
+        month = _add_months(timezone.localdate().replace(day=1), 60)
+        record = ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, price_charged=Decimal("30.00"),
+            performed_at=self.month_range(month)[0],
+        )
+
+        self.assertIn(partition_name("core_servicerecord", month), ensure_partitions(months_ahead=60))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM core_servicerecord_default")
+            self.assertEqual(cursor.fetchone()[0], 0)
+            cursor.execute(f'SELECT id FROM "{partition_name("core_servicerecord", month)}"')
+            self.assertEqual(cursor.fetchall(), [(record.pk,)])
+        self.assertEqual(ServiceRecord.objects.get(pk=record.pk).price_charged, Decimal("30.00"))
+
+    def test_ensure_partitions_creates_future_months_once(self):
+        months = len(list_partitions("core_servicerecord"))
+        created = ensure_partitions(months_ahead=24)
+
+        self.assertIn(partition_name("finance_payment", _add_months(timezone.localdate().replace(day=1), 24)), created)
+        self.assertGreater(len(list_partitions("core_servicerecord")), months)
+        self.assertEqual(ensure_partitions(months_ahead=24), [])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    QUERY_PROFILING_SAMPLE_RATE=1.0,
+    QUERY_PROFILING_N_PLUS_ONE_THRESHOLD=3,
+)
+class QueryProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username="admin", password="x")
+        cls.admin.profile.role = Profile.Role.ADMIN
+        cls.admin.profile.save()
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_server_timing_and_stats_per_route(self):
+        self.client.force_authenticate(self.manager)
+        for _ in range(2):
+            response = self.client.get("/api/service-records/")
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=[\d.]+, total;dur=[\d.]+$')
+
+        self.assertEqual(self.client.get("/api/profiling/queries/").status_code, 403)
+
+        self.client.force_authenticate(self.admin)
+        with self.settings(QUERY_PROFILING_SAMPLE_RATE=0.0):
+            response = self.client.get("/api/profiling/queries/")
+        self.assertNotIn("Server-Timing", response)
+        routes = {r["route"]: r for r in response.json()["routes"]}
+        stats = routes["GET /api/service-records/"]
+        self.assertEqual(stats["samples"], 2)
+        self.assertGreaterEqual(stats["queries"]["max"], 1)
+        self.assertEqual(set(stats["total_ms"]), {"p50", "p95", "p99"})
+        self.assertEqual(stats["n_plus_one"], 0)
+
+        with self.settings(QUERY_PROFILING_SAMPLE_RATE=0.0):
+            self.assertEqual(self.client.delete("/api/profiling/queries/").status_code, 204)
+            self.assertEqual(self.client.get("/api/profiling/queries/").json()["routes"], [])
+
+    def test_repeated_statement_is_flagged(self):
+        recorder = StatementRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in (self.admin, self.manager, self.admin):
+                User.objects.filter(pk=user.pk).exists()
+            Service.objects.exists()
+
+        self.assertEqual(recorder.count, 4)
+        self.assertEqual([n for _, n in recorder.repeated()], [3])
+        self.assertEqual(len(recorder.slowest), 4)
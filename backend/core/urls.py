@@ -3,7 +3,9 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     ServiceViewSet,
+    ServiceRecordExportView,
     ServiceRecordViewSet,
+    QueryStatsView,
     TodayRecordsView,
 )
 
@@ -14,6 +16,8 @@ router.register(r"service-records", ServiceRecordViewSet, basename="service-reco
 urlpatterns = [
     # endpoints extras (não REST padrão)
     path("records/today/", TodayRecordsView.as_view(), name="records-today"),
+    path("exports/service-records/", ServiceRecordExportView.as_view(), name="export-service-records"),
+    path("profiling/queries/", QueryStatsView.as_view(), name="profiling-queries"),
 ]
 
 urlpatterns += router.urls
@@ -1,20 +1,33 @@
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Sum
 from rest_framework.views import APIView
-from rest_framework import viewsets
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
 
 
+from scheduling.serializers import overlap_as_conflict
+from .exports import csv_stream, service_record_export, xlsx_stream
 from .models import Service, ServiceRecord
 from .serializers import (
+    ExportQuerySerializer,
     ServiceSerializer,
     ServiceRecordSerializer,
     ServiceRecordCreateSerializer,
+    ServiceSaleBulkSerializer,
+    SERVICE_RECORD_VALUE_FIELDS,
+    service_record_rows,
 )
-from .permissions import IsManagerOrAdmin, IsOwnerOrManagerAdmin, get_role
-from .services import register_service_sale
+from .pagination import ServiceRecordPagination
+from .permissions import IsAdmin, IsManagerOrAdmin, IsOwnerOrManagerAdmin, get_role
+from .profiling import clear_stats, route_stats
+from .services import register_service_sale, register_service_sales_bulk
 
 
 class ServiceViewSet(viewsets.ModelViewSet):
@@ -28,8 +41,10 @@ class ServiceViewSet(viewsets.ModelViewSet):
 
 
 class ServiceRecordViewSet(viewsets.ModelViewSet):
-    queryset = ServiceRecord.objects.select_related("service", "barber", "customer").all()
+    # payment/commission são one-to-one reversos: sem o JOIN aqui viram 2 consultas por registro
+    queryset = ServiceRecord.objects.select_related("service", "barber", "customer", "payment", "commission").all()
     permission_classes = [IsAuthenticated, IsOwnerOrManagerAdmin]
+    pagination_class = ServiceRecordPagination
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ["barber", "service", "customer"]
     search_fields = ["service__name", "barber__username", "notes", "customer__name"]
@@ -38,6 +53,8 @@ class ServiceRecordViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ("create", "update", "partial_update"):
             return ServiceRecordCreateSerializer
+        if self.action == "bulk":
+            return ServiceSaleBulkSerializer
         return ServiceRecordSerializer
 
     def get_queryset(self):
@@ -47,6 +64,18 @@ class ServiceRecordViewSet(viewsets.ModelViewSet):
             return qs
         return qs.filter(barber=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Listagem via .values() (uma consulta, sem instanciar models);
+        o JSON é o mesmo do ServiceRecordSerializer.
+        """
+        queryset = self.filter_queryset(self.get_queryset()).values(*SERVICE_RECORD_VALUE_FIELDS)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(service_record_rows(page))
+        return Response(service_record_rows(queryset))
+
+    @transaction.atomic
     def perform_create(self, serializer):
         role = get_role(self.request.user)
 
@@ -60,17 +89,50 @@ class ServiceRecordViewSet(viewsets.ModelViewSet):
         payment_amount = serializer.validated_data["payment_amount"]
 
         # cria Payment + Commission em transação e exige caixa aberto
-        from rest_framework.exceptions import ValidationError
+        # (sem caixa, o ValidationError desfaz também o registro)
         try:
-            register_service_sale(
-                service_record=record,
-                payment_method=payment_method,
-                payment_amount=payment_amount,
-                created_by=self.request.user,
+            with overlap_as_conflict():
+                register_service_sale(
+                    service_record=record,
+                    payment_method=payment_method,
+                    payment_amount=payment_amount,
+                    created_by=self.request.user,
+                    series=serializer.validated_data.get("series"),
+                    occurrence_start=serializer.validated_data.get("occurrence_start"),
+                )
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+    def perform_destroy(self, instance):
+        try:
+            with transaction.atomic():
+                instance.delete()
+        except ValueError as e:  # comissão liquidada (finance.signals)
+            raise ValidationError({"detail": str(e)})
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """
+        Lançamento em lote: {"sales": [{service, price_charged, payment_method, ...}, ...]}.
+        Valida tudo antes de gravar; qualquer erro (por item) cancela o lote inteiro.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            records = register_service_sales_bulk(
+                sales=serializer.validated_data["sales"],
+                created_by=request.user,
             )
         except ValueError as e:
             raise ValidationError({"detail": str(e)})
 
+        rows = ServiceRecord.objects.filter(id__in=[r.id for r in records]).order_by("id")
+        return Response(
+            service_record_rows(rows.values(*SERVICE_RECORD_VALUE_FIELDS)),
+            status=status.HTTP_201_CREATED,
+        )
+
 class TodayRecordsView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -90,4 +152,56 @@ class TodayRecordsView(APIView):
         return Response({
             "total": total,
             "count": qs.count(),
-        })        
+        })
+
+
+class ServiceRecordExportView(APIView):
+    """
+    Exportação para a contabilidade: registros com forma de pagamento, valor
+    pago, caixa e comissão, em CSV ou XLSX, gerada em fluxo.
+    ?output=xlsx&date_from=2026-09-01&date_to=2026-09-30&barber=3&cash_session=12
+    """
+    permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+
+    CONTENT_TYPES = {
+        "csv": "text/csv; charset=utf-8",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    def get(self, request):
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        headers, rows = service_record_export(
+            date_from=data["date_from"],
+            date_to=data["date_to"],
+            barber_id=data.get("barber"),
+            cash_session_id=data.get("cash_session"),
+        )
+        output = data["output"]
+        stream = xlsx_stream(headers, rows) if output == "xlsx" else csv_stream(headers, rows)
+
+        response = StreamingHttpResponse(stream, content_type=self.CONTENT_TYPES[output])
+        filename = f"registros_{data['date_from']:%Y%m%d}_{data['date_to']:%Y%m%d}.{output}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class QueryStatsView(APIView):
+    """
+    Perfil de SQL das requisições amostradas (QUERY_PROFILING_SAMPLE_RATE),
+    por rota: percentis de tempo total e de banco, consultas, instruções mais
+    lentas e repetições (provável N+1). DELETE zera as estatísticas.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({
+            "sample_rate": settings.QUERY_PROFILING_SAMPLE_RATE,
+            "routes": route_stats(),
+        })
+
+    def delete(self, request):
+        clear_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
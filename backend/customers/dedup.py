@@ -0,0 +1,202 @@
+"""
+Detecção e junção de clientes duplicados.
+
+Em vez de comparar todos os pares (100k clientes = 5 bilhões de pares), cada
+cliente entra em "blocos" por chaves baratas: nome normalizado, primeiro +
+último nome, telefone normalizado e e-mail. Só pares do mesmo bloco são
+pontuados; os pares acima do corte viram grupos (união de conjuntos).
+"""
+from collections import defaultdict, namedtuple
+from difflib import SequenceMatcher
+
+from django.db import transaction
+
+from dashboard.cache import invalidate_dashboards
+from scheduling.models import Appointment
+from .models import Customer
+from .services import refresh_customer_stats
+
+Row = namedtuple("Row", ["id", "name", "phone", "email"])
+
+DEFAULT_MIN_SCORE = 0.75
+# blocos maiores (nome muito comum sem outro dado) não são pontuados par a par
+MAX_BLOCK_SIZE = 50
+NAME_WEIGHT = 0.6
+CONTACT_WEIGHT = 0.4
+
+
+def _row(values):
+    customer_id, search_name, phone_digits, email = values
+    return Row(customer_id, search_name, phone_digits, (email or "").strip().lower())
+
+
+def _rows(queryset):
+    return (
+        _row(values)
+        for values in queryset.values_list("id", "search_name", "phone_digits", "email").iterator(chunk_size=5000)
+    )
+
+
+def blocking_keys(row):
+    keys = []
+    if row.name:
+        keys.append(("name", row.name))
+        tokens = row.name.split()
+        if len(tokens) >= 2:
+            keys.append(("first_last", f"{tokens[0]} {tokens[-1]}"))
+    if len(row.phone) >= 8:
+        keys.append(("phone", row.phone))
+    if row.email:
+        keys.append(("email", row.email))
+    return keys
+
+
+def score(a, b):
+    """
+    0..1: similaridade do nome normalizado (peso 0,6) + telefone ou e-mail
+    iguais (peso 0,4). Nome igual sem contato em comum fica em 0,6: homônimos
+    não passam do corte padrão.
+    """
+    name = SequenceMatcher(None, a.name, b.name).ratio() if a.name and b.name else 0.0
+    contact = (a.phone and a.phone == b.phone) or (a.email and a.email == b.email)
+    return round(NAME_WEIGHT * name + (CONTACT_WEIGHT if contact else 0.0), 3)
+
+
+def _scored_pairs(blocks, min_score):
+    seen = set()
+    for members in blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                pair = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+                if pair in seen:
+                    continue
+                seen.add(pair)
+                s = score(a, b)
+                if s >= min_score:
+                    yield pair, s
+
+
+def find_duplicates(queryset=None, min_score=DEFAULT_MIN_SCORE):
+    """
+    Sugestões de junção: [{"ids": [menor id primeiro], "score": maior par}]
+    ordenadas por score. O menor id (cadastro mais antigo) é o sugerido para ficar.
+    """
+    if queryset is None:
+        queryset = Customer.objects.all()
+
+    blocks = defaultdict(list)
+    for row in _rows(queryset):
+        for key in blocking_keys(row):
+            blocks[key].append(row)
+
+    parent = {}
+
+    def find(x):
+        root = x
+        while parent.get(root, root) != root:
+            root = parent[root]
+        parent[x] = root
+        return root
+
+    best = {}
+    for (a, b), s in _scored_pairs(blocks, min_score):
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+        best[(a, b)] = s
+
+    groups = defaultdict(set)
+    for a, b in best:
+        groups[find(a)].update((a, b))
+    group_score = defaultdict(float)
+    for (a, _), s in best.items():
+        root = find(a)
+        group_score[root] = max(group_score[root], s)
+
+    suggestions = [{"ids": sorted(ids), "score": group_score[root]} for root, ids in groups.items()]
+    suggestions.sort(key=lambda s: (-s["score"], s["ids"][0]))
+    return suggestions
+
+
+def merge_plan(ids, min_score):
+    """
+    (alvo, [duplicados]) de um grupo sugerido: o alvo é o menor id e só entram
+    os membros que pontuam >= min_score contra ele. O grupo vem da união de
+    pares, então um membro pode estar ligado ao alvo só por um terceiro.
+    """
+    rows = {row.id: row for row in _rows(Customer.objects.filter(id__in=ids))}
+    target, *others = sorted(rows)
+    return target, [i for i in others if score(rows[target], rows[i]) >= min_score]
+
+
+def duplicates_of(customer, min_score=DEFAULT_MIN_SCORE):
+    """Candidatos a duplicata de um cliente, usando as mesmas chaves de bloco."""
+    target = _row((customer.id, customer.search_name, customer.phone_digits, customer.email))
+    filters = {"name": "search_name", "phone": "phone_digits", "email": "email__iexact"}
+    candidates = {}
+    for kind, value in blocking_keys(target):
+        if kind == "first_last":
+            first, last = value.split(" ", 1)
+            qs = Customer.objects.filter(search_name__startswith=f"{first} ", search_name__endswith=f" {last}")
+        else:
+            qs = Customer.objects.filter(**{filters[kind]: value})
+        for row in _rows(qs.exclude(id=customer.id)[:MAX_BLOCK_SIZE]):
+            candidates[row.id] = row
+
+    scored = [(row, score(target, row)) for row in candidates.values()]
+    return sorted(
+        ({"id": row.id, "score": s} for row, s in scored if s >= min_score),
+        key=lambda c: (-c["score"], c["id"]),
+    )
+
+
+@transaction.atomic
+def merge_customers(target, duplicate_ids):
+    """
+    Junta os duplicados em `target` numa transação: todas as FKs que apontam
+    para Customer (ServiceRecord, Appointment, séries... inclusive as PROTECT)
+    são reapontadas com um UPDATE por tabela; telefone/e-mail/observações vazios
+    do destino são completados; os duplicados são apagados e as estatísticas
+    de visitas do destino, recalculadas.
+    """
+    duplicate_ids = sorted(set(duplicate_ids) - {target.id})
+    if not duplicate_ids:
+        return {"merged": 0, "moved": {}}
+
+    locked = {
+        c.id: c for c in Customer.objects.select_for_update().filter(id__in=[target.id, *duplicate_ids]).order_by("id")
+    }
+    missing = set(duplicate_ids) - set(locked)
+    if missing:
+        raise ValueError(f"Clientes não encontrados: {', '.join(map(str, sorted(missing)))}")
+    target = locked[target.id]
+
+    barber_ids = set(
+        Appointment.objects.filter(customer_id__in=duplicate_ids).values_list("barber_id", flat=True).distinct()
+    )
+
+    moved = {}
+    for rel in Customer._meta.related_objects:
+        if not (rel.field.many_to_one or rel.field.one_to_one):
+            continue
+        count = rel.related_model._base_manager.filter(
+            **{f"{rel.field.name}__in": duplicate_ids}
+        ).update(**{rel.field.name: target.id})
+        if count:
+            moved[rel.related_model._meta.label] = count
+
+    changed = []
+    for duplicate in (locked[i] for i in duplicate_ids):
+        for field in ("phone", "email", "notes"):
+            if not getattr(target, field) and getattr(duplicate, field):
+                setattr(target, field, getattr(duplicate, field))
+                changed.append(field)
+    if changed:
+        target.save(update_fields=changed)
+
+    Customer.objects.filter(id__in=duplicate_ids).delete()
+    refresh_customer_stats(Customer.objects.filter(pk=target.id))
+    invalidate_dashboards(barber_ids)
+    return {"merged": len(duplicate_ids), "moved": moved}
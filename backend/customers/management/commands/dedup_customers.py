@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from customers.dedup import DEFAULT_MIN_SCORE, find_duplicates, merge_customers, merge_plan
+from customers.models import Customer
+
+
+class Command(BaseCommand):
+    help = (
+        "Procura clientes duplicados (nome sem acento, telefone normalizado, e-mail) e lista sugestões de junção. "
+        "Com --merge, junta cada grupo no cadastro mais antigo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-score", type=float, default=DEFAULT_MIN_SCORE, help="Corte de similaridade (0..1).")
+        parser.add_argument("--output", help="Grava as sugestões em JSON neste arquivo.")
+        parser.add_argument("--merge", action="store_true", help="Junta os grupos sugeridos (uma transação por grupo).")
+        parser.add_argument(
+            "--merge-score", type=float, default=0.9,
+            help="Com --merge, só junta ao cadastro mais antigo quem tem score >= este contra ele.",
+        )
+
+    def handle(self, *args, **opts):
+        suggestions = find_duplicates(min_score=opts["min_score"])
+        names = dict(
+            Customer.objects.filter(id__in={i for s in suggestions for i in s["ids"]}).values_list("id", "name")
+        )
+        for s in suggestions:
+            s["names"] = [names[i] for i in s["ids"]]
+            self.stdout.write(f"{s['score']:.3f}  " + " | ".join(f"#{i} {names[i]}" for i in s["ids"]))
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fh:
+                json.dump(suggestions, fh, ensure_ascii=False, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(f"{len(suggestions)} grupo(s) de possíveis duplicados."))
+
+        if opts["merge"]:
+            merged = 0
+            for s in suggestions:
+                if s["score"] < opts["merge_score"]:
+                    continue
+                target, duplicates = merge_plan(s["ids"], opts["merge_score"])
+                if duplicates:
+                    merged += merge_customers(Customer.objects.get(pk=target), duplicates)["merged"]
+            self.stdout.write(self.style.SUCCESS(f"{merged} cliente(s) juntado(s)."))
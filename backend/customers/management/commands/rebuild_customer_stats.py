@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from customers.models import Customer
+from customers.services import refresh_customer_stats
+
+
+class Command(BaseCommand):
+    help = "Recalcula visitas, total gasto e última visita dos clientes a partir dos ServiceRecords."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--customer", type=int, nargs="*", help="Só estes clientes.")
+
+    def handle(self, *args, **opts):
+        customers = Customer.objects.all()
+        if opts["customer"]:
+            customers = customers.filter(pk__in=opts["customer"])
+        updated = refresh_customer_stats(customers)
+        self.stdout.write(self.style.SUCCESS(f"Estatísticas recalculadas: {updated} cliente(s)."))
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:06
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.db.models.functions.text
+from django.db import migrations, models
+
+from customers.utils import normalize_name, normalize_phone
+
+
+def fill_search_fields(apps, schema_editor):
+    Customer = apps.get_model("customers", "Customer")
+    batch = []
+    for customer in Customer.objects.only("id", "name", "phone").iterator(chunk_size=2000):
+        customer.search_name = normalize_name(customer.name)
+        customer.phone_digits = normalize_phone(customer.phone)
+        batch.append(customer)
+        if len(batch) >= 2000:
+            Customer.objects.bulk_update(batch, ["search_name", "phone_digits"])
+            batch = []
+    Customer.objects.bulk_update(batch, ["search_name", "phone_digits"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.AddField(
+            model_name='customer',
+            name='phone_digits',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='search_name',
+            field=models.CharField(blank=True, editable=False, max_length=120),
+        ),
+        migrations.RunPython(fill_search_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('search_name', name='gin_trgm_ops'), name='customer_search_name_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass('phone_digits', name='gin_trgm_ops'), name='customer_phone_digits_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('email'), name='gin_trgm_ops'), name='customer_email_trgm'),
+        ),
+    ]
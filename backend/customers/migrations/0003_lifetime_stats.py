@@ -0,0 +1,64 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:10
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_stats(apps, schema_editor):
+    Customer = apps.get_model("customers", "Customer")
+    ServiceRecord = apps.get_model("core", "ServiceRecord")
+
+    records = ServiceRecord.objects.filter(customer_id=OuterRef("pk")).order_by().values("customer_id")
+    Customer.objects.update(
+        visits_count=Coalesce(Subquery(records.annotate(c=Count("id")).values("c")), 0),
+        total_spent=Coalesce(
+            Subquery(records.annotate(t=Sum("price_charged")).values("t")),
+            Value(Decimal("0")),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2),
+        ),
+        last_visit_at=Subquery(
+            ServiceRecord.objects.filter(customer_id=OuterRef("pk")).order_by("-performed_at").values("performed_at")[:1]
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_search_trigram'),
+        ('core', '0003_servicerecord_appointment_servicerecord_customer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='last_visit_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='total_spent',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='customer',
+            name='visits_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['last_visit_at'], name='customers_c_last_vi_1f0199_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['total_spent'], name='customers_c_total_s_53375f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customer',
+            index=models.Index(fields=['visits_count'], name='customers_c_visits__7d69ba_idx'),
+        ),
+    ]
@@ -1,4 +1,12 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
+
+from .utils import normalize_name, normalize_phone
+
+
+STATS_FIELDS = ("visits_count", "total_spent", "last_visit_at")
+
 
 class Customer(models.Model):
     name = models.CharField(max_length=120)
@@ -6,14 +14,47 @@ class Customer(models.Model):
     email = models.EmailField(blank=True)
     notes = models.CharField(max_length=255, blank=True)
 
+    # formas normalizadas para a busca (preenchidas no save; bulk_create chama normalize())
+    search_name = models.CharField(max_length=120, blank=True, editable=False)
+    phone_digits = models.CharField(max_length=20, blank=True, editable=False)
+
+    # estatísticas de visitas, mantidas a cada venda/edição/exclusão de ServiceRecord
+    # (conferidas/recriadas por: manage.py rebuild_customer_stats)
+    visits_count = models.PositiveIntegerField(default=0, editable=False)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0, editable=False)
+    last_visit_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         indexes = [
             models.Index(fields=["name"]),
             models.Index(fields=["phone"]),
+            models.Index(fields=["last_visit_at"]),
+            models.Index(fields=["total_spent"]),
+            models.Index(fields=["visits_count"]),
+            # trigramas (pg_trgm) para a busca aproximada / por trecho
+            GinIndex(OpClass("search_name", name="gin_trgm_ops"), name="customer_search_name_trgm"),
+            GinIndex(OpClass("phone_digits", name="gin_trgm_ops"), name="customer_phone_digits_trgm"),
+            GinIndex(OpClass(Upper("email"), name="gin_trgm_ops"), name="customer_email_trgm"),
         ]
         ordering = ["name"]
 
     def __str__(self):
         return self.name
+
+    def normalize(self):
+        self.search_name = normalize_name(self.name)
+        self.phone_digits = normalize_phone(self.phone)
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_name", "phone_digits"}
+        elif not self._state.adding and self.pk:
+            # edição do cadastro não regrava as estatísticas (atualizadas com F() em paralelo)
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in STATS_FIELDS
+            ]
+        super().save(*args, **kwargs)
@@ -4,5 +4,18 @@ from .models import Customer
 class CustomerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Customer
-        fields = ["id", "name", "phone", "email", "notes", "created_at"]
-        read_only_fields = ["id", "created_at"]
+        fields = [
+            "id", "name", "phone", "email", "notes",
+            "visits_count", "total_spent", "last_visit_at",
+            "created_at",
+        ]
+        read_only_fields = ["id", "visits_count", "total_spent", "last_visit_at", "created_at"]
+
+
+class CustomerSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, max_length=100, trim_whitespace=True)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+
+class CustomerMergeSerializer(serializers.Serializer):
+    duplicates = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100)
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connection
+from django.db.models import (
+    Case, Count, DecimalField, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Greatest
+
+from core.models import ServiceRecord
+from .models import Customer
+from .utils import normalize_name, normalize_phone
+
+SEARCH_MIN_LENGTH = 3
+SEARCH_FIELDS = ("id", "name", "phone", "email")
+
+
+def search_customers(query: str, limit: int = 10):
+    """
+    Busca da recepção: nome sem acento (aproximada, por palavra), trecho do
+    telefone só com dígitos e trecho do e-mail. Todas as condições são servidas
+    pelos índices GIN de trigramas (pg_trgm). Ordem: nome começando pelo termo,
+    depois maior similaridade.
+    """
+    query = (query or "").strip()
+    term = normalize_name(query)
+    digits = normalize_phone(query)
+    if len(term) < SEARCH_MIN_LENGTH and len(digits) < SEARCH_MIN_LENGTH:
+        return []
+
+    trigram = connection.vendor == "postgresql"
+
+    conditions = Q(search_name__contains=term)
+    scores = []
+    if trigram:
+        # term <% search_name: similaridade com alguma palavra do nome (pega erro de digitação)
+        conditions |= Q(search_name__trigram_word_similar=term)
+        scores.append(TrigramWordSimilarity(term, "search_name"))
+    if len(digits) >= SEARCH_MIN_LENGTH:
+        phone = Q(phone_digits__contains=digits)
+        conditions |= phone
+        scores.append(Case(When(phone, then=Value(1.0)), default=Value(0.0), output_field=FloatField()))
+    if "@" in query or not digits:
+        email = Q(email__icontains=query)
+        conditions |= email
+        scores.append(Case(When(email, then=Value(0.9)), default=Value(0.0), output_field=FloatField()))
+
+    qs = Customer.objects.filter(conditions).annotate(
+        prefix=Case(When(search_name__startswith=term, then=Value(1)), default=Value(0), output_field=IntegerField()),
+    )
+    ordering = ["-prefix"]
+    if scores:
+        qs = qs.annotate(rank=Greatest(*scores) if len(scores) > 1 else scores[0])
+        ordering.append("-rank")
+    return list(qs.order_by(*ordering, "name", "id").values(*SEARCH_FIELDS)[:limit])
+
+
+def apply_visit_delta(*, customer_id, amount: Decimal, visits: int, performed_at):
+    """
+    Soma (visits=1) ou subtrai (visits=-1) uma visita nas estatísticas do cliente
+    com UPDATE + F(). Na subtração, se a visita removida era a última, a última
+    visita é recalculada no mesmo UPDATE (subconsulta no índice de customer).
+    """
+    if not customer_id:
+        return
+    customers = Customer.objects.filter(pk=customer_id)
+    if visits > 0:
+        customers.update(
+            visits_count=F("visits_count") + visits,
+            total_spent=F("total_spent") + amount,
+            last_visit_at=Greatest(Coalesce("last_visit_at", Value(performed_at)), Value(performed_at)),
+        )
+        return
+
+    customers.update(visits_count=F("visits_count") + visits, total_spent=F("total_spent") + amount)
+    customers.filter(last_visit_at__lte=performed_at).update(last_visit_at=Subquery(_latest_visit()))
+
+
+def _latest_visit():
+    return (
+        ServiceRecord.objects.filter(customer_id=OuterRef("pk"))
+        .order_by("-performed_at")
+        .values("performed_at")[:1]
+    )
+
+
+def add_records_to_customer_stats(records):
+    """Versão em lote (bulk_create não dispara sinais): um UPDATE por cliente."""
+    deltas = defaultdict(lambda: [Decimal("0"), 0, None])
+    for r in records:
+        if not r.customer_id:
+            continue
+        delta = deltas[r.customer_id]
+        delta[0] += Decimal(str(r.price_charged))
+        delta[1] += 1
+        delta[2] = max(delta[2], r.performed_at) if delta[2] else r.performed_at
+
+    for customer_id, (amount, visits, last) in deltas.items():
+        Customer.objects.filter(pk=customer_id).update(
+            visits_count=F("visits_count") + visits,
+            total_spent=F("total_spent") + amount,
+            last_visit_at=Greatest(Coalesce("last_visit_at", Value(last)), Value(last)),
+        )
+
+
+def refresh_customer_stats(customers=None) -> int:
+    """
+    Recalcula as estatísticas a partir de ServiceRecord num único UPDATE com
+    subconsultas correlacionadas. Sem argumento, todos os clientes.
+    """
+    if customers is None:
+        customers = Customer.objects.all()
+
+    records = ServiceRecord.objects.filter(customer_id=OuterRef("pk")).order_by().values("customer_id")
+    return customers.update(
+        visits_count=Coalesce(Subquery(records.annotate(c=Count("id")).values("c")), 0),
+        total_spent=Coalesce(
+            Subquery(records.annotate(t=Sum("price_charged")).values("t")),
+            Value(Decimal("0")),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        last_visit_at=Subquery(_latest_visit()),
+    )
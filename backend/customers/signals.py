@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import ServiceRecord
+from .services import apply_visit_delta
+
+
+@receiver(post_save, sender=ServiceRecord)
+def update_customer_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, "_previous", None)  # core.signals.remember_previous_state
+    current = (instance.customer_id, instance.price_charged, instance.performed_at)
+    if previous:
+        if (previous["customer_id"], previous["price_charged"], previous["performed_at"]) == current:
+            return
+        apply_visit_delta(
+            customer_id=previous["customer_id"], amount=-previous["price_charged"],
+            visits=-1, performed_at=previous["performed_at"],
+        )
+    apply_visit_delta(
+        customer_id=instance.customer_id, amount=instance.price_charged,
+        visits=1, performed_at=instance.performed_at,
+    )
+
+
+@receiver(post_delete, sender=ServiceRecord)
+def remove_customer_visit(sender, instance, **kwargs):
+    apply_visit_delta(
+        customer_id=instance.customer_id, amount=-instance.price_charged,
+        visits=-1, performed_at=instance.performed_at,
+    )
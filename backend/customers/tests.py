@@ -1,3 +1,248 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Profile
+from core.pagination import CustomerPagination
+from core.models import Service, ServiceRecord
+from customers.dedup import find_duplicates, merge_customers
+from customers.models import Customer
+from customers.services import refresh_customer_stats
+from scheduling.models import Appointment
+from customers.utils import normalize_name, normalize_phone
+
+User = get_user_model()
+
+
+class CustomerSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="recepcao", password="x")
+        cls.joao = Customer.objects.create(name="João  Silva", phone="+55 (85) 99999-1234")
+        cls.joana = Customer.objects.create(name="Joana Sousa", phone="85 98888-0000", email="Joana@Example.com")
+        cls.pedro = Customer.objects.create(name="Pedro Joãozinho", phone="")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        response = self.client.get("/api/customers/search/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row["id"] for row in response.data]
+
+    def test_normalization(self):
+        self.assertEqual(normalize_name("  Conceição   ARAÚJO "), "conceicao araujo")
+        self.assertEqual(normalize_phone("+55 (85) 99999-1234"), "85999991234")
+        self.assertEqual(normalize_phone("085 99999-1234"), "85999991234")
+        self.assertEqual(self.joao.search_name, "joao silva")
+
+    def test_accent_insensitive_and_prefix_first(self):
+        self.assertEqual(self.search("joao"), [self.joao.id, self.pedro.id])
+        self.assertEqual(self.search("JOÃO SIL"), [self.joao.id])
+
+    def test_phone_with_or_without_country_code_and_email(self):
+        self.assertEqual(self.search("5585999991234"), [self.joao.id])
+        self.assertEqual(self.search("9888"), [self.joana.id])
+        self.assertEqual(self.search("joana@exa"), [self.joana.id])
+
+    def test_short_query_returns_nothing(self):
+        self.assertEqual(self.search("jo"), [])
+        self.assertEqual(self.search(""), [])
+
+    @skipUnless(connection.vendor == "postgresql", "busca por trigramas exige PostgreSQL")
+    def test_typo_matches_by_trigram_similarity(self):
+        self.assertEqual(self.search("joao silvs")[0], self.joao.id)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CustomerDedupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+
+        cls.joao = Customer.objects.create(name="João Silva", phone="85 99999-1234")
+        cls.joao_dup = Customer.objects.create(name="Joao Silva", phone="+55 85 99999-1234", email="joao@example.com")
+        cls.joao_dup2 = Customer.objects.create(name="João da Silva", email="JOAO@example.com")
+        # homônimo sem contato em comum e mesmo telefone com outro nome: não são duplicatas
+        cls.homonym = Customer.objects.create(name="João Silva", phone="85 97777-0000")
+        cls.relative = Customer.objects.create(name="Maria Oliveira", phone="85 99999-1234")
+
+        now = timezone.now()
+        for customer in (cls.joao_dup, cls.joao_dup2):
+            ServiceRecord.objects.create(
+                barber=cls.barber, service=cls.service, customer=customer, price_charged="40.00", performed_at=now,
+            )
+            Appointment.objects.create(
+                barber=cls.barber, service=cls.service, customer=customer, created_by=cls.barber,
+                start_at=now + timedelta(days=customer.id), end_at=now + timedelta(days=customer.id, minutes=30),
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_groups_by_blocking_keys(self):
+        suggestions = find_duplicates()
+
+        self.assertEqual([s["ids"] for s in suggestions], [[self.joao.id, self.joao_dup.id, self.joao_dup2.id]])
+
+    def test_merge_repoints_history_and_fills_contacts(self):
+        result = merge_customers(self.joao, [self.joao_dup.id, self.joao_dup2.id])
+
+        self.assertEqual(result["merged"], 2)
+        self.assertEqual(result["moved"], {"core.ServiceRecord": 2, "scheduling.Appointment": 2})
+        self.assertEqual(ServiceRecord.objects.filter(customer=self.joao).count(), 2)
+        self.assertEqual(Appointment.objects.filter(customer=self.joao).count(), 2)
+        self.assertFalse(Customer.objects.filter(id__in=[self.joao_dup.id, self.joao_dup2.id]).exists())
+        self.joao.refresh_from_db()
+        self.assertEqual(self.joao.email, "joao@example.com")
+
+    def test_command_merges_only_members_close_to_the_target(self):
+        # joao_dup2 só entra no grupo pelo e-mail de joao_dup; contra joao fica abaixo do corte
+        call_command("dedup_customers", merge=True, merge_score=0.75, stdout=StringIO())
+
+        self.assertFalse(Customer.objects.filter(id=self.joao_dup.id).exists())
+        self.assertTrue(Customer.objects.filter(id=self.joao_dup2.id).exists())
+
+    def test_api_suggests_and_merge_is_manager_only(self):
+        client = APIClient()
+        client.force_authenticate(self.barber)
+        response = client.get(f"/api/customers/{self.joao.id}/duplicates/")
+        self.assertEqual([c["id"] for c in response.data], [self.joao_dup.id])
+        self.assertEqual(client.post(f"/api/customers/{self.joao.id}/merge/", {"duplicates": [self.joao_dup.id]}, format="json").status_code, 403)
+
+        client.force_authenticate(self.manager)
+        response = client.post(f"/api/customers/{self.joao.id}/merge/", {"duplicates": [self.joao_dup.id]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["merged"], 1)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CustomerStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+        cls.ana = Customer.objects.create(name="Ana")
+        cls.bia = Customer.objects.create(name="Bia")
+
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+
+    def record(self, customer, price, days_ago):
+        return ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, customer=customer,
+            price_charged=Decimal(price), performed_at=self.now - timedelta(days=days_ago),
+        )
+
+    def stats(self, customer):
+        customer.refresh_from_db()
+        return customer.visits_count, customer.total_spent, customer.last_visit_at
+
+    def test_stats_follow_create_edit_and_delete(self):
+        old = self.record(self.ana, "30.00", days_ago=10)
+        last = self.record(self.ana, "50.00", days_ago=1)
+        self.assertEqual(self.stats(self.ana), (2, Decimal("80.00"), last.performed_at))
+
+        last.price_charged = Decimal("60.00")
+        last.save()
+        self.assertEqual(self.stats(self.ana), (2, Decimal("90.00"), last.performed_at))
+
+        last.customer = self.bia
+        last.save()
+        self.assertEqual(self.stats(self.ana), (1, Decimal("30.00"), old.performed_at))
+        self.assertEqual(self.stats(self.bia), (1, Decimal("60.00"), last.performed_at))
+
+        old.delete()
+        self.assertEqual(self.stats(self.ana), (0, Decimal("0.00"), None))
+
+        # edição do cadastro não sobrescreve as estatísticas
+        stale = Customer.objects.get(pk=self.bia.pk)
+        self.record(self.bia, "20.00", days_ago=0)
+        stale.notes = "prefere máquina 2"
+        stale.save()
+        self.assertEqual(self.stats(self.bia)[0], 2)
+
+        expected = [self.stats(c) for c in (self.ana, self.bia)]
+        Customer.objects.update(visits_count=0, total_spent=0, last_visit_at=None)
+        refresh_customer_stats()
+        self.assertEqual([self.stats(c) for c in (self.ana, self.bia)], expected)
+
+    def test_win_back_filter_and_ordering(self):
+        self.record(self.ana, "30.00", days_ago=90)
+        self.record(self.bia, "80.00", days_ago=2)
+        client = APIClient()
+        client.force_authenticate(self.barber)
+
+        lapsed = client.get("/api/customers/", {"last_visit_at__lt": (self.now - timedelta(days=60)).isoformat()})
+        self.assertEqual([c["id"] for c in lapsed.data["results"]], [self.ana.id])
+
+        top = client.get("/api/customers/", {"ordering": "-total_spent"})
+        self.assertEqual([c["id"] for c in top.data["results"]], [self.bia.id, self.ana.id])
+
+    def test_cursor_pages_cover_every_customer_once(self):
+        # empates em visits_count/total_spent e metade sem visita (last_visit_at nulo)
+        for i in range(6):
+            customer = Customer.objects.create(name=f"Cliente {i}")
+            if i % 2:
+                self.record(customer, "40.00", days_ago=i)
+        client = APIClient()
+        client.force_authenticate(self.barber)
+        expected = sorted(Customer.objects.values_list("id", flat=True))
+
+        for ordering in ("-visits_count", "total_spent", "-total_spent", "name"):
+            seen, url, params = [], "/api/customers/", {"ordering": ordering, "page_size": 2}
+            while url:
+                page = client.get(url, params).data
+                seen += [c["id"] for c in page["results"]]
+                url, params = page["next"], None
+            self.assertEqual(sorted(seen), expected, ordering)
+            self.assertEqual(len(seen), len(set(seen)), ordering)
+
+        # last_visit_at não é campo de ordenação: cai no padrão (name, id)
+        response = client.get("/api/customers/", {"ordering": "-last_visit_at", "page_size": 50})
+        self.assertEqual(
+            [c["id"] for c in response.data["results"]],
+            list(Customer.objects.order_by("name", "id").values_list("id", flat=True)),
+        )
+
+    def test_tie_groups_larger_than_offset_cutoff_page_forward_and_back(self):
+        # todos sem visita: um só grupo de empate em visits_count/total_spent
+        for i in range(12):
+            Customer.objects.create(name=f"Cliente {i}")
+        client = APIClient()
+        client.force_authenticate(self.barber)
+        expected = list(Customer.objects.order_by("visits_count", "id").values_list("id", flat=True))
+
+        with mock.patch.object(CustomerPagination, "offset_cutoff", 2):
+            seen, url, params = [], "/api/customers/", {"ordering": "visits_count", "page_size": 3}
+            while url:
+                page = client.get(url, params).data
+                seen += [c["id"] for c in page["results"]]
+                url, params = page["next"], None
+                self.assertLessEqual(len(seen), len(expected))  # repetição não vira laço infinito
+            self.assertEqual(seen, expected)
+
+            # de volta a partir da última página
+            back, previous = [], page["previous"]
+            while previous:
+                page = client.get(previous).data
+                back = [c["id"] for c in page["results"]] + back
+                previous = page["previous"]
+                self.assertLessEqual(len(back), len(expected))
+            self.assertEqual(back, expected[:len(back)])
+            self.assertEqual(len(back), len(expected) - (len(expected) % 3 or 3))
@@ -0,0 +1,24 @@
+import re
+import unicodedata
+
+NON_DIGITS = re.compile(r"\D")
+SPACES = re.compile(r"\s+")
+
+
+def normalize_name(value: str) -> str:
+    """Minúsculas, sem acento e com espaços simples: "  João  Silva" -> "joao silva"."""
+    value = unicodedata.normalize("NFKD", value or "")
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    return SPACES.sub(" ", value).strip().lower()
+
+
+def normalize_phone(value: str) -> str:
+    """
+    Só dígitos, sem DDI 55 nem 0 de discagem: "+55 (85) 99999-0000" -> "85999990000".
+    """
+    digits = NON_DIGITS.sub("", value or "")
+    if len(digits) in (12, 13) and digits.startswith("55"):
+        digits = digits[2:]
+    elif len(digits) in (11, 12) and digits.startswith("0"):
+        digits = digits[1:]
+    return digits
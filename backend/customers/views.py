@@ -1,16 +1,65 @@
 from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 
+from core.pagination import CursorOrderingFilter, CustomerPagination
 from core.permissions import IsManagerOrAdmin
+from .dedup import duplicates_of, merge_customers
 from .models import Customer
-from .serializers import CustomerSerializer
+from .serializers import CustomerMergeSerializer, CustomerSearchQuerySerializer, CustomerSerializer
+from .services import search_customers
 
 class CustomerViewSet(viewsets.ModelViewSet):
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]  # barbeiro pode ver/cadastrar cliente no MVP
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = []
+    pagination_class = CustomerPagination
+    filter_backends = [DjangoFilterBackend, CursorOrderingFilter]
+    # ?last_visit_at__lt=2026-07-01 (sumidos), ?ordering=-total_spent (melhores clientes)
+    filterset_fields = {
+        "last_visit_at": ["lt", "gte", "isnull"],
+        "visits_count": ["gte", "lte"],
+        "total_spent": ["gte", "lte"],
+    }
     search_fields = ["name", "phone", "email"]
-    ordering_fields = ["name", "created_at"]
+    # last_visit_at aceita NULL e não pode ser posição de cursor: filtra, mas não ordena
+    ordering_fields = ["name", "created_at", "visits_count", "total_spent"]
+    ordering = ["name", "id"]  # padrão do cursor (CustomerPagination)
+
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Busca rápida da recepção: ?q=joao sil&limit=10.
+        Nome sem acento e com erro de digitação, telefone com ou sem DDI/máscara, e-mail.
+        Menos de 3 caracteres devolve lista vazia.
+        """
+        params = CustomerSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(search_customers(params.validated_data.get("q", ""), params.validated_data["limit"]))
+
+    @action(detail=True, methods=["get"])
+    def duplicates(self, request, pk=None):
+        """Possíveis duplicatas deste cliente: [{"id", "score", ...}], maior score primeiro."""
+        candidates = duplicates_of(self.get_object())
+        rows = Customer.objects.in_bulk([c["id"] for c in candidates])
+        return Response([
+            {**c, "name": rows[c["id"]].name, "phone": rows[c["id"]].phone, "email": rows[c["id"]].email}
+            for c in candidates
+        ])
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated, IsManagerOrAdmin])
+    def merge(self, request, pk=None):
+        """
+        Junta {"duplicates": [ids]} neste cliente (histórico de vendas e agenda
+        passa para ele) e apaga os duplicados.
+        """
+        serializer = CustomerMergeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            result = merge_customers(self.get_object(), serializer.validated_data["duplicates"])
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+        return Response(result)
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import DailyRevenue
 
-# Register your models here.
+@admin.register(DailyRevenue)
+class DailyRevenueAdmin(admin.ModelAdmin):
+    list_display = ("date", "barber", "service", "total", "count")
+    list_filter = ("service", "barber")
+    date_hierarchy = "date"
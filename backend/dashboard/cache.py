@@ -0,0 +1,96 @@
+import functools
+import hashlib
+import time
+from datetime import datetime, time as dt_time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.permissions import get_role
+from .services import revenue_date
+
+VERSION_KEY = "dashboard:version:{scope}"
+
+
+def cache_scope(user) -> str:
+    """Gerente/admin veem tudo ("all"); barbeiro só os próprios dados (id)."""
+    return "all" if get_role(user) in ("MANAGER", "ADMIN") else str(user.id)
+
+
+def scope_version(scope) -> float:
+    """Momento da última escrita que afeta o escopo (base do Last-Modified)."""
+    key = VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate_dashboards(barber_ids=()):
+    """
+    Invalida o escopo "all" e o de cada barbeiro afetado, após o commit
+    (antes disso outro worker ainda leria os dados antigos).
+    """
+    scopes = ["all", *{str(b) for b in barber_ids if b}]
+
+    def bump():
+        now = time.time()
+        cache.set_many({VERSION_KEY.format(scope=s): now for s in scopes}, timeout=None)
+
+    transaction.on_commit(bump)
+
+
+def _not_modified(request, etag, last_modified) -> bool:
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match:
+        return etag in [t.strip() for t in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = parse_http_date_safe(request.headers.get("If-Modified-Since", ""))
+    return if_modified_since is not None and int(last_modified) <= if_modified_since
+
+
+def cached_dashboard(get):
+    """
+    Cache de resposta para os GET do dashboard, por escopo (barbeiro ou "all"),
+    dia local e query string. A chave inclui a versão do escopo, então escritas
+    em ServiceRecord/Payment/Commission/Appointment (dashboard/signals.py)
+    invalidam sem varrer chaves. Responde 304 para ETag/Last-Modified inalterados.
+    """
+    @functools.wraps(get)
+    def wrapper(self, request, *args, **kwargs):
+        scope = cache_scope(request.user)
+        version = scope_version(scope)
+        today = revenue_date(timezone.now())
+        bucket = today.isoformat()
+        # virada do dia também muda a resposta ("hoje"), mesmo sem escrita
+        day_start = datetime.combine(today, dt_time.min, tzinfo=timezone.get_default_timezone()).timestamp()
+        last_modified = max(version, day_start)
+        params = "&".join(sorted(request.GET.urlencode().split("&")))
+
+        raw_key = f"{type(self).__name__}:{scope}:{bucket}:{version}:{params}"
+        key = "dashboard:response:" + hashlib.md5(raw_key.encode()).hexdigest()
+        etag = quote_etag(hashlib.md5(raw_key.encode()).hexdigest()[:16])
+
+        if _not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                response = get(self, request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    cache.set(key, response.data, timeout=settings.DASHBOARD_CACHE_TIMEOUT)
+            else:
+                response = Response(data)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            response["Last-Modified"] = http_date(last_modified)
+            response["Cache-Control"] = "private, no-cache"
+        return response
+
+    return wrapper
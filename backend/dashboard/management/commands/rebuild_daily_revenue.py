@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from dashboard.services import rebuild_daily_revenue
+
+
+class Command(BaseCommand):
+    help = "Recria o rollup DailyRevenue a partir de todos os ServiceRecords."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        created = rebuild_daily_revenue(batch_size=opts["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rollup reconstruído: {created} linhas."))
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:10
+
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    # mesmo agrupamento de services.rebuild_daily_revenue (dia no fuso do projeto)
+    DailyRevenue = apps.get_model("dashboard", "DailyRevenue")
+    ServiceRecord = apps.get_model("core", "ServiceRecord")
+
+    DailyRevenue.objects.all().delete()
+    rows = (
+        ServiceRecord.objects
+        .annotate(day=TruncDate("performed_at", tzinfo=timezone.get_default_timezone()))
+        .values("day", "barber_id", "service_id")
+        .annotate(total=Sum("price_charged"), count=Count("id"))
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator(chunk_size=1000):
+        batch.append(DailyRevenue(
+            date=row["day"], barber_id=row["barber_id"], service_id=row["service_id"],
+            total=row["total"], count=row["count"],
+        ))
+        if len(batch) >= 1000:
+            DailyRevenue.objects.bulk_create(batch)
+            batch = []
+    DailyRevenue.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
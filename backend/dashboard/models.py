@@ -1,3 +1,26 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class DailyRevenue(models.Model):
+    """
+    Rollup diário de faturamento por barbeiro + serviço.
+    A data é a data local (America/Fortaleza) do performed_at.
+    Mantido incrementalmente pelos sinais de ServiceRecord (dashboard/signals.py).
+    """
+    date = models.DateField()
+    barber = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="daily_revenue")
+    service = models.ForeignKey("core.Service", on_delete=models.CASCADE, related_name="daily_revenue")
+
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ("date", "barber", "service")
+        indexes = [
+            models.Index(fields=["barber", "date"]),
+        ]
+        ordering = ["date"]
+
+    def __str__(self):
+        return f"{self.date} - {self.barber_id}/{self.service_id}: {self.total}"
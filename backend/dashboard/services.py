@@ -0,0 +1,95 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.models import ServiceRecord
+from .models import DailyRevenue
+
+
+def revenue_date(performed_at):
+    """
+    Data do rollup: sempre no fuso padrão do projeto (TIME_ZONE), independente
+    do fuso ativo na requisição.
+    """
+    return timezone.localtime(performed_at, timezone.get_default_timezone()).date()
+
+
+def apply_revenue_delta(*, date, barber_id, service_id, amount: Decimal, count: int):
+    """
+    Soma (ou subtrai) um delta na linha do rollup, criando a linha se necessário.
+    Usa UPDATE com F() para não perder incrementos concorrentes.
+    """
+    lookup = {"date": date, "barber_id": barber_id, "service_id": service_id}
+    updated = DailyRevenue.objects.filter(**lookup).update(
+        total=F("total") + amount,
+        count=F("count") + count,
+    )
+    if updated:
+        return
+
+    try:
+        with transaction.atomic():
+            DailyRevenue.objects.create(**lookup, total=amount, count=count)
+    except IntegrityError:
+        # outra transação criou a linha entre o UPDATE e o INSERT
+        DailyRevenue.objects.filter(**lookup).update(
+            total=F("total") + amount,
+            count=F("count") + count,
+        )
+
+
+def add_records_to_rollup(records, sign: int = 1):
+    """
+    Aplica um lote de ServiceRecords no rollup, agrupando por chave antes de
+    escrever (um UPDATE por dia/barbeiro/serviço, não por registro).
+    """
+    deltas = defaultdict(lambda: [Decimal("0"), 0])
+    for r in records:
+        key = (revenue_date(r.performed_at), r.barber_id, r.service_id)
+        deltas[key][0] += Decimal(str(r.price_charged)) * sign
+        deltas[key][1] += sign
+
+    for (date, barber_id, service_id), (amount, count) in deltas.items():
+        apply_revenue_delta(date=date, barber_id=barber_id, service_id=service_id, amount=amount, count=count)
+
+
+@transaction.atomic
+def rebuild_daily_revenue(batch_size: int = 1000) -> int:
+    """
+    Recria o rollup inteiro a partir de ServiceRecord.
+    Retorna o número de linhas geradas.
+    """
+    DailyRevenue.objects.all().delete()
+
+    rows = (
+        ServiceRecord.objects
+        .annotate(day=TruncDate("performed_at", tzinfo=timezone.get_default_timezone()))
+        .values("day", "barber_id", "service_id")
+        .annotate(total=Sum("price_charged"), count=Count("id"))
+        .order_by()
+    )
+
+    created = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(DailyRevenue(
+            date=row["day"],
+            barber_id=row["barber_id"],
+            service_id=row["service_id"],
+            total=row["total"],
+            count=row["count"],
+        ))
+        if len(batch) >= batch_size:
+            DailyRevenue.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    if batch:
+        DailyRevenue.objects.bulk_create(batch)
+        created += len(batch)
+
+    return created
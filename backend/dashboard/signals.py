@@ -0,0 +1,65 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import ServiceRecord
+from finance.models import Commission, Payment
+from scheduling.models import Appointment
+from .cache import invalidate_dashboards
+from .services import revenue_date, apply_revenue_delta
+
+
+@receiver(post_save, sender=ServiceRecord)
+def update_daily_revenue(sender, instance, created, **kwargs):
+    key = (revenue_date(instance.performed_at), instance.barber_id, instance.service_id)
+    amount = instance.price_charged
+    count = 1
+
+    previous = getattr(instance, "_previous", None)  # core.signals.remember_previous_state
+    if previous:
+        prev_key = (revenue_date(previous["performed_at"]), previous["barber_id"], previous["service_id"])
+        if prev_key == key:
+            amount = instance.price_charged - previous["price_charged"]
+            count = 0
+        else:
+            apply_revenue_delta(
+                date=prev_key[0], barber_id=prev_key[1], service_id=prev_key[2],
+                amount=-previous["price_charged"], count=-1,
+            )
+
+    if amount or count:
+        apply_revenue_delta(date=key[0], barber_id=key[1], service_id=key[2], amount=amount, count=count)
+
+
+@receiver(post_delete, sender=ServiceRecord)
+def remove_daily_revenue(sender, instance, **kwargs):
+    apply_revenue_delta(
+        date=revenue_date(instance.performed_at),
+        barber_id=instance.barber_id,
+        service_id=instance.service_id,
+        amount=-instance.price_charged,
+        count=-1,
+    )
+
+
+@receiver(post_save, sender=ServiceRecord)
+@receiver(post_delete, sender=ServiceRecord)
+@receiver(post_save, sender=Commission)
+@receiver(post_delete, sender=Commission)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def invalidate_dashboard_cache(sender, instance, **kwargs):
+    barber_ids = [instance.barber_id]
+    previous = getattr(instance, "_previous", None) if sender is ServiceRecord else None
+    if previous:
+        barber_ids.append(previous["barber_id"])
+    invalidate_dashboards(barber_ids)
+
+
+@receiver(post_save, sender=Payment)
+def invalidate_dashboard_cache_for_payment(sender, instance, **kwargs):
+    # Payment só é excluído em cascata do ServiceRecord, que já invalida
+    if Payment.service_record.is_cached(instance):
+        barber_id = instance.service_record.barber_id
+    else:
+        barber_id = ServiceRecord.objects.filter(pk=instance.service_record_id).values_list("barber_id", flat=True).first()
+    invalidate_dashboards([barber_id])
@@ -1,12 +1,16 @@
+from decimal import Decimal
+
 from django.utils import timezone
-from django.db.models import Sum
-from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import TruncMonth
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import ServiceRecord
 from core.permissions import get_role
+from .cache import cached_dashboard
+from .models import DailyRevenue
+from .services import revenue_date
 
 class RevenueSummaryView(APIView):
     """
@@ -15,138 +19,199 @@ class RevenueSummaryView(APIView):
     - faturamento do mês atual
     - série diária do mês (para gráfico)
     - ranking barbeiros (mês)
+    Lê do rollup DailyRevenue (uma linha por dia/barbeiro/serviço).
     """
     permission_classes = [IsAuthenticated]
 
+    @cached_dashboard
     def get(self, request):
-        now = timezone.localtime(timezone.now())
-        start_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        today = revenue_date(timezone.now())
+        start_month = today.replace(day=1)
 
         role = get_role(request.user)
 
-        qs = ServiceRecord.objects.all()
+        qs = DailyRevenue.objects.filter(date__gte=start_month, date__lte=today)
 
         # barbeiro só vê dele mesmo; gerente/admin vê tudo
         if role not in ("MANAGER", "ADMIN"):
             qs = qs.filter(barber=request.user)
 
-        day_total = qs.filter(performed_at__gte=start_day, performed_at__lte=now).aggregate(
-            total=Sum("price_charged")
-        )["total"] or 0
-
-        month_total = qs.filter(performed_at__gte=start_month, performed_at__lte=now).aggregate(
-            total=Sum("price_charged")
-        )["total"] or 0
-
         # série diária do mês
-        daily_series = (
-            qs.filter(performed_at__gte=start_month, performed_at__lte=now)
-            .annotate(day=TruncDate("performed_at"))
-            .values("day")
-            .annotate(total=Sum("price_charged"))
+        daily_series = list(
+            qs.values(day=F("date"))
+            .annotate(total=Sum("total"))
             .order_by("day")
         )
 
+        month_total = sum((row["total"] for row in daily_series), 0)
+        day_total = next((row["total"] for row in daily_series if row["day"] == today), 0)
+
         # ranking barbeiros (mês) - somente gerente/admin
         barber_ranking = []
         if role in ("MANAGER", "ADMIN"):
             barber_ranking = (
-                ServiceRecord.objects.filter(performed_at__gte=start_month, performed_at__lte=now)
-                .values("barber__id", "barber__username")
-                .annotate(total=Sum("price_charged"))
+                qs.values("barber__id", "barber__username")
+                .annotate(total=Sum("total"))
                 .order_by("-total")
             )
 
         return Response({
-            "timezone": str(timezone.get_current_timezone()),
+            "timezone": str(timezone.get_default_timezone()),
             "today_total": day_total,
             "month_total": month_total,
-            "daily_series": list(daily_series),
+            "daily_series": daily_series,
             "barber_ranking": list(barber_ranking),
         })
 
 
 class RevenueByMonthView(APIView):
     """
-    Retorna últimos N meses agregados para gráfico.
+    Retorna últimos N meses agregados para gráfico (?months=N, padrão 12, máx 60).
     """
     permission_classes = [IsAuthenticated]
 
+    DEFAULT_MONTHS = 12
+    MAX_MONTHS = 60
+
+    @cached_dashboard
     def get(self, request):
+        try:
+            months = int(request.query_params.get("months", self.DEFAULT_MONTHS))
+        except ValueError:
+            months = self.DEFAULT_MONTHS
+        months = max(1, min(months, self.MAX_MONTHS))
+
+        today = revenue_date(timezone.now())
+        index = today.year * 12 + today.month - months  # primeiro mês da janela
+        start = today.replace(year=index // 12, month=index % 12 + 1, day=1)
+
         role = get_role(request.user)
-        qs = ServiceRecord.objects.all()
+        qs = DailyRevenue.objects.filter(date__gte=start)
         if role not in ("MANAGER", "ADMIN"):
             qs = qs.filter(barber=request.user)
 
         data = (
-            qs.annotate(month=TruncMonth("performed_at"))
+            qs.annotate(month=TruncMonth("date"))
             .values("month")
-            .annotate(total=Sum("price_charged"))
+            .annotate(total=Sum("total"))
             .order_by("month")
         )
         return Response({"series": list(data)})
 
 from core.models import ServiceRecord
-from finance.models import Payment, PaymentMethod, Commission
+from finance.models import Commission, Payment, PaymentMethod
 from scheduling.models import Appointment
 
+def _total(value):
+    # o UNION pode vir sem o conversor de DecimalField (ex.: SQLite)
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
 class OpsSummaryView(APIView):
+    """
+    Resumo operacional. Os totais do mês (faturamento, pagamentos por método,
+    comissões) saem de uma única consulta; os agendamentos de hoje, de outra.
+    ?fields=a,b restringe os painéis calculados.
+    """
     permission_classes = [IsAuthenticated]
 
+    FIELDS = ("month_total", "payments_by_method", "month_commissions_total", "todays_appointments")
+    TOTAL_FIELDS = ("month_total", "payments_by_method", "month_commissions_total")
+
+    @cached_dashboard
     def get(self, request):
+        fields = self.FIELDS
+        if request.query_params.get("fields"):
+            fields = [f.strip() for f in request.query_params["fields"].split(",") if f.strip()]
+            unknown = sorted(set(fields) - set(self.FIELDS))
+            if unknown:
+                return Response({"detail": f"Campos inválidos: {', '.join(unknown)}."}, status=400)
+
         now = timezone.localtime(timezone.now())
         start_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
         start_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
 
-        role = get_role(request.user)
-
-        records = ServiceRecord.objects.all()
-        appts = Appointment.objects.select_related("customer", "service", "barber").all()
-        payments = Payment.objects.all()
-        commissions = Commission.objects.all()
-
-        if role not in ("MANAGER", "ADMIN"):
-            records = records.filter(barber=request.user)
-            appts = appts.filter(barber=request.user)
-            payments = payments.filter(service_record__barber=request.user)
-            commissions = commissions.filter(barber=request.user)
-
-        # agenda do dia
-        todays_appts = appts.filter(start_at__gte=start_day, start_at__lte=now.replace(hour=23, minute=59, second=59))
-
-        # faturamento mês
-        month_total = records.filter(performed_at__gte=start_month, performed_at__lte=now).aggregate(
-            total=Sum("price_charged")
-        )["total"] or 0
-
-        # pagamentos por método
-        by_method = (
-            payments.filter(created_at__gte=start_month, created_at__lte=now)
-            .values("method")
-            .annotate(total=Sum("amount"))
-            .order_by("method")
-        )
+        is_manager = get_role(request.user) in ("MANAGER", "ADMIN")
+        data = {}
 
-        # total comissões no mês
-        comm_total = commissions.filter(created_at__gte=start_month, created_at__lte=now).aggregate(
-            total=Sum("commission_amount")
-        )["total"] or 0
+        if any(f in fields for f in self.TOTAL_FIELDS):
+            data.update(self.month_totals(request.user, is_manager, start_month, now, fields))
 
-        return Response({
-            "month_total": month_total,
-            "payments_by_method": list(by_method),
-            "month_commissions_total": comm_total,
-            "todays_appointments": [
+        if "todays_appointments" in fields:
+            appts = Appointment.objects.filter(
+                start_at__gte=start_day,
+                start_at__lte=now.replace(hour=23, minute=59, second=59),
+            )
+            if not is_manager:
+                appts = appts.filter(barber=request.user)
+            rows = appts.order_by("start_at").values(
+                "id", "start_at", "end_at", "status", "customer__name", "service__name", "barber__username",
+            )[:100]
+            data["todays_appointments"] = [
                 {
-                    "id": a.id,
-                    "start_at": a.start_at,
-                    "end_at": a.end_at,
-                    "status": a.status,
-                    "customer": a.customer.name,
-                    "service": a.service.name,
-                    "barber": a.barber.username,
+                    "id": a["id"],
+                    "start_at": a["start_at"],
+                    "end_at": a["end_at"],
+                    "status": a["status"],
+                    "customer": a["customer__name"],
+                    "service": a["service__name"],
+                    "barber": a["barber__username"],
                 }
-                for a in todays_appts.order_by("start_at")[:100]
-            ],
-        })
+                for a in rows
+            ]
+
+        return Response(data)
+
+    def month_totals(self, user, is_manager, start_month, now, fields):
+        """
+        Todos os totais numa única consulta (UNION ALL), com um ramo por painel
+        pedido. Cada ramo filtra a própria tabela pelo período (performed_at /
+        created_at) e é servido pelo índice de cobertura dela, sem varrer o
+        histórico. Linhas: (painel, chave, total).
+        """
+        in_month = {"gte": start_month, "lte": now}
+
+        def between(field):
+            return Q(**{f"{field}__{op}": value for op, value in in_month.items()})
+
+        def panel(qs, name, key, amount):
+            return (
+                qs.order_by()
+                .annotate(panel=Value(name), key=key)
+                .values("panel", "key")
+                .annotate(total=Sum(amount))
+                .values_list("panel", "key", "total")
+            )
+
+        branches = []
+        if "month_total" in fields:
+            records = ServiceRecord.objects.filter(between("performed_at"))
+            if not is_manager:
+                records = records.filter(barber=user)
+            branches.append(panel(records, "month_total", Value(""), "price_charged"))
+        if "payments_by_method" in fields:
+            payments = Payment.objects.filter(between("created_at"))
+            if not is_manager:
+                payments = payments.filter(service_record__barber=user)
+            branches.append(panel(payments, "payments_by_method", F("method"), "amount"))
+        if "month_commissions_total" in fields:
+            commissions = Commission.objects.filter(between("created_at"))
+            if not is_manager:
+                commissions = commissions.filter(barber=user)
+            branches.append(panel(commissions, "month_commissions_total", Value(""), "commission_amount"))
+
+        rows = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+        totals = {(name, key): total for name, key, total in rows if total is not None}
+
+        data = {}
+        if "month_total" in fields:
+            data["month_total"] = _total(totals.get(("month_total", "")))
+        if "payments_by_method" in fields:
+            data["payments_by_method"] = [
+                {"method": method, "total": _total(totals[("payments_by_method", method)])}
+                for method in sorted(PaymentMethod.values)
+                if ("payments_by_method", method) in totals
+            ]
+        if "month_commissions_total" in fields:
+            data["month_commissions_total"] = _total(totals.get(("month_commissions_total", "")))
+        return data
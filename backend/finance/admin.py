@@ -1,3 +1,34 @@
 from django.contrib import admin
+from .models import CashSessionReport, CommissionStatement, PayoutPeriod
 
-# Register your models here.
+
+@admin.register(CashSessionReport)
+class CashSessionReportAdmin(admin.ModelAdmin):
+    list_display = ("cash_session", "expected_amount", "declared_amount", "difference", "created_at")
+
+    # relatório de fechamento é imutável
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PayoutPeriod)
+class PayoutPeriodAdmin(admin.ModelAdmin):
+    list_display = ("start", "end", "frequency", "closed_by", "closed_at")
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(CommissionStatement)
+class CommissionStatementAdmin(admin.ModelAdmin):
+    list_display = ("period", "barber", "commissions_count", "commission_total")
+    list_filter = ("period", "barber")
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.models import PayoutPeriod
+from finance.services import close_payout_period, last_completed_period_bounds
+
+
+class Command(BaseCommand):
+    help = "Fecha o período de pagamento de comissões e gera os extratos por barbeiro."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", type=date.fromisoformat, help="Dia do período (AAAA-MM-DD). Padrão: último período encerrado.")
+        parser.add_argument("--frequency", choices=PayoutPeriod.Frequency.values, help="Padrão: COMMISSION_PAYOUT_FREQUENCY.")
+        parser.add_argument("--user", required=True, help="Username de quem fecha.")
+
+    def handle(self, *args, **opts):
+        try:
+            user = get_user_model().objects.get(username=opts["user"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Usuário {opts['user']} não encontrado.")
+
+        day = opts["date"] or last_completed_period_bounds(frequency=opts["frequency"])[0]
+        try:
+            period = close_payout_period(day, user, frequency=opts["frequency"])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for statement in period.statements.select_related("barber").order_by("barber__username"):
+            self.stdout.write(
+                f"{statement.barber.username}: {statement.commissions_count} comissões, R$ {statement.commission_total}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Período {period} fechado."))
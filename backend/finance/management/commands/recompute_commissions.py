@@ -0,0 +1,42 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from finance.services import recompute_commissions
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula comissões não liquidadas com as regras atuais (após mudar CommissionRule "
+        "ou o % padrão de um serviço). Períodos já fechados não são alterados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--barber", type=int, help="Só este barbeiro (id).")
+        parser.add_argument("--service", type=int, help="Só este serviço (id).")
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="Data inicial (AAAA-MM-DD).")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Data final, inclusiva.")
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument("--dry-run", action="store_true", help="Só mostra o diff, sem gravar.")
+
+    def handle(self, *args, **opts):
+        report = recompute_commissions(
+            barber_id=opts["barber"],
+            service_id=opts["service"],
+            date_from=opts["date_from"],
+            date_to=opts["date_to"],
+            batch_size=opts["batch_size"],
+            dry_run=opts["dry_run"],
+        )
+
+        for barber_id, totals in sorted(report["by_barber"].items()):
+            if totals["old"] != totals["new"]:
+                self.stdout.write(f"Barbeiro {barber_id}: R$ {totals['old']} -> R$ {totals['new']}")
+        self.stdout.write(
+            f"{report['scanned']} comissões lidas, {report['changed']} alteradas, "
+            f"{report['skipped_settled']} liquidadas ignoradas."
+        )
+        verb = "ficaria" if opts["dry_run"] else "ficou"
+        self.stdout.write(self.style.SUCCESS(
+            f"Total R$ {report['old_total']} {verb} R$ {report['new_total']} ({report['difference']:+})."
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from finance.models import CashSession
+from finance.services import reconcile_cash_totals
+
+
+class Command(BaseCommand):
+    help = "Confere os totais correntes dos caixas (pagamentos, entradas, saídas) contra os lançamentos."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--session", type=int, help="Só este caixa.")
+        parser.add_argument("--open-only", action="store_true", help="Só caixas abertos.")
+        parser.add_argument("--fix", action="store_true", help="Grava os totais reais nos caixas abertos divergentes (fechados só são apontados).")
+
+    def handle(self, *args, **opts):
+        sessions = CashSession.objects.all()
+        if opts["session"]:
+            sessions = sessions.filter(pk=opts["session"])
+        if opts["open_only"]:
+            sessions = sessions.filter(closed_at__isnull=True)
+
+        mismatches = reconcile_cash_totals(sessions, fix=opts["fix"])
+        for session, diff in mismatches:
+            detail = ", ".join(f"{f}: {stored} != {real}" for f, (stored, real) in diff.items())
+            label = "" if session.is_open() else " (fechado)"
+            self.stdout.write(f"Caixa {session.pk}{label}: {detail}")
+
+        closed = sum(1 for session, _ in mismatches if not session.is_open())
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Totais conferidos: nenhuma divergência."))
+        elif opts["fix"] and not closed:
+            self.stdout.write(self.style.SUCCESS(f"{len(mismatches)} caixa(s) corrigido(s)."))
+        elif opts["fix"]:
+            raise CommandError(f"{closed} caixa(s) fechado(s) com divergência; fechados não são alterados.")
+        else:
+            raise CommandError(f"{len(mismatches)} caixa(s) com divergência. Rode com --fix para corrigir.")
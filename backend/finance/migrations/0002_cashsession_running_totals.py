@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-18 07:53
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_totals(apps, schema_editor):
+    CashSession = apps.get_model("finance", "CashSession")
+    CashEntry = apps.get_model("finance", "CashEntry")
+    Payment = apps.get_model("finance", "Payment")
+
+    def total(qs):
+        subquery = qs.filter(cash_session=OuterRef("pk")).values("cash_session").annotate(t=Sum("amount")).values("t")
+        return Coalesce(Subquery(subquery), Value(Decimal("0")), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+    CashSession.objects.update(
+        payments_total=total(Payment.objects.all()),
+        entries_in=total(CashEntry.objects.filter(type="IN")),
+        entries_out=total(CashEntry.objects.filter(type="OUT")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashsession',
+            name='entries_in',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='entries_out',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashsession',
+            name='payments_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0002_cashsession_running_totals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashSessionReport',
+            fields=[
+                ('cash_session', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, primary_key=True, related_name='report', serialize=False, to='finance.cashsession')),
+                ('initial_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payments_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('payments_count', models.PositiveIntegerField()),
+                ('payments_by_method', models.JSONField()),
+                ('entries_in', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entries_in_count', models.PositiveIntegerField()),
+                ('entries_out', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('entries_out_count', models.PositiveIntegerField()),
+                ('commissions_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('expected_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('expected_cash', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('declared_amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('difference', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0003_cashsessionreport'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayoutPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateField(unique=True)),
+                ('end', models.DateField()),
+                ('frequency', models.CharField(choices=[('WEEKLY', 'Semanal'), ('BIWEEKLY', 'Quinzenal')], max_length=10)),
+                ('closed_at', models.DateTimeField(auto_now_add=True)),
+                ('closed_by', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payout_periods_closed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-start'],
+            },
+        ),
+        migrations.AddField(
+            model_name='commission',
+            name='payout_period',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='commissions', to='finance.payoutperiod'),
+        ),
+        migrations.CreateModel(
+            name='CommissionStatement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commissions_count', models.PositiveIntegerField()),
+                ('base_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('commission_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='commission_statements', to=settings.AUTH_USER_MODEL)),
+                ('period', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='statements', to='finance.payoutperiod')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['barber', 'created_at'], name='finance_com_barber__9779b0_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='commissionstatement',
+            constraint=models.UniqueConstraint(fields=('period', 'barber'), name='commission_statement_period_barber'),
+        ),
+    ]
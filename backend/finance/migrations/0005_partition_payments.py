@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.partitions import convert_to_partitioned
+
+
+def partition_payments(apps, schema_editor):
+    convert_to_partitioned(schema_editor, "finance_payment", "created_at")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_servicerecord_appointment_servicerecord_customer'),
+        ('finance', '0004_payout_periods'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commission',
+            name='service_record',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='commission', to='core.servicerecord'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='service_record',
+            field=models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='payment', to='core.servicerecord'),
+        ),
+        # reverter não desfaz o particionamento (a tabela particionada segue compatível com o model)
+        migrations.RunPython(partition_payments, migrations.RunPython.noop),
+    ]
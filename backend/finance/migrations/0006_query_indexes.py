@@ -0,0 +1,52 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_query_indexes'),
+        ('finance', '0005_partition_payments'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashentry',
+            index=models.Index(fields=['cash_session', 'type'], include=('amount',), name='cashentry_session_type_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='cashentry',
+            index=models.Index(fields=['-created_at', '-id'], name='cashentry_created'),
+        ),
+        migrations.AddIndex(
+            model_name='cashsession',
+            index=models.Index(condition=models.Q(('closed_at__isnull', True)), fields=['-opened_at'], name='cashsession_open'),
+        ),
+        migrations.AddIndex(
+            model_name='cashsession',
+            index=models.Index(condition=models.Q(('closed_at__isnull', False)), fields=['-closed_at', '-id'], name='cashsession_closed'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['barber', 'created_at'], include=('commission_amount',), name='commission_barber_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['created_at'], include=('commission_amount', 'barber'), name='commission_created_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(condition=models.Q(('payout_period__isnull', True)), fields=['service_record'], name='commission_unsettled'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['created_at'], include=('amount', 'method', 'service_record'), name='payment_created_cover'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['cash_session', 'method'], include=('amount',), name='payment_session_method_cover'),
+        ),
+    ]
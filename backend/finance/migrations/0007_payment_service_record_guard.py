@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:40
+
+from django.db import migrations
+
+from core.partitions import create_unique_guard, drop_unique_guard
+
+
+def add_guard(apps, schema_editor):
+    # finance_payment particionada: o UNIQUE do banco virou (service_record_id, created_at)
+    create_unique_guard(schema_editor, "finance_payment", "service_record_id")
+
+
+def remove_guard(apps, schema_editor):
+    drop_unique_guard(schema_editor, "finance_payment", "service_record_id")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('finance', '0006_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_guard, remove_guard),
+    ]
@@ -17,18 +17,71 @@ class CashSession(models.Model):
     closed_at = models.DateTimeField(null=True, blank=True)
     closing_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
 
+    # totais correntes, atualizados com F() a cada pagamento/lançamento
+    # (conferidos por: manage.py reconcile_cash_sessions)
+    payments_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    entries_in = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    entries_out = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            # get_open_cash_session roda a cada venda; só os abertos (uma linha) entram no índice
+            models.Index(fields=["-opened_at"], condition=models.Q(closed_at__isnull=True), name="cashsession_open"),
+            # histórico de fechamentos (ClosedAtPagination)
+            models.Index(fields=["-closed_at", "-id"], condition=models.Q(closed_at__isnull=False), name="cashsession_closed"),
+        ]
+
     def is_open(self):
         return self.closed_at is None
 
+    @property
+    def expected_amount(self):
+        return self.initial_amount + self.payments_total + self.entries_in - self.entries_out
+
     def close(self, user, closing_amount):
         self.closed_by = user
         self.closed_at = timezone.now()
         self.closing_amount = closing_amount
-        self.save()
+        # não regrava os totais correntes (podem ter mudado via F() desde o load)
+        self.save(update_fields=["closed_by", "closed_at", "closing_amount"])
 
     def __str__(self):
         return f"Caixa {self.opened_at:%Y-%m-%d} ({'ABERTO' if self.is_open() else 'FECHADO'})"
 
+class CashSessionReport(models.Model):
+    """
+    Fotografia do caixa no fechamento (imutável): esperado x declarado, totais
+    por forma de pagamento, lançamentos e comissões. O histórico lê só daqui.
+    """
+    cash_session = models.OneToOneField(CashSession, on_delete=models.PROTECT, primary_key=True, related_name="report")
+
+    initial_amount = models.DecimalField(max_digits=12, decimal_places=2)
+    payments_total = models.DecimalField(max_digits=12, decimal_places=2)
+    payments_count = models.PositiveIntegerField()
+    # {"CASH": {"total": "120.00", "count": 3}, "PIX": {...}, "CARD": {...}}
+    payments_by_method = models.JSONField()
+    entries_in = models.DecimalField(max_digits=12, decimal_places=2)
+    entries_in_count = models.PositiveIntegerField()
+    entries_out = models.DecimalField(max_digits=12, decimal_places=2)
+    entries_out_count = models.PositiveIntegerField()
+    commissions_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    expected_amount = models.DecimalField(max_digits=12, decimal_places=2)  # inicial + pagamentos + entradas - saídas
+    expected_cash = models.DecimalField(max_digits=12, decimal_places=2)  # idem, só pagamentos em dinheiro (gaveta)
+    declared_amount = models.DecimalField(max_digits=12, decimal_places=2)  # closing_amount
+    difference = models.DecimalField(max_digits=12, decimal_places=2)  # declarado - esperado
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Relatório de fechamento é imutável.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Fechamento do caixa {self.cash_session_id}"
+
+
 class CashEntry(models.Model):
     class Type(models.TextChoices):
         IN = "IN", "Entrada"
@@ -41,8 +94,20 @@ class CashEntry(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # totais por tipo no fechamento/conferência do caixa
+            models.Index(fields=["cash_session", "type"], include=["amount"], name="cashentry_session_type_cover"),
+            # listagem (CreatedAtPagination)
+            models.Index(fields=["-created_at", "-id"], name="cashentry_created"),
+        ]
+
 class Payment(models.Model):
-    service_record = models.OneToOneField(ServiceRecord, on_delete=models.CASCADE, related_name="payment")
+    # particionada por created_at no PostgreSQL (core/partitions.py); FK sem
+    # constraint no banco porque ServiceRecord também é particionada
+    service_record = models.OneToOneField(
+        ServiceRecord, on_delete=models.CASCADE, related_name="payment", db_constraint=False
+    )
     method = models.CharField(max_length=10, choices=PaymentMethod.choices)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
 
@@ -50,6 +115,14 @@ class Payment(models.Model):
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # pagamentos por forma no mês (OpsSummaryView) e listagem por created_at
+            models.Index(fields=["created_at"], include=["amount", "method", "service_record"], name="payment_created_cover"),
+            # totais por forma no fechamento do caixa
+            models.Index(fields=["cash_session", "method"], include=["amount"], name="payment_session_method_cover"),
+        ]
+
 class CommissionRule(models.Model):
     """
     Regra por barbeiro + serviço. Se não existir, usa Service.default_commission_percent
@@ -65,11 +138,79 @@ class CommissionRule(models.Model):
     class Meta:
         unique_together = ("barber", "service")
 
+class PayoutPeriod(models.Model):
+    """
+    Período de pagamento de comissões [start, end) em datas locais. Só existe
+    depois de fechado: o fechamento gera um CommissionStatement por barbeiro.
+    """
+    class Frequency(models.TextChoices):
+        WEEKLY = "WEEKLY", "Semanal"
+        BIWEEKLY = "BIWEEKLY", "Quinzenal"
+
+    start = models.DateField(unique=True)
+    end = models.DateField()  # exclusivo
+    frequency = models.CharField(max_length=10, choices=Frequency.choices)
+
+    closed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="payout_periods_closed")
+    closed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-start"]
+
+    def __str__(self):
+        return f"{self.start:%d/%m/%Y} a {self.end:%d/%m/%Y}"
+
+
+class CommissionStatement(models.Model):
+    """Extrato imutável de um barbeiro no período fechado."""
+    period = models.ForeignKey(PayoutPeriod, on_delete=models.PROTECT, related_name="statements")
+    barber = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="commission_statements")
+
+    commissions_count = models.PositiveIntegerField()
+    base_total = models.DecimalField(max_digits=12, decimal_places=2)
+    commission_total = models.DecimalField(max_digits=12, decimal_places=2)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "barber"], name="commission_statement_period_barber"),
+        ]
+        indexes = [
+            models.Index(fields=["barber", "created_at"]),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Extrato de comissão é imutável.")
+        super().save(*args, **kwargs)
+
+
 class Commission(models.Model):
-    service_record = models.OneToOneField(ServiceRecord, on_delete=models.CASCADE, related_name="commission")
+    service_record = models.OneToOneField(
+        ServiceRecord, on_delete=models.CASCADE, related_name="commission", db_constraint=False
+    )
     barber = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="commissions")
 
     base_amount = models.DecimalField(max_digits=10, decimal_places=2)  # preço do serviço
     commission_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
+    # preenchido no fechamento do período: comissão liquidada (entra no extrato do barbeiro)
+    payout_period = models.ForeignKey(
+        PayoutPeriod, on_delete=models.PROTECT, null=True, blank=True, related_name="commissions"
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            # listagem do barbeiro (CommissionViewSet) e comissões do mês no dashboard
+            models.Index(fields=["barber", "created_at"], include=["commission_amount"], name="commission_barber_cover"),
+            models.Index(fields=["created_at"], include=["commission_amount", "barber"], name="commission_created_cover"),
+            # fechamento do período/recálculo só olham as não liquidadas
+            models.Index(fields=["service_record"], condition=models.Q(payout_period__isnull=True), name="commission_unsettled"),
+        ]
+
+    @property
+    def settled(self):
+        return self.payout_period_id is not None
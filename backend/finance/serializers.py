@@ -1,11 +1,33 @@
 from rest_framework import serializers
-from .models import CashSession, CashEntry, Payment, CommissionRule, Commission
+from .models import (
+    CashSession, CashSessionReport, CashEntry, Payment, CommissionRule, Commission, CommissionStatement, PayoutPeriod,
+)
 
 class CashSessionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CashSession
-        fields = ["id", "opened_by", "opened_at", "initial_amount", "closed_by", "closed_at", "closing_amount"]
-        read_only_fields = ["id", "opened_by", "opened_at", "closed_by", "closed_at"]
+        fields = [
+            "id", "opened_by", "opened_at", "initial_amount", "closed_by", "closed_at", "closing_amount",
+            "payments_total", "entries_in", "entries_out",
+        ]
+        read_only_fields = [
+            "id", "opened_by", "opened_at", "closed_by", "closed_at",
+            "payments_total", "entries_in", "entries_out",
+        ]
+
+class CashSessionCloseSerializer(serializers.Serializer):
+    closing_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+class CashSessionReportSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CashSessionReport
+        exclude = ["cash_session"]
+
+class CashSessionHistorySerializer(CashSessionSerializer):
+    report = CashSessionReportSerializer(read_only=True)
+
+    class Meta(CashSessionSerializer.Meta):
+        fields = CashSessionSerializer.Meta.fields + ["report"]
 
 class CashEntrySerializer(serializers.ModelSerializer):
     class Meta:
@@ -29,5 +51,32 @@ class CommissionSerializer(serializers.ModelSerializer):
     barber_username = serializers.CharField(source="barber.username", read_only=True)
     class Meta:
         model = Commission
-        fields = ["id", "service_record", "barber", "barber_username", "base_amount", "commission_amount", "created_at"]
-        read_only_fields = ["id", "created_at"]
+        fields = [
+            "id", "service_record", "barber", "barber_username", "base_amount", "commission_amount",
+            "payout_period", "created_at",
+        ]
+        read_only_fields = ["id", "payout_period", "created_at"]
+
+class PayoutPeriodSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PayoutPeriod
+        fields = ["id", "start", "end", "frequency", "closed_by", "closed_at"]
+        read_only_fields = fields
+
+class PayoutPeriodCloseSerializer(serializers.Serializer):
+    # qualquer dia do período; padrão: o último período já encerrado
+    date = serializers.DateField(required=False)
+    frequency = serializers.ChoiceField(choices=PayoutPeriod.Frequency.choices, required=False)
+
+class CommissionStatementSerializer(serializers.ModelSerializer):
+    barber_username = serializers.CharField(source="barber.username", read_only=True)
+    period_start = serializers.DateField(source="period.start", read_only=True)
+    period_end = serializers.DateField(source="period.end", read_only=True)
+
+    class Meta:
+        model = CommissionStatement
+        fields = [
+            "id", "period", "period_start", "period_end", "barber", "barber_username",
+            "commissions_count", "base_total", "commission_total", "created_at",
+        ]
+        read_only_fields = fields
@@ -1,32 +1,475 @@
-from decimal import Decimal
-from django.db import transaction
-from .models import CommissionRule, Commission
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core.models import Service
+from dashboard.cache import invalidate_dashboards
+from .models import (
+    CashEntry, CashSession, CashSessionReport, CommissionRule, Commission, CommissionStatement, Payment,
+    PaymentMethod, PayoutPeriod,
+)
 
-def compute_commission_amount(barber, service, price_charged: Decimal) -> Decimal:
-    rule = CommissionRule.objects.filter(barber=barber, service=service, active=True).first()
-    if rule:
-        if rule.fixed_amount is not None:
-            return rule.fixed_amount
-        if rule.percent is not None:
-            return (price_charged * rule.percent) / Decimal("100")
 
-    # fallback: comissão padrão do serviço
-    percent = service.default_commission_percent
-    return (price_charged * percent) / Decimal("100")
+CENT = Decimal("0.01")
+
+
+def round_commission(value: Decimal) -> Decimal:
+    # metade para cima, como o numeric do PostgreSQL: recalcular não muda centavos já gravados
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class CommissionMatrix:
+    """
+    Foto da matriz de regras: (barbeiro, serviço) -> (percent, fixo) e o %
+    padrão de cada serviço. Calcular com ela não faz I/O; um lote usa a mesma
+    foto do começo ao fim. Valores já saem arredondados para centavos.
+    """
+
+    def __init__(self, rules, default_percent):
+        self._rules = rules
+        self._default_percent = default_percent
+
+    def commission_amount(self, barber_id, service_id, price_charged: Decimal) -> Decimal:
+        percent, fixed_amount = self._rules.get((barber_id, service_id), (None, None))
+        if fixed_amount is not None:
+            return round_commission(fixed_amount)
+        if percent is not None:
+            return round_commission(price_charged * percent / Decimal("100"))
+
+        # fallback: comissão padrão do serviço
+        percent = self._default_percent.get(service_id)
+        if percent is None:
+            # serviço criado depois da última carga (ainda sem commit)
+            percent = Service.objects.values_list("default_commission_percent", flat=True).get(id=service_id)
+        return round_commission(price_charged * percent / Decimal("100"))
+
+
+class CommissionRuleResolver:
+    """
+    Matriz (barbeiro, serviço) -> regra ativa, mais o % padrão de cada serviço,
+    carregada inteira em memória. Regras mudam poucas vezes por mês e são lidas
+    em toda venda, então o cálculo da comissão não vai ao banco.
+
+    Invalidação entre workers: os sinais de CommissionRule/Service trocam um
+    token de versão no cache compartilhado (CACHES); matrix() compara o token
+    e recarrega quando ele muda. É uma leitura de cache por chamada: lotes
+    pegam a matriz uma vez e calculam com ela.
+    """
+    VERSION_KEY = "finance:commission-rules:version"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._matrix = CommissionMatrix({}, {})
+
+    def _shared_version(self):
+        version = cache.get(self.VERSION_KEY)
+        if version is None:
+            cache.add(self.VERSION_KEY, uuid.uuid4().hex, timeout=None)
+            version = cache.get(self.VERSION_KEY)
+        return version
+
+    def _load(self, version):
+        rules = {
+            (barber_id, service_id): (percent, fixed_amount)
+            for barber_id, service_id, percent, fixed_amount in CommissionRule.objects.filter(active=True)
+            .values_list("barber_id", "service_id", "percent", "fixed_amount")
+        }
+        defaults = dict(Service.objects.values_list("id", "default_commission_percent"))
+        self._matrix, self._version = CommissionMatrix(rules, defaults), version
+
+    def matrix(self) -> CommissionMatrix:
+        """Matriz atual (confere a versão no cache uma vez)."""
+        version = self._shared_version()
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    self._load(version)
+        return self._matrix
+
+    def commission_amount(self, barber_id, service_id, price_charged: Decimal) -> Decimal:
+        return self.matrix().commission_amount(barber_id, service_id, price_charged)
+
+    def invalidate(self):
+        """
+        Troca a versão e recarrega a matriz só depois do commit: uma carga
+        feita dentro da transação guardaria regras que um rollback desfaz.
+        """
+        transaction.on_commit(self._reload)
+
+    def _reload(self):
+        version = uuid.uuid4().hex
+        cache.set(self.VERSION_KEY, version, timeout=None)
+        with self._lock:
+            self._load(version)
+
+
+commission_rules = CommissionRuleResolver()
+
+
+def compute_commission_amount(barber_id, service_id, price_charged: Decimal, matrix=None) -> Decimal:
+    """Comissão pelas regras atuais; em lote, passe a mesma `matrix` (commission_rules.matrix())."""
+    return (matrix or commission_rules.matrix()).commission_amount(barber_id, service_id, price_charged)
+
+
+def build_commissions(records) -> list:
+    """
+    Commissions (não salvas) para um lote de ServiceRecords já criados.
+    Uma leitura da versão das regras para o lote inteiro.
+    """
+    matrix = commission_rules.matrix()
+    return [
+        Commission(
+            service_record=r,
+            barber_id=r.barber_id,
+            base_amount=r.price_charged,
+            commission_amount=matrix.commission_amount(r.barber_id, r.service_id, r.price_charged),
+        )
+        for r in records
+    ]
 
 
 @transaction.atomic
 def create_or_update_commission(service_record):
     amount = compute_commission_amount(
-        barber=service_record.barber,
-        service=service_record.service,
+        barber_id=service_record.barber_id,
+        service_id=service_record.service_id,
         price_charged=service_record.price_charged,
     )
     Commission.objects.update_or_create(
         service_record=service_record,
         defaults={
-            "barber": service_record.barber,
+            "barber_id": service_record.barber_id,
             "base_amount": service_record.price_charged,
             "commission_amount": amount,
         },
     )
+
+
+def add_to_cash_totals(cash_session_id, *, payments=0, entries_in=0, entries_out=0):
+    """
+    Soma deltas nos totais correntes do caixa. UPDATE com F(): seguro com
+    vendas simultâneas, sem ler/travar a linha em Python.
+    Caixa fechado não muda: os totais ficam iguais aos do relatório de
+    fechamento, e a diferença aparece no reconcile_cash_sessions.
+    """
+    CashSession.objects.filter(pk=cash_session_id, closed_at__isnull=True).update(
+        payments_total=F("payments_total") + payments,
+        entries_in=F("entries_in") + entries_in,
+        entries_out=F("entries_out") + entries_out,
+    )
+
+
+def add_cash_entry_to_totals(entry, sign: int = 1):
+    amount = entry.amount * sign
+    if entry.type == CashEntry.Type.IN:
+        add_to_cash_totals(entry.cash_session_id, entries_in=amount)
+    else:
+        add_to_cash_totals(entry.cash_session_id, entries_out=amount)
+
+
+def _sum_by_session(queryset):
+    subquery = (
+        queryset.filter(cash_session=OuterRef("pk"))
+        .values("cash_session")
+        .annotate(total=Sum("amount"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(subquery), Value(Decimal("0")),
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+def reconcile_cash_totals(sessions, fix: bool = False) -> list:
+    """
+    Confere os totais correntes contra Payment/CashEntry (uma consulta para
+    todas as sessões). Retorna [(sessão, {campo: (gravado, real)})] das
+    divergentes; com fix=True grava os valores reais só nos caixas abertos
+    (os fechados ficam como no relatório de fechamento e só são apontados).
+    """
+    fields = ("payments_total", "entries_in", "entries_out")
+    annotated = sessions.annotate(
+        real_payments_total=_sum_by_session(Payment.objects.all()),
+        real_entries_in=_sum_by_session(CashEntry.objects.filter(type=CashEntry.Type.IN)),
+        real_entries_out=_sum_by_session(CashEntry.objects.filter(type=CashEntry.Type.OUT)),
+    )
+
+    mismatches = []
+    for session in annotated.iterator():
+        diff = {
+            f: (getattr(session, f), getattr(session, f"real_{f}"))
+            for f in fields
+            if getattr(session, f) != getattr(session, f"real_{f}")
+        }
+        if diff:
+            mismatches.append((session, diff))
+            if fix and session.is_open():
+                CashSession.objects.filter(pk=session.pk).update(**{f: real for f, (_, real) in diff.items()})
+    return mismatches
+
+
+def _money(value):
+    # linhas do UNION podem vir sem o conversor do campo (ex.: SQLite)
+    return Decimal(value or 0).quantize(Decimal("0.01"))
+
+
+def _close_totals(session_id):
+    """
+    Totais do caixa numa única consulta agrupada (UNION ALL): pagamentos por
+    forma (soma, quantidade e comissões dos atendimentos) e lançamentos por tipo.
+    Linhas: (chave, total, quantidade, comissões); chaves não colidem
+    (CASH/PIX/CARD x IN/OUT).
+    """
+    money = models.DecimalField(max_digits=12, decimal_places=2)
+    payments = (
+        Payment.objects.filter(cash_session_id=session_id)
+        .order_by()
+        .values("method")
+        .annotate(
+            total=Sum("amount"),
+            count=Count("id"),
+            commissions=Sum("service_record__commission__commission_amount", output_field=money),
+        )
+        .values_list("method", "total", "count", "commissions")
+    )
+    entries = (
+        CashEntry.objects.filter(cash_session_id=session_id)
+        .order_by()
+        .values("type")
+        .annotate(total=Sum("amount"), count=Count("id"), commissions=Value(None, output_field=money))
+        .values_list("type", "total", "count", "commissions")
+    )
+    return {key: (_money(total), count, _money(commissions)) for key, total, count, commissions in payments.union(entries, all=True)}
+
+
+def build_close_report(session, declared_amount) -> CashSessionReport:
+    """CashSessionReport (não salvo) com os totais reais do caixa."""
+    totals = _close_totals(session.pk)
+    empty = (Decimal("0.00"), 0, Decimal("0.00"))
+
+    by_method = {}
+    for method in PaymentMethod.values:
+        total, count, _ = totals.get(method, empty)
+        by_method[method] = {"total": str(total), "count": count}
+    payments_total = sum((totals.get(m, empty)[0] for m in PaymentMethod.values), Decimal("0.00"))
+    payments_count = sum(totals.get(m, empty)[1] for m in PaymentMethod.values)
+    commissions_total = sum((totals.get(m, empty)[2] for m in PaymentMethod.values), Decimal("0.00"))
+
+    entries_in, entries_in_count, _ = totals.get(CashEntry.Type.IN, empty)
+    entries_out, entries_out_count, _ = totals.get(CashEntry.Type.OUT, empty)
+    movements = session.initial_amount + entries_in - entries_out
+    expected_amount = movements + payments_total
+    declared_amount = Decimal(declared_amount)
+
+    return CashSessionReport(
+        cash_session=session,
+        initial_amount=session.initial_amount,
+        payments_total=payments_total,
+        payments_count=payments_count,
+        payments_by_method=by_method,
+        entries_in=entries_in,
+        entries_in_count=entries_in_count,
+        entries_out=entries_out,
+        entries_out_count=entries_out_count,
+        commissions_total=commissions_total,
+        expected_amount=expected_amount,
+        expected_cash=movements + totals.get(PaymentMethod.CASH, empty)[0],
+        declared_amount=declared_amount,
+        difference=declared_amount - expected_amount,
+    )
+
+
+@transaction.atomic
+def close_cash_session(session, user, closing_amount) -> CashSessionReport:
+    """
+    Fecha o caixa e grava o relatório de fechamento na mesma transação.
+    O SELECT ... FOR UPDATE na sessão segura vendas/lançamentos concorrentes
+    (a FK deles precisa de lock na linha) até o commit: o relatório fecha
+    exatamente com o que ficou no caixa.
+    """
+    session = CashSession.objects.select_for_update().get(pk=session.pk)
+    if not session.is_open():
+        raise ValueError("Caixa já está fechado.")
+
+    report = build_close_report(session, closing_amount)
+    session.close(user=user, closing_amount=report.declared_amount)
+    report.save()
+    return report
+
+
+PERIOD_DAYS = {
+    PayoutPeriod.Frequency.WEEKLY: 7,
+    PayoutPeriod.Frequency.BIWEEKLY: 14,
+}
+
+
+def payout_period_bounds(day, frequency=None):
+    """[start, end) do período (configurado em COMMISSION_PAYOUT_*) que contém `day`."""
+    frequency = frequency or settings.COMMISSION_PAYOUT_FREQUENCY
+    anchor = date.fromisoformat(settings.COMMISSION_PAYOUT_ANCHOR)
+    length = PERIOD_DAYS[frequency]
+    start = anchor + timedelta(days=(day - anchor).days // length * length)
+    return start, start + timedelta(days=length)
+
+
+def last_completed_period_bounds(today=None, frequency=None):
+    today = today or timezone.localdate()
+    start, _ = payout_period_bounds(today, frequency)
+    return payout_period_bounds(start - timedelta(days=1), frequency)
+
+
+def _check_period_order(start, end, frequency):
+    """O período precisa começar onde o último fechado terminou."""
+    previous = PayoutPeriod.objects.order_by("-end").values_list("end", flat=True).first()
+    if previous is not None:
+        if start < previous:
+            if PayoutPeriod.objects.filter(start__lt=end, end__gt=start).exists():
+                raise ValueError("Período já fechado.")
+            raise ValueError("Período anterior ao último fechado.")
+        if start > previous:
+            raise ValueError(f"Feche antes o período que começa em {previous:%d/%m/%Y}.")
+        return
+
+    # primeiro fechamento: começa pelo período da comissão em aberto mais antiga
+    start_at = datetime.combine(start, time.min, tzinfo=timezone.get_default_timezone())
+    oldest = (
+        Commission.objects.filter(payout_period__isnull=True, service_record__performed_at__lt=start_at)
+        .order_by("service_record__performed_at")
+        .values_list("service_record__performed_at", flat=True)
+        .first()
+    )
+    if oldest is not None:
+        first, _ = payout_period_bounds(timezone.localtime(oldest, timezone.get_default_timezone()).date(), frequency)
+        raise ValueError(f"Feche antes o período que começa em {first:%d/%m/%Y}.")
+
+
+@transaction.atomic
+def close_payout_period(day, user, frequency=None) -> PayoutPeriod:
+    """
+    Fecha o período que contém `day`:
+    1. UPDATE marca como liquidadas (payout_period) as comissões ainda abertas
+       de atendimentos anteriores ao fim do período (inclui lançamentos
+       atrasados de períodos já fechados);
+    2. uma consulta agrupada por barbeiro soma só as linhas marcadas e gera os
+       extratos com bulk_create.
+    Marcar antes de somar garante que extrato e comissões liquidadas batem,
+    mesmo com vendas entrando durante o fechamento.
+
+    Períodos fecham em ordem, sem buracos: senão o passo 1 levaria as
+    comissões de um período anterior ainda aberto, que depois só fecharia
+    com extratos vazios.
+    """
+    frequency = frequency or settings.COMMISSION_PAYOUT_FREQUENCY
+    start, end = payout_period_bounds(day, frequency)
+    if end > timezone.localdate():
+        raise ValueError("Período ainda não terminou.")
+    _check_period_order(start, end, frequency)
+
+    try:
+        with transaction.atomic():
+            period = PayoutPeriod.objects.create(start=start, end=end, frequency=frequency, closed_by=user)
+    except IntegrityError:  # fechado por outra requisição ao mesmo tempo
+        raise ValueError("Período já fechado.")
+
+    end_at = datetime.combine(end, time.min, tzinfo=timezone.get_default_timezone())
+    Commission.objects.filter(
+        payout_period__isnull=True, service_record__performed_at__lt=end_at,
+    ).update(payout_period=period)
+
+    totals = (
+        Commission.objects.filter(payout_period=period)
+        .order_by()
+        .values("barber")
+        .annotate(count=Count("id"), base_total=Sum("base_amount"), commission_total=Sum("commission_amount"))
+        .order_by("barber")
+    )
+    CommissionStatement.objects.bulk_create([
+        CommissionStatement(
+            period=period,
+            barber_id=row["barber"],
+            commissions_count=row["count"],
+            base_total=row["base_total"],
+            commission_total=row["commission_total"],
+        )
+        for row in totals
+    ])
+    return period
+
+
+def recompute_commissions(*, barber_id=None, service_id=None, date_from=None, date_to=None,
+                          batch_size=2000, dry_run=False) -> dict:
+    """
+    Recalcula as comissões ainda não liquidadas (fora de período fechado) com
+    as regras atuais. Lê em lotes por id (keyset, memória constante), calcula
+    com uma foto da matriz de regras por lote e grava só as que mudaram, com
+    um bulk_update por lote. Cada lote trava suas linhas (FOR UPDATE) para não
+    sobrescrever uma comissão liquidada no meio do caminho; dry_run só lê, sem
+    travar nada.
+
+    Devolve o diff: totais antigo/novo, geral e por barbeiro.
+    """
+    qs = Commission.objects.all()
+    if barber_id:
+        qs = qs.filter(service_record__barber_id=barber_id)
+    if service_id:
+        qs = qs.filter(service_record__service_id=service_id)
+    tz = timezone.get_default_timezone()
+    if date_from:
+        qs = qs.filter(service_record__performed_at__gte=datetime.combine(date_from, time.min, tzinfo=tz))
+    if date_to:
+        qs = qs.filter(service_record__performed_at__lt=datetime.combine(date_to + timedelta(days=1), time.min, tzinfo=tz))
+
+    report = {
+        "scanned": 0,
+        "changed": 0,
+        "skipped_settled": qs.filter(payout_period__isnull=False).count(),
+        "old_total": Decimal("0.00"),
+        "new_total": Decimal("0.00"),
+        "by_barber": {},
+    }
+    open_qs = qs.filter(payout_period__isnull=True).order_by("id")
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            batch = open_qs.filter(id__gt=last_id)
+            if not dry_run:
+                batch = batch.select_for_update(of=("self",))
+            rows = list(
+                batch.values_list(
+                    "id", "barber_id", "base_amount", "commission_amount",
+                    "service_record__barber_id", "service_record__service_id", "service_record__price_charged",
+                )[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            matrix = commission_rules.matrix()
+            changed, affected = [], set()
+            for commission_id, old_barber, old_base, old, barber, service, price in rows:
+                new = matrix.commission_amount(barber, service, price)
+                report["old_total"] += old
+                report["new_total"] += new
+                by_barber = report["by_barber"]
+                by_barber.setdefault(old_barber, {"old": Decimal("0.00"), "new": Decimal("0.00")})["old"] += old
+                by_barber.setdefault(barber, {"old": Decimal("0.00"), "new": Decimal("0.00")})["new"] += new
+                if (new, barber, price) != (old, old_barber, old_base):
+                    changed.append(Commission(id=commission_id, barber_id=barber, base_amount=price, commission_amount=new))
+                    affected.update((old_barber, barber))
+
+            report["scanned"] += len(rows)
+            report["changed"] += len(changed)
+            if changed and not dry_run:
+                Commission.objects.bulk_update(changed, ["barber", "base_amount", "commission_amount"])
+                # bulk_update não dispara sinais: o cache do dashboard é invalidado aqui
+                invalidate_dashboards(affected)
+
+    report["difference"] = report["new_total"] - report["old_total"]
+    return report
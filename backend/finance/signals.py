@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+
+from core.models import Service
+from .models import Commission, CommissionRule, Payment
+from .services import add_to_cash_totals, commission_rules
+
+
+@receiver(post_save, sender=CommissionRule)
+@receiver(post_delete, sender=CommissionRule)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def invalidate_commission_rules(sender, **kwargs):
+    commission_rules.invalidate()
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_cash_totals(sender, instance, **kwargs):
+    # pagamentos só somem em cascata ao excluir o ServiceRecord; caixa fechado
+    # não muda (add_to_cash_totals), a diferença fica para o reconcile apontar
+    if instance.cash_session_id:
+        add_to_cash_totals(instance.cash_session_id, payments=-instance.amount)
+
+
+@receiver(pre_delete, sender=Commission)
+def protect_settled_commission(sender, instance, **kwargs):
+    # comissão liquidada está num extrato imutável: excluir o atendimento
+    # (cascata) faria o extrato deixar de bater com as comissões do período
+    if instance.payout_period_id:
+        raise ValueError("Atendimento com comissão já liquidada em período fechado não pode ser excluído.")
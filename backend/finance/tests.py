@@ -1,3 +1,424 @@
-from django.test import TestCase
+from datetime import date, datetime, time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Profile
+from core.models import Service, ServiceRecord
+from core.services import register_service_sale
+from finance.models import (
+    CashEntry, CashSession, CashSessionReport, Commission, CommissionRule, CommissionStatement, PaymentMethod,
+)
+from finance.services import (
+    add_cash_entry_to_totals, build_commissions, close_cash_session, close_payout_period, commission_rules,
+    compute_commission_amount, payout_period_bounds, recompute_commissions,
+)
+
+User = get_user_model()
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CommissionRuleResolverTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte", default_commission_percent=Decimal("40.00"))
+
+    def setUp(self):
+        cache.clear()  # versão nova: a matriz de outro teste (já desfeito) não vale
+
+    def test_hot_path_issues_no_queries(self):
+        compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00"))  # carrega a matriz
+
+        with self.assertNumQueries(0):
+            amount = compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00"))
+        self.assertEqual(amount, Decimal("20.00"))
+
+    def test_batch_reads_rule_version_once(self):
+        records = [
+            ServiceRecord.objects.create(
+                barber=self.barber, service=self.service, price_charged=Decimal("50.00"), performed_at=timezone.now(),
+            )
+            for _ in range(3)
+        ]
+        with mock.patch.object(commission_rules, "_shared_version", wraps=commission_rules._shared_version) as version:
+            commissions = build_commissions(records)
+        self.assertEqual(version.call_count, 1)
+        self.assertEqual([c.commission_amount for c in commissions], [Decimal("20.00")] * 3)
+
+    def test_rule_and_service_changes_invalidate(self):
+        self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("20.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule = CommissionRule.objects.create(barber=self.barber, service=self.service, fixed_amount=Decimal("12.00"))
+        self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("12.00"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.active = False
+            rule.save()
+            self.service.default_commission_percent = Decimal("30.00")
+            self.service.save()
+        self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("15.00"))
+
+    def test_rolled_back_rule_is_not_cached(self):
+        self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("20.00"))
+
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError), transaction.atomic():
+            CommissionRule.objects.create(barber=self.barber, service=self.service, fixed_amount=Decimal("12.00"))
+            self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("20.00"))
+            raise RuntimeError("rollback")
+        self.assertEqual(compute_commission_amount(self.barber.id, self.service.id, Decimal("50.00")), Decimal("20.00"))
+
+
+class CashSessionCloseReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte", default_commission_percent=Decimal("40.00"))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.session = CashSession.objects.create(opened_by=self.manager, initial_amount=Decimal("100.00"))
+
+    def sell(self, method, price):
+        record = ServiceRecord.objects.create(
+            barber=self.barber, service=self.service, price_charged=price,
+            performed_at=timezone.now(),
+        )
+        register_service_sale(
+            service_record=record, payment_method=method, payment_amount=price, created_by=self.manager,
+        )
+
+    def entry(self, type, amount):
+        add_cash_entry_to_totals(CashEntry.objects.create(
+            cash_session=self.session, type=type, amount=amount, description="x", created_by=self.manager,
+        ))
+
+    def test_close_snapshots_totals_and_difference(self):
+        self.sell(PaymentMethod.CASH, Decimal("50.00"))
+        self.sell(PaymentMethod.CASH, Decimal("30.00"))
+        self.sell(PaymentMethod.PIX, Decimal("40.00"))
+        self.entry(CashEntry.Type.IN, Decimal("20.00"))
+        self.entry(CashEntry.Type.OUT, Decimal("15.00"))
+
+        response = self.client.post(
+            f"/api/cash-sessions/{self.session.id}/close/", {"closing_amount": "180.00"}, format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        report = CashSessionReport.objects.get(cash_session=self.session)
+        self.assertEqual(report.payments_total, Decimal("120.00"))
+        self.assertEqual(report.payments_count, 3)
+        self.assertEqual(report.payments_by_method, {
+            "CASH": {"total": "80.00", "count": 2},
+            "PIX": {"total": "40.00", "count": 1},
+            "CARD": {"total": "0.00", "count": 0},
+        })
+        self.assertEqual((report.entries_in, report.entries_in_count), (Decimal("20.00"), 1))
+        self.assertEqual((report.entries_out, report.entries_out_count), (Decimal("15.00"), 1))
+        self.assertEqual(report.commissions_total, Decimal("48.00"))
+        self.assertEqual(report.expected_amount, Decimal("225.00"))
+        self.assertEqual(report.expected_cash, Decimal("185.00"))
+        self.assertEqual(report.declared_amount, Decimal("180.00"))
+        self.assertEqual(report.difference, Decimal("-45.00"))
+        self.assertEqual(response.json()["report"]["difference"], "-45.00")
+
+        with self.assertRaises(ValueError):
+            report.save()
+
+        response = self.client.post(
+            f"/api/cash-sessions/{self.session.id}/close/", {"closing_amount": "180.00"}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_close_requires_amount(self):
+        response = self.client.post(f"/api/cash-sessions/{self.session.id}/close/", {}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("closing_amount", response.json())
+        self.assertTrue(CashSession.objects.get(pk=self.session.pk).is_open())
+
+    def test_history_reads_reports_without_detail_tables(self):
+        self.sell(PaymentMethod.CARD, Decimal("25.00"))
+        self.client.post(f"/api/cash-sessions/{self.session.id}/close/", {"closing_amount": "125.00"}, format="json")
+        CashSession.objects.create(opened_by=self.manager)  # aberto: fora do histórico
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/cash-sessions/history/")
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([r["id"] for r in results], [self.session.id])
+        self.assertEqual(results[0]["report"]["difference"], "0.00")
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("finance_payment", sql)
+        self.assertNotIn("finance_cashentry", sql)
+
+
+@override_settings(COMMISSION_PAYOUT_FREQUENCY="BIWEEKLY", COMMISSION_PAYOUT_ANCHOR="2024-01-01")
+class CashSessionTotalsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.service = Service.objects.create(name="Corte")
+
+    def setUp(self):
+        self.session = CashSession.objects.create(opened_by=self.manager)
+
+    def sell(self, price):
+        record = ServiceRecord.objects.create(
+            barber=self.manager, service=self.service, price_charged=Decimal(price), performed_at=timezone.now(),
+        )
+        register_service_sale(service_record=record, payment_method=PaymentMethod.CASH, payment_amount=Decimal(price), created_by=self.manager)
+        return record
+
+    def totals(self):
+        self.session.refresh_from_db()
+        return self.session.payments_total, self.session.entries_in, self.session.entries_out
+
+    def reconcile(self, *args):
+        out = StringIO()
+        call_command("reconcile_cash_sessions", *args, stdout=out)
+        return out.getvalue()
+
+    def test_running_totals_follow_sales_entries_and_deletes(self):
+        self.sell("40.00")
+        sold = self.sell("25.00")
+        entry = CashEntry.objects.create(
+            cash_session=self.session, type=CashEntry.Type.OUT, amount=Decimal("10.00"), description="troco", created_by=self.manager,
+        )
+        add_cash_entry_to_totals(entry)
+        self.assertEqual(self.totals(), (Decimal("65.00"), Decimal("0.00"), Decimal("10.00")))
+
+        # cascata ServiceRecord -> Payment tira o pagamento do caixa aberto
+        sold.delete()
+        self.assertEqual(self.totals(), (Decimal("40.00"), Decimal("0.00"), Decimal("10.00")))
+        self.assertIn("nenhuma divergência", self.reconcile())
+
+    def test_reconcile_reports_and_fixes_open_sessions(self):
+        self.sell("40.00")
+        CashSession.objects.filter(pk=self.session.pk).update(payments_total=Decimal("0.00"))
+
+        with self.assertRaisesMessage(CommandError, "1 caixa(s) com divergência"):
+            self.reconcile()
+        self.assertIn("corrigido", self.reconcile("--fix"))
+        self.assertEqual(self.totals()[0], Decimal("40.00"))
+
+    def test_closed_session_keeps_closing_totals(self):
+        sold = self.sell("40.00")
+        close_cash_session(self.session, self.manager, Decimal("40.00"))
+
+        sold.delete()
+        self.assertEqual(self.totals()[0], Decimal("40.00"))
+        self.assertEqual(self.session.report.payments_total, Decimal("40.00"))
+
+        # a divergência com os lançamentos é apontada, mas o fechamento não é reescrito
+        with self.assertRaisesMessage(CommandError, "fechado(s) com divergência"):
+            self.reconcile("--fix")
+        self.assertEqual(self.totals()[0], Decimal("40.00"))
+
+    def test_seeded_sessions_reconcile(self):
+        call_command("seed_initial", barbers=1, customers=5, records=30, stdout=StringIO())
+        self.assertIn("nenhuma divergência", self.reconcile())
+
+
+class PayoutPeriodTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.manager.profile.role = Profile.Role.MANAGER
+        cls.manager.profile.save()
+        cls.ana = User.objects.create_user(username="ana", password="x")
+        cls.bia = User.objects.create_user(username="bia", password="x")
+        cls.service = Service.objects.create(name="Corte", default_commission_percent=Decimal("40.00"))
+
+    def commission(self, barber, day, price):
+        performed_at = datetime.combine(day, time(10), tzinfo=timezone.get_default_timezone())
+        record = ServiceRecord.objects.create(
+            barber=barber, service=self.service, price_charged=price, performed_at=performed_at,
+        )
+        return Commission.objects.create(
+            service_record=record, barber=barber, base_amount=price, commission_amount=price * Decimal("0.4"),
+        )
+
+    def test_bounds_follow_frequency_and_anchor(self):
+        self.assertEqual(payout_period_bounds(date(2024, 1, 20)), (date(2024, 1, 15), date(2024, 1, 29)))
+        self.assertEqual(payout_period_bounds(date(2024, 1, 20), "WEEKLY"), (date(2024, 1, 15), date(2024, 1, 22)))
+
+    def test_close_builds_statements_and_settles_commissions(self):
+        self.commission(self.ana, date(2024, 1, 2), Decimal("50.00"))
+        self.commission(self.ana, date(2024, 1, 10), Decimal("30.00"))
+        self.commission(self.bia, date(2024, 1, 14), Decimal("40.00"))
+        later = self.commission(self.ana, date(2024, 1, 15), Decimal("100.00"))  # próximo período
+
+        # savepoints + checagens de ordem + período + UPDATE + agregado + bulk_create:
+        # não depende do volume
+        with self.assertNumQueries(10):
+            period = close_payout_period(date(2024, 1, 5), self.manager)
+
+        self.assertEqual((period.start, period.end), (date(2024, 1, 1), date(2024, 1, 15)))
+        statements = {s.barber_id: s for s in CommissionStatement.objects.filter(period=period)}
+        self.assertEqual(statements[self.ana.id].commissions_count, 2)
+        self.assertEqual(statements[self.ana.id].commission_total, Decimal("32.00"))
+        self.assertEqual(statements[self.bia.id].commission_total, Decimal("16.00"))
+        self.assertEqual(Commission.objects.filter(payout_period=period).count(), 3)
+        later.refresh_from_db()
+        self.assertFalse(later.settled)
+
+        with self.assertRaises(ValueError):
+            close_payout_period(date(2024, 1, 10), self.manager)
+        with self.assertRaises(ValueError):
+            statements[self.ana.id].save()
+
+        # lançamento atrasado de período já fechado entra no próximo extrato
+        self.commission(self.bia, date(2024, 1, 3), Decimal("10.00"))
+        period = close_payout_period(date(2024, 1, 20), self.manager)
+        totals = dict(period.statements.values_list("barber_id", "commission_total"))
+        self.assertEqual(totals, {self.ana.id: Decimal("40.00"), self.bia.id: Decimal("4.00")})
+
+    def test_periods_close_in_order(self):
+        self.commission(self.ana, date(2024, 1, 2), Decimal("50.00"))
+        self.commission(self.bia, date(2024, 1, 16), Decimal("20.00"))
+
+        with self.assertRaisesMessage(ValueError, "começa em 01/01/2024"):
+            close_payout_period(date(2024, 1, 20), self.manager)
+        close_payout_period(date(2024, 1, 5), self.manager)
+        with self.assertRaisesMessage(ValueError, "começa em 15/01/2024"):
+            close_payout_period(date(2024, 2, 1), self.manager)
+
+        period = close_payout_period(date(2024, 1, 20), self.manager)
+        self.assertEqual(list(period.statements.values_list("barber_id", "commission_total")), [(self.bia.id, Decimal("8.00"))])
+
+    def test_settled_sale_cannot_be_deleted(self):
+        settled = self.commission(self.ana, date(2024, 1, 2), Decimal("50.00"))
+        close_payout_period(date(2024, 1, 2), self.manager)
+        open_one = self.commission(self.ana, date(2024, 1, 16), Decimal("30.00"))
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        response = client.delete(f"/api/service-records/{settled.service_record_id}/")
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(Commission.objects.filter(pk=settled.pk).exists())
+        with self.assertRaises(ValueError), transaction.atomic():
+            ServiceRecord.objects.filter(pk=settled.service_record_id).delete()
+
+        self.assertEqual(client.delete(f"/api/service-records/{open_one.service_record_id}/").status_code, 204)
+        self.assertFalse(Commission.objects.filter(pk=open_one.pk).exists())
+
+    def test_period_must_be_over(self):
+        with self.assertRaises(ValueError):
+            close_payout_period(timezone.localdate(), self.manager)
+
+    def test_api_close_and_barber_sees_only_own_statements(self):
+        self.commission(self.ana, date(2024, 1, 2), Decimal("50.00"))
+        self.commission(self.bia, date(2024, 1, 2), Decimal("20.00"))
+        client = APIClient()
+        client.force_authenticate(self.manager)
+
+        response = client.post("/api/payout-periods/close/", {"date": "2024-01-02"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([s["barber_username"] for s in response.json()["statements"]], ["ana", "bia"])
+        self.assertEqual(client.post("/api/payout-periods/close/", {"date": "2024-01-02"}, format="json").status_code, 400)
+
+        client.force_authenticate(self.ana)
+        with self.assertNumQueries(1):
+            response = client.get("/api/commission-statements/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([s["commission_total"] for s in response.json()["results"]], ["20.00"])
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    COMMISSION_PAYOUT_FREQUENCY="WEEKLY",
+    COMMISSION_PAYOUT_ANCHOR="2024-01-01",
+)
+class RecomputeCommissionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_user(username="gerente", password="x")
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.other = User.objects.create_user(username="outro", password="x")
+        cls.service = Service.objects.create(name="Corte", default_commission_percent=Decimal("40.00"))
+
+    def setUp(self):
+        cache.clear()
+
+    def commission(self, barber, day, price=Decimal("50.00")):
+        record = ServiceRecord.objects.create(
+            barber=barber, service=self.service, price_charged=price,
+            performed_at=datetime.combine(day, time(10), tzinfo=timezone.get_default_timezone()),
+        )
+        return Commission.objects.create(
+            service_record=record, barber=barber, base_amount=price,
+            commission_amount=compute_commission_amount(barber.id, self.service.id, price),
+        )
+
+    def test_recomputes_open_commissions_in_batches(self):
+        settled = self.commission(self.barber, date(2024, 1, 2))
+        close_payout_period(date(2024, 1, 2), self.manager)
+        open_ones = [self.commission(self.barber, date(2024, 1, 9)) for _ in range(5)]
+        untouched = self.commission(self.other, date(2024, 1, 9))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            CommissionRule.objects.create(barber=self.barber, service=self.service, percent=Decimal("50.00"))
+
+        preview = recompute_commissions(barber_id=self.barber.id, batch_size=2, dry_run=True)
+        self.assertEqual(preview["changed"], 5)
+        self.assertEqual(Commission.objects.get(pk=open_ones[0].pk).commission_amount, Decimal("20.00"))
+
+        # uma leitura da versão das regras e uma invalidação do dashboard por lote
+        with mock.patch.object(commission_rules, "_shared_version", wraps=commission_rules._shared_version) as version, \
+                mock.patch("finance.services.invalidate_dashboards") as invalidate:
+            report = recompute_commissions(barber_id=self.barber.id, batch_size=2)
+        self.assertEqual(version.call_count, 3)
+        self.assertEqual([c.args for c in invalidate.call_args_list], [({self.barber.id},)] * 3)
+        self.assertEqual((report["scanned"], report["changed"], report["skipped_settled"]), (5, 5, 1))
+        self.assertEqual(report["old_total"], Decimal("100.00"))
+        self.assertEqual(report["new_total"], Decimal("125.00"))
+        self.assertEqual(report["difference"], Decimal("25.00"))
+        self.assertEqual(
+            set(Commission.objects.filter(pk__in=[c.pk for c in open_ones]).values_list("commission_amount", flat=True)),
+            {Decimal("25.00")},
+        )
+        self.assertEqual(Commission.objects.get(pk=settled.pk).commission_amount, Decimal("20.00"))
+        self.assertEqual(Commission.objects.get(pk=untouched.pk).commission_amount, Decimal("20.00"))
+
+        self.assertEqual(recompute_commissions(barber_id=self.barber.id)["changed"], 0)
+
+    def test_half_cent_rounds_up_and_recompute_keeps_it(self):
+        CommissionRule.objects.create(barber=self.barber, service=self.service, percent=Decimal("50.00"))
+        commission = self.commission(self.barber, date(2024, 1, 9), price=Decimal("25.25"))
+
+        # 12.625: metade para cima, como o numeric do PostgreSQL
+        self.assertEqual(commission.commission_amount, Decimal("12.63"))
+        self.assertEqual(recompute_commissions()["changed"], 0)
+
+    def test_follows_record_edits_and_date_range(self):
+        commission = self.commission(self.barber, date(2024, 1, 9))
+        ServiceRecord.objects.filter(pk=commission.service_record_id).update(
+            barber=self.other, price_charged=Decimal("80.00"),
+        )
+
+        self.assertEqual(recompute_commissions(date_from=date(2024, 1, 10))["scanned"], 0)
+        report = recompute_commissions(date_from=date(2024, 1, 9), date_to=date(2024, 1, 9))
+
+        self.assertEqual(report["changed"], 1)
+        self.assertEqual(report["by_barber"][self.barber.id], {"old": Decimal("20.00"), "new": Decimal("0.00")})
+        commission.refresh_from_db()
+        self.assertEqual(
+            (commission.barber_id, commission.base_amount, commission.commission_amount),
+            (self.other.id, Decimal("80.00"), Decimal("32.00")),
+        )
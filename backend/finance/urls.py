@@ -7,6 +7,8 @@ from .views import (
     PaymentViewSet,
     CommissionRuleViewSet,
     CommissionViewSet,
+    CommissionStatementViewSet,
+    PayoutPeriodViewSet,
     OpenCashSummaryView,
 )
 
@@ -16,6 +18,8 @@ router.register(r"cash-entries", CashEntryViewSet, basename="cash-entries")
 router.register(r"payments", PaymentViewSet, basename="payments")
 router.register(r"commission-rules", CommissionRuleViewSet, basename="commission-rules")
 router.register(r"commissions", CommissionViewSet, basename="commissions")
+router.register(r"payout-periods", PayoutPeriodViewSet, basename="payout-periods")
+router.register(r"commission-statements", CommissionStatementViewSet, basename="commission-statements")
 
 urlpatterns = [
     # Caixa aberto + resumo (MVP)
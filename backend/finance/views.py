@@ -1,15 +1,19 @@
-from django.db.models import Sum
+from django.db import transaction
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
+from core.pagination import ClosedAtPagination, CreatedAtPagination
 from core.permissions import IsManagerOrAdmin, get_role
-from .models import CashSession, CashEntry, Payment, CommissionRule, Commission
+from .models import CashSession, CashEntry, Payment, CommissionRule, Commission, CommissionStatement, PayoutPeriod
+from .services import add_cash_entry_to_totals, close_cash_session, close_payout_period, last_completed_period_bounds
+from .utils import get_open_cash_session
 from .serializers import (
-    CashSessionSerializer, CashEntrySerializer, PaymentSerializer,
-    CommissionRuleSerializer, CommissionSerializer
+    CashSessionSerializer, CashSessionCloseSerializer, CashSessionHistorySerializer, CashEntrySerializer, PaymentSerializer,
+    CommissionRuleSerializer, CommissionSerializer, CommissionStatementSerializer, PayoutPeriodSerializer,
+    PayoutPeriodCloseSerializer,
 )
 
 
@@ -20,37 +24,24 @@ class OpenCashSummaryView(APIView):
     - total pagamentos vinculados ao caixa
     - total entradas/saídas
     - esperado (inicial + pagamentos + entradas - saídas)
+    Os totais são correntes no próprio CashSession: leitura de uma linha.
     """
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
 
     def get(self, request):
-        cash = CashSession.objects.filter(closed_at__isnull=True).order_by("-opened_at").first()
+        cash = get_open_cash_session()
         if not cash:
             return Response({"open": False})
 
-        payments_total = Payment.objects.filter(cash_session=cash).aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-
-        entries_in = CashEntry.objects.filter(cash_session=cash, type="IN").aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-
-        entries_out = CashEntry.objects.filter(cash_session=cash, type="OUT").aggregate(
-            total=Sum("amount")
-        )["total"] or 0
-
-        expected = cash.initial_amount + payments_total + entries_in - entries_out
-
         return Response({
             "open": True,
             "cash_session_id": cash.id,
             "opened_at": cash.opened_at,
             "initial_amount": cash.initial_amount,
-            "payments_total": payments_total,
-            "entries_in": entries_in,
-            "entries_out": entries_out,
-            "expected_amount": expected,
+            "payments_total": cash.payments_total,
+            "entries_in": cash.entries_in,
+            "entries_out": cash.entries_out,
+            "expected_amount": cash.expected_amount,
         })
 
 
@@ -64,27 +55,54 @@ class CashSessionViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=["post"])
     def close(self, request, pk=None):
+        """Fecha o caixa e devolve a sessão com o relatório de fechamento (esperado x declarado)."""
         session = self.get_object()
-        closing_amount = request.data.get("closing_amount")
-
         if not session.is_open():
             return Response({"detail": "Caixa já está fechado."}, status=400)
 
-        if closing_amount is None:
-            return Response({"detail": "closing_amount é obrigatório."}, status=400)
+        params = CashSessionCloseSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+
+        try:
+            report = close_cash_session(session, request.user, params.validated_data["closing_amount"])
+        except ValueError as exc:  # fechado por outra requisição enquanto esperava o lock
+            return Response({"detail": str(exc)}, status=400)
+        return Response(CashSessionHistorySerializer(report.cash_session).data)
 
-        session.close(user=request.user, closing_amount=closing_amount)
-        return Response(CashSessionSerializer(session).data)
+    @action(detail=False, methods=["get"])
+    def history(self, request):
+        """
+        Caixas fechados com o relatório gravado no fechamento (uma consulta com
+        JOIN por página; não reagrega pagamentos/lançamentos).
+        """
+        queryset = CashSession.objects.filter(closed_at__isnull=False).select_related("report")
+        paginator = ClosedAtPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(CashSessionHistorySerializer(page, many=True).data)
 
 
 class CashEntryViewSet(viewsets.ModelViewSet):
     queryset = CashEntry.objects.select_related("cash_session").all()
     serializer_class = CashEntrySerializer
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+    pagination_class = CreatedAtPagination
 
+    @transaction.atomic
     def perform_create(self, serializer):
         # Somente manager/admin já está garantido pela permissão
-        serializer.save(created_by=self.request.user)
+        entry = serializer.save(created_by=self.request.user)
+        add_cash_entry_to_totals(entry)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        add_cash_entry_to_totals(serializer.instance, sign=-1)
+        entry = serializer.save()
+        add_cash_entry_to_totals(entry)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        add_cash_entry_to_totals(instance, sign=-1)
+        instance.delete()
 
 
 class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
@@ -95,6 +113,7 @@ class PaymentViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Payment.objects.select_related("service_record", "cash_session").all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+    pagination_class = CreatedAtPagination
 
 
 class CommissionRuleViewSet(viewsets.ModelViewSet):
@@ -107,6 +126,51 @@ class CommissionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Commission.objects.select_related("barber", "service_record").all().order_by("-created_at")
     serializer_class = CommissionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtPagination
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        role = get_role(self.request.user)
+        if role in ("MANAGER", "ADMIN"):
+            return qs
+        return qs.filter(barber=self.request.user)
+
+
+class PayoutPeriodViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = PayoutPeriod.objects.all()
+    serializer_class = PayoutPeriodSerializer
+    permission_classes = [IsAuthenticated, IsManagerOrAdmin]
+
+    @action(detail=False, methods=["post"])
+    def close(self, request):
+        """Fecha o período (padrão: o último encerrado) e devolve os extratos gerados."""
+        params = PayoutPeriodCloseSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        frequency = params.validated_data.get("frequency")
+        day = params.validated_data.get("date") or last_completed_period_bounds(frequency=frequency)[0]
+
+        try:
+            period = close_payout_period(day, request.user, frequency=frequency)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=400)
+
+        statements = period.statements.select_related("barber", "period").order_by("barber_id")
+        return Response({
+            **PayoutPeriodSerializer(period).data,
+            "statements": CommissionStatementSerializer(statements, many=True).data,
+        }, status=201)
+
+
+class CommissionStatementViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Extratos de comissão por período: a folha lê uma linha por barbeiro e
+    período, sem somar o histórico de comissões.
+    """
+    queryset = CommissionStatement.objects.select_related("barber", "period").all()
+    serializer_class = CommissionStatementSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtPagination
+    filterset_fields = ["period", "barber"]
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -1,8 +1,15 @@
 from django.contrib import admin
-from .models import Appointment
+from .models import Appointment, AppointmentSeries
 
 @admin.register(Appointment)
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ("start_at", "end_at", "customer", "service", "barber", "status")
     list_filter = ("status", "barber")
     search_fields = ("customer__name", "barber__username", "service__name")
+
+
+@admin.register(AppointmentSeries)
+class AppointmentSeriesAdmin(admin.ModelAdmin):
+    list_display = ("start_at", "frequency", "interval", "customer", "service", "barber", "until")
+    list_filter = ("frequency", "barber")
+    search_fields = ("customer__name", "barber__username", "service__name")
@@ -0,0 +1,114 @@
+"""
+Busca de horários livres por barbeiro.
+
+Uma consulta traz os agendamentos ativos de todos os barbeiros pedidos na
+janela (índice (barber, start_at)), somados às ocorrências ainda não gravadas
+das séries recorrentes; depois, por barbeiro, os intervalos
+ocupados são mesclados e varridos junto com o expediente, em ordem, para
+gerar os slots livres. Custo O(agendamentos + slots), sem consulta por slot.
+"""
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Appointment
+from .recurrence import FREE_STATUSES, expand_occurrences, series_in_range
+
+# limita o início da varredura do índice: agendamentos não passam disso
+MAX_APPOINTMENT_DURATION = timedelta(hours=12)
+
+
+def working_windows(day):
+    """Janelas de expediente (início, fim) do dia, no fuso padrão do projeto."""
+    tz = timezone.get_default_timezone()
+    windows = []
+    for start, end in settings.SCHEDULING_WORKING_HOURS.get(day.weekday(), []):
+        windows.append((
+            datetime.combine(day, time.fromisoformat(start), tzinfo=tz),
+            datetime.combine(day, time.fromisoformat(end), tzinfo=tz),
+        ))
+    return windows
+
+
+def merge_intervals(intervals):
+    """Mescla intervalos (início, fim) já ordenados por início."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def free_slots(windows, busy, duration: timedelta, step: timedelta, not_before=None):
+    """
+    Slots livres de `duration`, alinhados a `step` a partir do início de cada
+    janela. windows e busy (mesclado) ordenados; uma única passada em ambos.
+    """
+    slots = []
+    i = 0
+    for window_start, window_end in windows:
+        # pula ocupações que terminam antes da janela
+        while i < len(busy) and busy[i][1] <= window_start:
+            i += 1
+
+        cursor = window_start
+        j = i
+        while cursor + duration <= window_end:
+            if not_before and cursor < not_before:
+                cursor += step
+                continue
+            # avança até a primeira ocupação que pode colidir com o slot
+            while j < len(busy) and busy[j][1] <= cursor:
+                j += 1
+            if j < len(busy) and busy[j][0] < cursor + duration:
+                # colide: pula para o primeiro passo da grade após o fim da ocupação
+                skip = busy[j][1] - window_start
+                cursor = window_start + step * -(-skip // step)
+                continue
+            slots.append(cursor)
+            cursor += step
+    return slots
+
+
+def find_availability(*, barber_ids, date_from, date_to, duration: timedelta, step: timedelta):
+    """
+    {barber_id: [inícios dos slots livres]} para os dias date_from..date_to.
+    """
+    days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+    windows = [w for day in days for w in working_windows(day)]
+    if not windows:
+        return {barber_id: [] for barber_id in barber_ids}
+
+    range_start, range_end = windows[0][0], windows[-1][1]
+    rows = (
+        Appointment.objects.filter(
+            barber_id__in=barber_ids,
+            start_at__gte=range_start - MAX_APPOINTMENT_DURATION,
+            start_at__lt=range_end,
+            end_at__gt=range_start,
+        )
+        .exclude(status__in=FREE_STATUSES)
+        .order_by("barber_id", "start_at")
+        .values_list("barber_id", "start_at", "end_at")
+    )
+
+    busy = {barber_id: [] for barber_id in barber_ids}
+    for barber_id, start_at, end_at in rows:
+        busy[barber_id].append((start_at, end_at))
+
+    # ocorrências de séries ainda não gravadas também ocupam a agenda
+    series = series_in_range(range_start, range_end).filter(barber_id__in=barber_ids)
+    for occurrence in expand_occurrences(series, range_start, range_end):
+        busy[occurrence["series"].barber_id].append((occurrence["start_at"], occurrence["end_at"]))
+    for intervals in busy.values():
+        intervals.sort()
+
+    now = timezone.now()
+    return {
+        barber_id: free_slots(windows, merge_intervals(intervals), duration, step, not_before=now)
+        for barber_id, intervals in busy.items()
+    }
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from core.jobs import job
+from dashboard.cache import invalidate_dashboards
+from .models import Appointment
+
+PENDING_STATUSES = (Appointment.Status.SCHEDULED, Appointment.Status.CONFIRMED)
+
+
+@job("mark_no_shows", interval=settings.SCHEDULING_NO_SHOW_SWEEP_SECONDS)
+def mark_no_shows(batch_size=1000):
+    """
+    Agendamentos pendentes que terminaram há mais de SCHEDULING_NO_SHOW_GRACE_MINUTES
+    e não têm venda viram NO_SHOW. Um UPDATE ... WHERE por lote, para não
+    segurar locks de muitas linhas de uma vez.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.SCHEDULING_NO_SHOW_GRACE_MINUTES)
+    stale = Appointment.objects.filter(
+        status__in=PENDING_STATUSES,
+        end_at__lt=cutoff,
+        service_record__isnull=True,
+    )
+
+    updated = batches = 0
+    while True:
+        batch = list(stale.order_by("end_at").values_list("id", "barber_id")[:batch_size])
+        if not batch:
+            break
+        with transaction.atomic():
+            # o filtro de status é repetido: quem foi atendido no meio tempo fica como está
+            updated += stale.filter(id__in=[i for i, _ in batch]).update(status=Appointment.Status.NO_SHOW)
+            invalidate_dashboards({barber_id for _, barber_id in batch})
+        batches += 1
+        if len(batch) < batch_size:
+            break
+    return {"updated": updated, "batches": batches}
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_query_indexes'),
+        ('customers', '0003_lifetime_stats'),
+        ('scheduling', '0003_appointment_series'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['CANCELED', 'NO_SHOW']), _negated=True), fields=['barber', 'start_at'], include=('end_at',), name='appointment_busy'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(condition=models.Q(('status__in', ['SCHEDULED', 'CONFIRMED'])), fields=['end_at'], name='appointment_pending_end'),
+        ),
+    ]
@@ -1,7 +1,51 @@
 from django.conf import settings
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeBoundary, RangeOperators
 from django.db import models
 
 
+class TsTzRange(models.Func):
+    function = "TSTZRANGE"
+    output_field = DateTimeRangeField()
+
+
+class AppointmentSeries(models.Model):
+    """
+    Agendamento recorrente (estilo RRULE: FREQ/INTERVAL/COUNT/UNTIL a partir de start_at).
+    As ocorrências não são gravadas: são expandidas sob demanda para a janela
+    pedida e só viram Appointment quando confirmadas, alteradas ou atendidas.
+    """
+    class Frequency(models.TextChoices):
+        DAILY = "DAILY", "Diária"
+        WEEKLY = "WEEKLY", "Semanal"
+        MONTHLY = "MONTHLY", "Mensal"
+
+    barber = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="appointment_series")
+    customer = models.ForeignKey("customers.Customer", on_delete=models.PROTECT, related_name="appointment_series")
+    service = models.ForeignKey("core.Service", on_delete=models.PROTECT, related_name="appointment_series")
+
+    start_at = models.DateTimeField()  # primeira ocorrência
+    duration_minutes = models.PositiveIntegerField()
+    frequency = models.CharField(max_length=10, choices=Frequency.choices, default=Frequency.WEEKLY)
+    interval = models.PositiveSmallIntegerField(default=1)
+    count = models.PositiveIntegerField(null=True, blank=True)
+    until = models.DateTimeField(null=True, blank=True)
+
+    notes = models.CharField(max_length=255, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="appointment_series_created")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["barber", "start_at"]),
+        ]
+        ordering = ["start_at"]
+
+    def __str__(self):
+        return f"{self.customer.name} - {self.get_frequency_display()} a cada {self.interval}"
+
+
 class Appointment(models.Model):
     class Status(models.TextChoices):
         SCHEDULED = "SCHEDULED", "Agendado"
@@ -20,6 +64,10 @@ class Appointment(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.SCHEDULED)
     notes = models.CharField(max_length=255, blank=True)
 
+    # ocorrência materializada de uma série: occurrence_start é o horário original
+    series = models.ForeignKey(AppointmentSeries, on_delete=models.SET_NULL, null=True, blank=True, related_name="appointments")
+    occurrence_start = models.DateTimeField(null=True, blank=True)
+
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="appointments_created")
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -28,6 +76,28 @@ class Appointment(models.Model):
             models.Index(fields=["barber", "start_at"]),
             models.Index(fields=["start_at"]),
             models.Index(fields=["status"]),
+            # parciais: só as linhas que as consultas quentes leem
+            # agenda ocupada (availability.find_availability)
+            models.Index(
+                fields=["barber", "start_at"], include=["end_at"],
+                condition=~models.Q(status__in=["CANCELED", "NO_SHOW"]), name="appointment_busy",
+            ),
+            # varredura de no-show (jobs.mark_no_shows)
+            models.Index(
+                fields=["end_at"], condition=models.Q(status__in=["SCHEDULED", "CONFIRMED"]), name="appointment_pending_end",
+            ),
+        ]
+        constraints = [
+            # dois agendamentos ativos do mesmo barbeiro não podem se sobrepor ([start, end))
+            ExclusionConstraint(
+                name="appointment_no_overlap",
+                expressions=[
+                    (TsTzRange("start_at", "end_at", RangeBoundary()), RangeOperators.OVERLAPS),
+                    ("barber", RangeOperators.EQUAL),
+                ],
+                condition=~models.Q(status__in=["CANCELED", "NO_SHOW"]),
+            ),
+            models.UniqueConstraint(fields=["series", "occurrence_start"], name="appointment_series_occurrence"),
         ]
         ordering = ["-start_at"]
 
@@ -0,0 +1,206 @@
+"""
+Expansão de séries recorrentes (AppointmentSeries).
+
+Ocorrências são calculadas só para a janela pedida: o índice da primeira
+ocorrência da janela é obtido por aritmética (sem iterar desde o início da
+série), então o custo é proporcional ao que aparece na tela. As contas são
+feitas no horário local, para a série manter o horário de parede.
+"""
+import calendar
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Appointment, AppointmentSeries
+
+MAX_SERIES_DURATION = timedelta(minutes=480)
+
+# até onde uma série nova/alterada é conferida contra a agenda (séries sem fim não têm último dia)
+SERIES_CHECK_HORIZON = timedelta(days=365)
+
+# status que não ocupam a agenda (fora da constraint appointment_no_overlap)
+FREE_STATUSES = (Appointment.Status.CANCELED, Appointment.Status.NO_SHOW)
+
+STEP_DAYS = {
+    AppointmentSeries.Frequency.DAILY: 1,
+    AppointmentSeries.Frequency.WEEKLY: 7,
+}
+
+
+def _nth_start(series, first, n):
+    """Início local da n-ésima ocorrência (0 = start_at)."""
+    if series.frequency == AppointmentSeries.Frequency.MONTHLY:
+        months = first.month - 1 + n * series.interval
+        year, month = first.year + months // 12, months % 12 + 1
+        day = min(first.day, calendar.monthrange(year, month)[1])
+        local = datetime.combine(first.date().replace(year=year, month=month, day=day), first.timetz().replace(tzinfo=None))
+    else:
+        local = datetime.combine(
+            first.date() + timedelta(days=n * series.interval * STEP_DAYS[series.frequency]),
+            first.timetz().replace(tzinfo=None),
+        )
+    return timezone.make_aware(local, first.tzinfo)
+
+
+def _first_index(series, first, range_start):
+    """Menor n cuja ocorrência pode terminar depois de range_start (estimativa por baixo)."""
+    if range_start <= first:
+        return 0
+    local_start = timezone.localtime(range_start, first.tzinfo)
+    if series.frequency == AppointmentSeries.Frequency.MONTHLY:
+        months = (local_start.year - first.year) * 12 + local_start.month - first.month
+        return max(0, months // series.interval - 1)
+    days = (local_start.date() - first.date()).days
+    return max(0, days // (series.interval * STEP_DAYS[series.frequency]) - 1)
+
+
+def occurrence_starts(series, range_start, range_end):
+    """Inícios das ocorrências da série que se sobrepõem a [range_start, range_end)."""
+    first = timezone.localtime(series.start_at)
+    duration = timedelta(minutes=series.duration_minutes)
+    starts = []
+    n = _first_index(series, first, range_start)
+    while series.count is None or n < series.count:
+        start = _nth_start(series, first, n)
+        if start >= range_end or (series.until and start > series.until):
+            break
+        if start + duration > range_start:
+            starts.append(start)
+        n += 1
+    return starts
+
+
+def series_in_range(range_start, range_end, queryset=None):
+    """Séries que podem ter ocorrências na janela (o corte exato fica com occurrence_starts)."""
+    if queryset is None:
+        queryset = AppointmentSeries.objects.all()
+    # until limita o início da última ocorrência; ela pode terminar dentro da janela
+    return queryset.filter(start_at__lt=range_end).filter(
+        Q(until__isnull=True) | Q(until__gte=range_start - MAX_SERIES_DURATION)
+    )
+
+
+def expand_occurrences(series_list, range_start, range_end):
+    """
+    Ocorrências ainda não materializadas das séries na janela, como dicts
+    {"series", "start_at", "end_at"} ordenados por início.
+    Uma consulta para descobrir quais ocorrências já viraram Appointment.
+    """
+    series_list = list(series_list)
+    if not series_list:
+        return []
+
+    candidates = {
+        s.id: occurrence_starts(s, range_start, range_end)
+        for s in series_list
+    }
+    flat = [start for starts in candidates.values() for start in starts]
+    if not flat:
+        return []
+
+    materialized = set(
+        Appointment.objects.filter(
+            series_id__in=[s.id for s in series_list],
+            occurrence_start__gte=min(flat),
+            occurrence_start__lte=max(flat),
+        ).values_list("series_id", "occurrence_start")
+    )
+
+    occurrences = []
+    for s in series_list:
+        duration = timedelta(minutes=s.duration_minutes)
+        for start in candidates[s.id]:
+            if (s.id, start) not in materialized:
+                occurrences.append({"series": s, "start_at": start, "end_at": start + duration})
+    occurrences.sort(key=lambda o: (o["start_at"], o["series"].id))
+    return occurrences
+
+
+def lock_agenda(barber_id):
+    """
+    Serializa as gravações na agenda do barbeiro (lock na linha do usuário).
+    A constraint de exclusão só enxerga Appointments: a checagem contra
+    ocorrências ainda não gravadas precisa deste lock para não correr.
+    """
+    list(get_user_model().objects.select_for_update().filter(pk=barber_id).values_list("pk", flat=True))
+
+
+def pending_occurrence_in(barber_id, range_start, range_end):
+    """Primeira ocorrência não gravada de série do barbeiro que se sobrepõe a [range_start, range_end), ou None."""
+    queryset = AppointmentSeries.objects.filter(barber_id=barber_id)
+    occurrences = expand_occurrences(series_in_range(range_start, range_end, queryset), range_start, range_end)
+    return occurrences[0] if occurrences else None
+
+
+def series_conflict(series):
+    """
+    Primeira ocorrência não gravada de `series` (de agora até
+    SERIES_CHECK_HORIZON) que colide com um agendamento ativo ou com
+    ocorrência de outra série do mesmo barbeiro, ou None.
+    """
+    range_start = max(series.start_at, timezone.now())
+    range_end = range_start + SERIES_CHECK_HORIZON
+    own = expand_occurrences([series], range_start, range_end)
+    if not own:
+        return None
+
+    first, last = own[0]["start_at"], own[-1]["end_at"]
+    busy = list(
+        Appointment.objects.filter(barber_id=series.barber_id, start_at__lt=last, end_at__gt=first)
+        .exclude(status__in=FREE_STATUSES)
+        .values_list("start_at", "end_at")
+    )
+    others = AppointmentSeries.objects.filter(barber_id=series.barber_id).exclude(pk=series.pk)
+    busy += [(o["start_at"], o["end_at"]) for o in expand_occurrences(series_in_range(first, last, others), first, last)]
+    busy.sort()
+
+    # as duas listas em ordem: `reach` é o maior fim entre as ocupações que começam antes do fim da ocorrência
+    i, reach = 0, None
+    for occurrence in own:
+        while i < len(busy) and busy[i][0] < occurrence["end_at"]:
+            reach = busy[i][1] if reach is None else max(reach, busy[i][1])
+            i += 1
+        if reach is not None and reach > occurrence["start_at"]:
+            return occurrence
+    return None
+
+
+def is_occurrence(series, occurrence_start):
+    return occurrence_start in occurrence_starts(series, occurrence_start, occurrence_start + timedelta(microseconds=1))
+
+
+@transaction.atomic
+def materialize_occurrence(series, occurrence_start, *, created_by, **changes):
+    """
+    Grava a ocorrência como Appointment (idempotente: devolve a existente) e
+    aplica `changes` (status, start_at, end_at, notes...). Mudar só start_at
+    mantém a duração.
+    """
+    if not is_occurrence(series, occurrence_start):
+        raise ValueError("Horário não corresponde a uma ocorrência da série.")
+
+    appointment, _ = Appointment.objects.get_or_create(
+        series=series,
+        occurrence_start=occurrence_start,
+        defaults={
+            "barber_id": series.barber_id,
+            "customer_id": series.customer_id,
+            "service_id": series.service_id,
+            "start_at": occurrence_start,
+            "end_at": occurrence_start + timedelta(minutes=series.duration_minutes),
+            "notes": series.notes,
+            "created_by": created_by,
+        },
+    )
+    if "start_at" in changes and "end_at" not in changes:
+        changes["end_at"] = changes["start_at"] + (appointment.end_at - appointment.start_at)
+    if changes:
+        for field, value in changes.items():
+            setattr(appointment, field, value)
+        if appointment.end_at <= appointment.start_at:
+            raise ValueError("end_at precisa ser maior que start_at.")
+        appointment.save(update_fields=list(changes))
+    return appointment
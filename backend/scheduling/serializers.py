@@ -1,6 +1,36 @@
-from rest_framework import serializers
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
 from django.utils import timezone
-from .models import Appointment
+from .models import Appointment, AppointmentSeries
+from .recurrence import FREE_STATUSES, lock_agenda, pending_occurrence_in, series_conflict
+
+OVERLAP_CONSTRAINT = "appointment_no_overlap"
+
+
+class AppointmentConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "O barbeiro já tem um agendamento nesse horário."
+    default_code = "appointment_overlap"
+
+
+@contextmanager
+def overlap_as_conflict():
+    """
+    A checagem de sobreposição é da constraint de exclusão no banco: duas
+    reservas simultâneas não passam as duas, sem lock de tabela. Aqui a
+    violação vira 409.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        if OVERLAP_CONSTRAINT in str(exc):
+            raise AppointmentConflict()
+        raise
+
 
 class AppointmentSerializer(serializers.ModelSerializer):
     barber_username = serializers.CharField(source="barber.username", read_only=True)
@@ -28,3 +58,196 @@ class AppointmentSerializer(serializers.ModelSerializer):
         if start_at and start_at > timezone.now() + timezone.timedelta(days=365):
             raise serializers.ValidationError("Agendamento muito no futuro.")
         return attrs
+
+    def check_series(self, data):
+        # ocorrências de séries ainda não gravadas não estão na constraint de exclusão
+        def current(field):
+            return data[field] if field in data else getattr(self.instance, field, None)
+
+        if current("status") in FREE_STATUSES:
+            return
+        barber_id = current("barber").pk
+        lock_agenda(barber_id)
+        if pending_occurrence_in(barber_id, current("start_at"), current("end_at")):
+            raise AppointmentConflict()
+
+    def create(self, validated_data):
+        with overlap_as_conflict():
+            self.check_series(validated_data)
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with overlap_as_conflict():
+            self.check_series(validated_data)
+            return super().update(instance, validated_data)
+
+
+class AppointmentSeriesSerializer(serializers.ModelSerializer):
+    barber_username = serializers.CharField(source="barber.username", read_only=True)
+    customer_name = serializers.CharField(source="customer.name", read_only=True)
+    service_name = serializers.CharField(source="service.name", read_only=True)
+
+    class Meta:
+        model = AppointmentSeries
+        fields = [
+            "id",
+            "barber", "barber_username",
+            "customer", "customer_name",
+            "service", "service_name",
+            "start_at", "duration_minutes",
+            "frequency", "interval", "count", "until",
+            "notes",
+            "created_by", "created_at",
+        ]
+        read_only_fields = ["id", "created_by", "created_at"]
+        extra_kwargs = {
+            "duration_minutes": {"min_value": 5, "max_value": 480},
+            "interval": {"min_value": 1, "max_value": 52},
+        }
+
+    def validate(self, attrs):
+        start_at = attrs.get("start_at", getattr(self.instance, "start_at", None))
+        until = attrs.get("until")
+        if until and start_at and until < start_at:
+            raise serializers.ValidationError("until precisa ser maior ou igual a start_at.")
+        return attrs
+
+    @staticmethod
+    def check_agenda(series):
+        # confere as ocorrências na mesma transação da gravação: o 409 desfaz tudo
+        if series_conflict(series):
+            raise AppointmentConflict()
+        return series
+
+    def create(self, validated_data):
+        with overlap_as_conflict():
+            lock_agenda(validated_data["barber"].pk)
+            return self.check_agenda(super().create(validated_data))
+
+    def update(self, instance, validated_data):
+        with overlap_as_conflict():
+            lock_agenda(validated_data.get("barber", instance.barber).pk)
+            return self.check_agenda(super().update(instance, validated_data))
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    """Confirma/altera uma ocorrência da série, gravando-a como Appointment."""
+    occurrence_start = serializers.DateTimeField()
+    status = serializers.ChoiceField(choices=Appointment.Status.choices, required=False)
+    start_at = serializers.DateTimeField(required=False)
+    end_at = serializers.DateTimeField(required=False)
+    notes = serializers.CharField(max_length=255, required=False, allow_blank=True)
+
+    def validate(self, attrs):
+        start_at, end_at = attrs.get("start_at"), attrs.get("end_at")
+        if start_at and end_at and end_at <= start_at:
+            raise serializers.ValidationError("end_at precisa ser maior que start_at.")
+        return attrs
+
+
+class AppointmentFeedQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 42
+
+    start_at__gte = serializers.DateTimeField(required=False)  # padrão: segunda-feira desta semana
+    start_at__lt = serializers.DateTimeField(required=False)  # padrão: start_at__gte + 7 dias
+
+    def validate(self, attrs):
+        if "start_at__gte" not in attrs:
+            today = timezone.localdate()
+            monday = today - timezone.timedelta(days=today.weekday())
+            attrs["start_at__gte"] = timezone.make_aware(timezone.datetime.combine(monday, timezone.datetime.min.time()))
+        attrs.setdefault("start_at__lt", attrs["start_at__gte"] + timezone.timedelta(days=7))
+        window = attrs["start_at__lt"] - attrs["start_at__gte"]
+        if window <= timezone.timedelta(0):
+            raise serializers.ValidationError("start_at__lt precisa ser maior que start_at__gte.")
+        if window > timezone.timedelta(days=self.MAX_DAYS):
+            raise serializers.ValidationError(f"Janela máxima de {self.MAX_DAYS} dias.")
+        return attrs
+
+
+APPOINTMENT_FEED_FIELDS = (
+    "id", "series_id", "start_at", "end_at", "status",
+    "barber_id", "barber__username", "customer_id", "customer__name", "service_id", "service__name",
+)
+APPOINTMENT_STATUSES = list(Appointment.Status.values)
+
+
+def appointment_feed(rows, origin):
+    """
+    Formato colunar para a agenda (semana/dia): cada coluna é uma lista alinhada
+    por posição; início e duração em minutos a partir de origin; status é o
+    índice em "statuses"; nomes saem uma vez só nas tabelas barbers/customers/services.
+    Recebe linhas de Appointment.objects.values(*APPOINTMENT_FEED_FIELDS);
+    ocorrências de série ainda não gravadas vêm com id None.
+    """
+    columns = {name: [] for name in ("ids", "series", "start", "duration", "status", "barber", "customer", "service")}
+    barbers, customers, services = {}, {}, {}
+    status_index = {value: i for i, value in enumerate(APPOINTMENT_STATUSES)}
+
+    for row in rows:
+        columns["ids"].append(row["id"])
+        columns["series"].append(row["series_id"])
+        columns["start"].append(int((row["start_at"] - origin).total_seconds() // 60))
+        columns["duration"].append(int((row["end_at"] - row["start_at"]).total_seconds() // 60))
+        columns["status"].append(status_index[row["status"]])
+        columns["barber"].append(row["barber_id"])
+        columns["customer"].append(row["customer_id"])
+        columns["service"].append(row["service_id"])
+        barbers[row["barber_id"]] = row["barber__username"]
+        customers[row["customer_id"]] = row["customer__name"]
+        services[row["service_id"]] = row["service__name"]
+
+    return {
+        "origin": serializers.DateTimeField().to_representation(origin),
+        **columns,
+        "statuses": APPOINTMENT_STATUSES,
+        "barbers": barbers,
+        "customers": customers,
+        "services": services,
+    }
+
+
+def occurrence_rows(occurrences):
+    """Ocorrências de expand_occurrences no formato das linhas de APPOINTMENT_FEED_FIELDS."""
+    return [
+        {
+            "id": None,
+            "series_id": o["series"].id,
+            "start_at": o["start_at"],
+            "end_at": o["end_at"],
+            "status": Appointment.Status.SCHEDULED,
+            "barber_id": o["series"].barber_id,
+            "barber__username": o["series"].barber.username,
+            "customer_id": o["series"].customer_id,
+            "customer__name": o["series"].customer.name,
+            "service_id": o["series"].service_id,
+            "service__name": o["series"].service.name,
+        }
+        for o in occurrences
+    ]
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    MAX_DAYS = 31
+
+    date_from = serializers.DateField(required=False)  # padrão: hoje
+    date_to = serializers.DateField(required=False)  # padrão: date_from + 6 dias
+    barbers = serializers.CharField(required=False)
+    duration = serializers.IntegerField(min_value=5, max_value=480, default=30)
+    step = serializers.IntegerField(min_value=5, max_value=240, required=False)
+
+    def validate_barbers(self, value):
+        try:
+            return [int(v) for v in value.split(",") if v.strip()]
+        except ValueError:
+            raise serializers.ValidationError("Informe ids separados por vírgula.")
+
+    def validate(self, attrs):
+        attrs.setdefault("date_from", timezone.localdate())
+        attrs.setdefault("date_to", attrs["date_from"] + timezone.timedelta(days=6))
+        days = (attrs["date_to"] - attrs["date_from"]).days
+        if days < 0:
+            raise serializers.ValidationError("date_to precisa ser maior ou igual a date_from.")
+        if days >= self.MAX_DAYS:
+            raise serializers.ValidationError(f"Intervalo máximo de {self.MAX_DAYS} dias.")
+        return attrs
@@ -1,3 +1,325 @@
-from django.test import TestCase
+import importlib
+import threading
+from datetime import date, datetime, timedelta
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Service
+from customers.models import Customer
+from finance.models import CashSession
+from scheduling.availability import free_slots, merge_intervals
+from core.jobs import job_stats
+from core.models import ServiceRecord
+from scheduling.jobs import mark_no_shows
+from scheduling.models import Appointment, AppointmentSeries
+from scheduling.recurrence import occurrence_starts
+
+User = get_user_model()
+
+
+def at(hour, minute=0, day=date(2030, 1, 7)):
+    return datetime(day.year, day.month, day.day, hour, minute, tzinfo=timezone.get_default_timezone())
+
+
+class FreeSlotsTests(TestCase):
+    def test_sweep_skips_merged_busy_intervals(self):
+        busy = merge_intervals([(at(9, 30), at(10)), (at(9, 45), at(10, 20)), (at(11), at(11, 30))])
+        self.assertEqual(busy, [[at(9, 30), at(10, 20)], [at(11), at(11, 30)]])
+
+        slots = free_slots([(at(9), at(12))], busy, timedelta(minutes=30), timedelta(minutes=30))
+
+        self.assertEqual(slots, [at(9), at(10, 30), at(11, 30)])
+
+
+@override_settings(SCHEDULING_WORKING_HOURS={0: [("09:00", "11:00")]})
+class AvailabilityViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+        cls.customer = Customer.objects.create(name="João")
+
+    def book(self, start, end, status=Appointment.Status.SCHEDULED):
+        Appointment.objects.create(
+            barber=self.barber, customer=self.customer, service=self.service,
+            start_at=start, end_at=end, status=status, created_by=self.barber,
+        )
+
+    def test_returns_free_slots_ignoring_canceled(self):
+        self.book(at(9, 30), at(10))
+        self.book(at(10), at(10, 30), status=Appointment.Status.CANCELED)
+
+        client = APIClient()
+        client.force_authenticate(self.barber)
+        # barbeiros, agendamentos, séries
+        with self.assertNumQueries(3):
+            response = client.get(
+                "/api/availability/",
+                {"date_from": "2030-01-07", "date_to": "2030-01-08", "barbers": str(self.barber.id)},
+            )
+
+        self.assertEqual(response.status_code, 200)
+        slots = response.json()["barbers"][0]["slots"]
+        self.assertEqual(slots, ["2030-01-07T09:00:00-03:00", "2030-01-07T10:00:00-03:00", "2030-01-07T10:30:00-03:00"])
+
+
+class AppointmentFeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+        cls.customer = Customer.objects.create(name="João")
+        for start, end in [(at(9), at(9, 30)), (at(10), at(10, 45)), (at(10, day=date(2030, 1, 14)), at(11, day=date(2030, 1, 14)))]:
+            Appointment.objects.create(
+                barber=cls.barber, customer=cls.customer, service=cls.service,
+                start_at=start, end_at=end, created_by=cls.barber,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.barber)
+        self.week = {"start_at__gte": at(0).isoformat(), "start_at__lt": at(0, day=date(2030, 1, 14)).isoformat()}
+
+    def test_list_filters_by_start_at_range(self):
+        response = self.client.get("/api/appointments/", self.week)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_feed_is_columnar_with_lookup_tables(self):
+        # agendamentos + séries da janela
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/appointments/feed/", self.week)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["start"], [9 * 60, 10 * 60])
+        self.assertEqual(data["duration"], [30, 45])
+        self.assertEqual([data["statuses"][i] for i in data["status"]], ["SCHEDULED", "SCHEDULED"])
+        self.assertEqual(data["barber"], [self.barber.id] * 2)
+        self.assertEqual(data["customers"], {str(self.customer.id): "João"})
+
+    def test_feed_rejects_too_wide_window(self):
+        response = self.client.get("/api/appointments/feed/", {
+            "start_at__gte": at(0).isoformat(),
+            "start_at__lt": at(0, day=date(2030, 3, 1)).isoformat(),
+        })
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AppointmentSeriesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte", default_price="40.00")
+        cls.customer = Customer.objects.create(name="João")
+        # a cada 2 semanas, segunda 10:00, 45 min
+        cls.series = AppointmentSeries.objects.create(
+            barber=cls.barber, customer=cls.customer, service=cls.service,
+            start_at=at(10), duration_minutes=45, interval=2, created_by=cls.barber,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.barber)
+
+    def test_expansion_jumps_straight_to_the_window(self):
+        starts = occurrence_starts(self.series, at(0, day=date(2031, 1, 1)), at(0, day=date(2031, 2, 1)))
+
+        self.assertEqual(starts, [at(10, day=date(2031, 1, 6)), at(10, day=date(2031, 1, 20))])
+
+        limited = AppointmentSeries(start_at=at(10), duration_minutes=30, count=3, interval=1)
+        self.assertEqual(len(occurrence_starts(limited, at(0), at(0, day=date(2030, 12, 31)))), 3)
+
+    def test_occurrences_are_virtual_until_confirmed(self):
+        window = {"start_at__gte": at(0).isoformat(), "start_at__lt": at(0, day=date(2030, 2, 4)).isoformat()}
+
+        feed = self.client.get("/api/appointments/feed/", window).json()
+        self.assertEqual(feed["ids"], [None, None])
+        self.assertEqual(feed["series"], [self.series.id] * 2)
+        self.assertEqual(Appointment.objects.count(), 0)
+
+        response = self.client.post(
+            f"/api/appointment-series/{self.series.id}/occurrences/",
+            {"occurrence_start": at(10, day=date(2030, 1, 21)).isoformat(), "status": "CONFIRMED", "start_at": at(11, day=date(2030, 1, 21)).isoformat()},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["end_at"], at(11, 45, day=date(2030, 1, 21)).isoformat())
+
+        feed = self.client.get("/api/appointments/feed/", window).json()
+        self.assertEqual(feed["ids"], [None, response.data["id"]])
+        self.assertEqual(feed["start"][1], 14 * 24 * 60 + 11 * 60)
+
+        slots = self.client.get("/api/availability/", {"date_from": "2030-01-07", "date_to": "2030-01-07"}).data
+        self.assertNotIn(at(10).isoformat(), slots["barbers"][0]["slots"])
+
+    def test_sale_completes_occurrence(self):
+        CashSession.objects.create(opened_by=self.barber)
+
+        response = self.client.post("/api/service-records/", {
+            "barber": self.barber.id, "service": self.service.id, "customer": self.customer.id, "price_charged": "40.00",
+            "payment_method": "CASH", "series": self.series.id, "occurrence_start": at(10).isoformat(),
+        }, format="json")
+
+        self.assertEqual(response.status_code, 201, response.data)
+        appointment = Appointment.objects.get(series=self.series, occurrence_start=at(10))
+        self.assertEqual(appointment.status, Appointment.Status.DONE)
+        self.assertEqual(appointment.service_record.id, response.data["id"])
+
+
+    def test_bookings_cannot_overlap_pending_occurrences(self):
+        # série quinzenal de 45 min começando daqui a uma semana, nenhuma ocorrência gravada
+        first = at(10, day=timezone.localdate() + timedelta(days=7))
+        AppointmentSeries.objects.create(
+            barber=self.barber, customer=self.customer, service=self.service,
+            start_at=first, duration_minutes=45, interval=2, created_by=self.barber,
+        )
+
+        def book(start, minutes=30):
+            return self.client.post("/api/appointments/", {
+                "barber": self.barber.id, "customer": self.customer.id, "service": self.service.id,
+                "start_at": start.isoformat(), "end_at": (start + timedelta(minutes=minutes)).isoformat(),
+            }, format="json")
+
+        def repeat(start, **extra):
+            return self.client.post("/api/appointment-series/", {
+                "barber": self.barber.id, "customer": self.customer.id, "service": self.service.id,
+                "start_at": start.isoformat(), "duration_minutes": 30, **extra,
+            }, format="json")
+
+        self.assertEqual(book(first + timedelta(days=14, minutes=15)).status_code, 409)
+        adjacent = book(first + timedelta(minutes=45))
+        self.assertEqual(adjacent.status_code, 201)
+        self.assertEqual(self.client.patch(
+            f"/api/appointments/{adjacent.data['id']}/", {"start_at": (first + timedelta(minutes=30)).isoformat()}, format="json",
+        ).status_code, 409)
+
+        # série nova: contra ocorrências pendentes de outra série e contra agendamentos gravados
+        self.assertEqual(repeat(first + timedelta(days=7, minutes=30)).status_code, 409)
+        self.assertEqual(repeat(first + timedelta(days=7, minutes=30), count=1).status_code, 201)
+        self.assertEqual(repeat(first + timedelta(minutes=60), count=1).status_code, 409)
+        self.assertEqual(AppointmentSeries.objects.count(), 3)
+        self.assertEqual(Appointment.objects.count(), 1)
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class NoShowSweepTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.barber = User.objects.create_user(username="barbeiro", password="x")
+        cls.service = Service.objects.create(name="Corte")
+        cls.customer = Customer.objects.create(name="João")
+
+    def setUp(self):
+        cache.clear()
+
+    def book(self, hours_ago, status=Appointment.Status.SCHEDULED):
+        end = timezone.now() - timedelta(hours=hours_ago)
+        return Appointment.objects.create(
+            barber=self.barber, customer=self.customer, service=self.service,
+            start_at=end - timedelta(minutes=30), end_at=end, status=status, created_by=self.barber,
+        )
+
+    def test_marks_only_stale_unserved_appointments(self):
+        stale = [self.book(hours_ago=3 + i) for i in range(5)]
+        served = self.book(hours_ago=2, status=Appointment.Status.CONFIRMED)
+        ServiceRecord.objects.create(barber=self.barber, service=self.service, appointment=served, price_charged="40.00", performed_at=served.end_at)
+        canceled = self.book(hours_ago=4, status=Appointment.Status.CANCELED)
+        recent = self.book(hours_ago=0)
+
+        result = mark_no_shows(batch_size=2)
+
+        self.assertEqual(result, {"updated": 5, "batches": 3})
+        statuses = dict(Appointment.objects.values_list("id", "status"))
+        self.assertEqual({statuses[a.id] for a in stale}, {Appointment.Status.NO_SHOW})
+        self.assertEqual(statuses[served.id], Appointment.Status.CONFIRMED)
+        self.assertEqual(statuses[canceled.id], Appointment.Status.CANCELED)
+        self.assertEqual(statuses[recent.id], Appointment.Status.SCHEDULED)
+
+    def test_worker_records_timings(self):
+        self.book(hours_ago=3)
+
+        out = StringIO()
+        call_command("run_jobs", "--once", "--only", "mark_no_shows", stdout=out)
+
+        self.assertIn("mark_no_shows:", out.getvalue())
+        stats = job_stats(["mark_no_shows"])["mark_no_shows"]
+        self.assertEqual(stats["result"], {"updated": 1, "batches": 1})
+        self.assertIsNone(stats["error"])
+        self.assertGreaterEqual(stats["duration_ms"], 0)
+
+
+class OverlapMigrationTests(TestCase):
+    def test_later_overlaps_are_canceled_but_done_ones_are_kept(self):
+        plan_overlaps = importlib.import_module("scheduling.migrations.0002_appointment_no_overlap").plan_overlaps
+        rows = [
+            (1, 1, at(9), at(10), "SCHEDULED"),
+            (2, 1, at(9, 30), at(10), "CONFIRMED"),  # sobrepõe 1
+            (3, 1, at(10), at(10, 30), "SCHEDULED"),  # encosta: não conflita
+            (4, 1, at(10, 15), at(11), "DONE"),  # sobrepõe 3, atendido: 3 sai
+            (5, 2, at(9, 30), at(10), "SCHEDULED"),  # outro barbeiro
+        ]
+
+        self.assertEqual(plan_overlaps(rows), ([2, 3], []))
+        self.assertEqual(plan_overlaps([(1, 1, at(9), at(10), "DONE"), (2, 1, at(9), at(9, 30), "DONE")]), ([], [(1, 2)]))
+
+
+@skipUnless(connection.vendor == "postgresql", "constraint de exclusão exige PostgreSQL")
+class AppointmentOverlapTests(TransactionTestCase):
+    def setUp(self):
+        self.barber = User.objects.create_user(username="barbeiro", password="x")
+        self.service = Service.objects.create(name="Corte")
+        self.customer = Customer.objects.create(name="João")
+
+    def payload(self, start, end):
+        return {
+            "barber": self.barber.id, "customer": self.customer.id, "service": self.service.id,
+            "start_at": start.isoformat(), "end_at": end.isoformat(),
+        }
+
+    def test_parallel_bookings_for_same_slot_only_one_succeeds(self):
+        workers = 8
+        barrier = threading.Barrier(workers)
+        statuses = []
+
+        def book():
+            client = APIClient()
+            client.force_authenticate(self.barber)
+            try:
+                barrier.wait()
+                response = client.post("/api/appointments/", self.payload(at(10), at(10, 30)), format="json")
+                statuses.append(response.status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book) for _ in range(workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(statuses), [201] + [409] * (workers - 1))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_adjacent_and_canceled_slots_do_not_conflict(self):
+        client = APIClient()
+        client.force_authenticate(self.barber)
+
+        first = client.post("/api/appointments/", self.payload(at(10), at(10, 30)), format="json")
+        adjacent = client.post("/api/appointments/", self.payload(at(10, 30), at(11)), format="json")
+        overlap = client.post("/api/appointments/", self.payload(at(10, 15), at(10, 45)), format="json")
+        self.assertEqual((first.status_code, adjacent.status_code, overlap.status_code), (201, 201, 409))
+        self.assertEqual(overlap.data["detail"].code, "appointment_overlap")
+
+        client.patch(f"/api/appointments/{first.data['id']}/", {"status": "CANCELED"}, format="json")
+        rebook = client.post("/api/appointments/", self.payload(at(10), at(10, 30)), format="json")
+        self.assertEqual(rebook.status_code, 201)
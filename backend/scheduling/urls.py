@@ -1,6 +1,13 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import AppointmentViewSet
+from .views import AppointmentSeriesViewSet, AppointmentViewSet, AvailabilityView
 
 router = DefaultRouter()
 router.register(r"appointments", AppointmentViewSet, basename="appointments")
-urlpatterns = router.urls
+router.register(r"appointment-series", AppointmentSeriesViewSet, basename="appointment-series")
+
+urlpatterns = [
+    path("availability/", AvailabilityView.as_view(), name="availability"),
+]
+
+urlpatterns += router.urls
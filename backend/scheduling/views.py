@@ -1,18 +1,48 @@
-from rest_framework import viewsets
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework import serializers, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Q
 
+from accounts.models import Profile
+from core.pagination import AppointmentPagination, CreatedAtPagination
 from core.permissions import get_role
-from .models import Appointment
-from .serializers import AppointmentSerializer
+from .availability import find_availability
+from .models import Appointment, AppointmentSeries
+from .recurrence import expand_occurrences, materialize_occurrence, series_in_range
+from .serializers import (
+    APPOINTMENT_FEED_FIELDS,
+    AppointmentFeedQuerySerializer,
+    AppointmentSerializer,
+    AppointmentSeriesSerializer,
+    AvailabilityQuerySerializer,
+    OccurrenceSerializer,
+    appointment_feed,
+    occurrence_rows,
+    overlap_as_conflict,
+)
+
+User = get_user_model()
 
 class AppointmentViewSet(viewsets.ModelViewSet):
     queryset = Appointment.objects.select_related("barber", "customer", "service").all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = AppointmentPagination
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ["barber", "status"]
+    # ?start_at__gte=...&start_at__lt=... usa o índice de start_at
+    filterset_fields = {
+        "barber": ["exact"],
+        "status": ["exact"],
+        "start_at": ["gte", "lt"],
+    }
     search_fields = ["customer__name", "barber__username", "service__name", "notes"]
     ordering_fields = ["start_at", "created_at"]
 
@@ -30,3 +60,155 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             serializer.save(created_by=self.request.user, barber=self.request.user)
         else:
             serializer.save(created_by=self.request.user)
+
+    @action(detail=False, methods=["get"])
+    def feed(self, request):
+        """
+        Agenda compacta de uma janela start_at__gte/start_at__lt (até 42 dias,
+        padrão: semana atual), sem paginação. Aceita barber e status como a listagem.
+        Inclui as ocorrências ainda não gravadas das séries recorrentes.
+        """
+        params = AppointmentFeedQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data["start_at__gte"], params.validated_data["start_at__lt"]
+
+        rows = list(
+            self.filter_queryset(self.get_queryset())
+            .filter(start_at__gte=start, start_at__lt=end)
+            .order_by("start_at", "id")
+            .values(*APPOINTMENT_FEED_FIELDS)
+        )
+
+        # ocorrências virtuais têm sempre status SCHEDULED
+        if request.query_params.get("status", Appointment.Status.SCHEDULED) == Appointment.Status.SCHEDULED:
+            series = series_in_range(start, end, queryset=series_queryset(request))
+            if request.query_params.get("barber"):
+                series = series.filter(barber_id=request.query_params["barber"])
+            occurrences = [o for o in expand_occurrences(series, start, end) if o["start_at"] >= start]
+            if occurrences:
+                rows = sorted(rows + occurrence_rows(occurrences), key=lambda r: (r["start_at"], r["id"] or 0))
+
+        return Response(appointment_feed(rows, start))
+
+
+def series_queryset(request):
+    qs = AppointmentSeries.objects.select_related("barber", "customer", "service")
+    if get_role(request.user) in ("MANAGER", "ADMIN"):
+        return qs
+    return qs.filter(barber=request.user)
+
+
+class AppointmentSeriesViewSet(viewsets.ModelViewSet):
+    """
+    Séries recorrentes. As ocorrências só viram Appointment ao serem
+    confirmadas/alteradas (POST .../occurrences/) ou atendidas (venda com
+    series + occurrence_start).
+    """
+    serializer_class = AppointmentSeriesSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ["barber", "customer"]
+
+    def get_queryset(self):
+        return series_queryset(self.request)
+
+    def perform_create(self, serializer):
+        role = get_role(self.request.user)
+        if role not in ("MANAGER", "ADMIN"):
+            serializer.save(created_by=self.request.user, barber=self.request.user)
+        else:
+            serializer.save(created_by=self.request.user)
+
+    @action(detail=True, methods=["get", "post"])
+    def occurrences(self, request, pk=None):
+        """
+        GET: ocorrências da janela start_at__gte/start_at__lt (padrão: semana atual),
+        com o id do Appointment quando já gravada.
+        POST: grava uma ocorrência {occurrence_start, status?, start_at?, end_at?, notes?}.
+        """
+        series = self.get_object()
+        if request.method == "POST":
+            return self.materialize(request, series)
+
+        params = AppointmentFeedQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data["start_at__gte"], params.validated_data["start_at__lt"]
+
+        datetime_field = serializers.DateTimeField()
+        pending = [
+            {"occurrence_start": o["start_at"], "start_at": o["start_at"], "end_at": o["end_at"],
+             "status": Appointment.Status.SCHEDULED, "appointment": None}
+            for o in expand_occurrences([series], start, end)
+        ]
+        stored = [
+            {"occurrence_start": occurrence_start, "start_at": start_at, "end_at": end_at,
+             "status": appointment_status, "appointment": appointment_id}
+            for appointment_id, occurrence_start, start_at, end_at, appointment_status in series.appointments.filter(
+                occurrence_start__gte=start, occurrence_start__lt=end,
+            ).values_list("id", "occurrence_start", "start_at", "end_at", "status")
+        ]
+        occurrences = sorted(pending + stored, key=lambda o: o["occurrence_start"])
+        for o in occurrences:
+            for key in ("occurrence_start", "start_at", "end_at"):
+                o[key] = datetime_field.to_representation(o[key])
+        return Response(occurrences)
+
+    def materialize(self, request, series):
+        serializer = OccurrenceSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        occurrence_start = changes.pop("occurrence_start")
+
+        try:
+            with overlap_as_conflict():
+                appointment = materialize_occurrence(series, occurrence_start, created_by=request.user, **changes)
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
+
+        return Response(AppointmentSerializer(appointment).data, status=status.HTTP_201_CREATED)
+
+
+class AvailabilityView(APIView):
+    """
+    Horários livres por barbeiro:
+    ?date_from=2026-10-19&date_to=2026-10-25&barbers=1,2&duration=30&step=30
+    Sem datas: próximos 7 dias. Sem barbers: todos os barbeiros.
+    Ignora agendamentos CANCELED/NO_SHOW.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        params = AvailabilityQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = params.validated_data
+
+        barbers = User.objects.filter(is_active=True)
+        if data.get("barbers"):
+            barbers = barbers.filter(id__in=data["barbers"])
+        else:
+            barbers = barbers.filter(profile__role=Profile.Role.BARBER)
+        barbers = list(barbers.order_by("username").values_list("id", "username"))
+
+        duration = timedelta(minutes=data["duration"])
+        step = timedelta(minutes=data.get("step") or settings.SCHEDULING_SLOT_STEP_MINUTES)
+        slots = find_availability(
+            barber_ids=[barber_id for barber_id, _ in barbers],
+            date_from=data["date_from"],
+            date_to=data["date_to"],
+            duration=duration,
+            step=step,
+        )
+
+        datetime_field = serializers.DateTimeField()
+        return Response({
+            "duration": data["duration"],
+            "barbers": [
+                {
+                    "barber": barber_id,
+                    "barber_username": username,
+                    "slots": [datetime_field.to_representation(s) for s in slots[barber_id]],
+                }
+                for barber_id, username in barbers
+            ],
+        })